@@ -6,20 +6,167 @@ This module provides functions for consistent styling and configuration
 across all figures in the paper.
 """
 
+import os
+import copy
 import yaml
+import matplotlib
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
 import pandas as pd
 from pathlib import Path
 import json
+from cycler import cycler
 import cmcrameri.cm as cmc  # Import Fabio Crameri's colormaps
 
+CONFIG_PATH = Path(__file__).parent / "plot_config.yaml"
+
+class PlotStyle:
+    """
+    Process-wide plot style loaded from plot_config.yaml.
+    
+    The YAML file is parsed once and re-read only when its modification time
+    changes. Palettes are built once per configuration and handed out as
+    copies of the seaborn palette, with ready-made arrays for the
+    configured ones.
+    
+    Use get_style() to get the shared instance rather than creating one.
+    """
+    
+    def __init__(self, config_path=CONFIG_PATH):
+        self.config_path = Path(config_path)
+        self.config = None
+        self.version = 0
+        self._mtime = None
+        self._palettes = {}
+        self._rc = None
+        self._theme_rc = None
+        self.refresh()
+    
+    def refresh(self):
+        """
+        Reload the configuration if the file changed since it was last read.
+        
+        Returns:
+        --------
+        bool
+            True if the configuration was (re)loaded
+        """
+        mtime = self.config_path.stat().st_mtime_ns
+        if mtime == self._mtime:
+            return False
+        
+        with open(self.config_path, "r") as f:
+            self.config = yaml.safe_load(f)
+        self._mtime = mtime
+        self.version += 1
+        self._palettes = {}
+        self._rc = None
+        self._theme_rc = None
+        
+        colors = self.config['colors']
+        self.series_colors = np.array(self.palette(colors['series_colormap'], 18))
+        self.archetype_colors = np.array(self.palette(colors['archetype_palette']))
+        self.task_type_colors = np.array(self.palette(colors['task_type_palette']))
+        self.sentiment_colors = {
+            name: np.array(matplotlib.colors.to_rgb(color))
+            for name, color in colors['sentiment'].items()
+        }
+        return True
+    
+    def palette(self, name, n_colors=None):
+        """
+        Get a seaborn palette, building it only once per configuration.
+        
+        Parameters:
+        -----------
+        name : str
+            Seaborn palette or matplotlib colormap name
+        n_colors : int, optional
+            Number of colors to return, if None will use the palette default
+        
+        Returns:
+        --------
+        seaborn palette
+            List of RGB color tuples, as returned by sns.color_palette; a
+            copy, so callers may modify it
+        """
+        key = (name, n_colors)
+        if key not in self._palettes:
+            self._palettes[key] = sns.color_palette(name, n_colors=n_colors)
+        palette = self._palettes[key]
+        return type(palette)(palette)
+    
+    def rc_params(self):
+        """
+        Matplotlib rcParams equivalent to the seaborn theme used for the paper.
+        
+        Returns:
+        --------
+        dict
+            rcParams for sns.set_theme(style="whitegrid") with the configured font
+        """
+        if self._rc is None:
+            rc = {}
+            rc.update(sns.axes_style("whitegrid"))
+            rc.update(sns.plotting_context("notebook"))
+            rc["font.family"] = [self.config["global"]["font_family"]]
+            rc["axes.prop_cycle"] = cycler(color=sns.color_palette("deep"))
+            self._rc = rc
+        return self._rc
+    
+    def rc_context(self):
+        """
+        Context manager applying the paper style to figures created inside it.
+        
+        Returns:
+        --------
+        contextlib.AbstractContextManager
+            matplotlib.rc_context with the style's rcParams
+        """
+        return plt.rc_context(self.rc_params())
+    
+    def apply_theme(self):
+        """
+        Set the global seaborn theme.
+        
+        The theme is built with sns.set_theme once per configuration and its
+        rcParams are kept; later calls only restore those rcParams, so values
+        changed by an earlier figure in the same process are reset before the
+        next one is drawn.
+        """
+        if self._theme_rc is None:
+            sns.set_theme(style="whitegrid", font=self.config["global"]["font_family"])
+            self._theme_rc = {key: copy.deepcopy(matplotlib.rcParams[key]) for key in self.rc_params()}
+        else:
+            matplotlib.rcParams.update(self._theme_rc)
+
+_style = None
+
+def get_style():
+    """
+    Get the shared PlotStyle, reloading the config if the file changed.
+    
+    Returns:
+    --------
+    PlotStyle
+        The process-wide style object
+    """
+    global _style
+    if _style is None:
+        _style = PlotStyle()
+    else:
+        _style.refresh()
+    return _style
+
 def load_config():
-    """Load configuration from plot_config.yaml"""
-    config_path = Path(__file__).parent / "plot_config.yaml"
-    with open(config_path, "r") as f:
-        return yaml.safe_load(f)
+    """
+    Load configuration from plot_config.yaml.
+    
+    The parsed file is cached for the process and only re-read when the file
+    changes. Each call returns its own copy, so callers may modify it.
+    """
+    return copy.deepcopy(get_style().config)
 
 def apply_plot_style(fig=None, ax=None):
     """
@@ -35,12 +182,13 @@ def apply_plot_style(fig=None, ax=None):
     Returns:
     --------
     dict
-        The loaded configuration
+        The loaded configuration; a copy, so callers may modify it
     """
-    config = load_config()
+    style = get_style()
+    config = style.config
     
     # Set global style
-    sns.set_theme(style="whitegrid", font=config["global"]["font_family"])
+    style.apply_theme()
     
     # If specific figure/axes provided, apply styling
     if fig is not None and ax is not None:
@@ -53,7 +201,7 @@ def apply_plot_style(fig=None, ax=None):
             # Single axis
             _style_axis(ax, config)
     
-    return config
+    return copy.deepcopy(config)
 
 def _style_axis(ax, config):
     """
@@ -88,8 +236,8 @@ def get_series_colors(num_series=18):
     list
         List of RGB color tuples
     """
-    config = load_config()
-    return sns.color_palette(config['colors']['series_colormap'], n_colors=num_series)
+    style = get_style()
+    return style.palette(style.config['colors']['series_colormap'], n_colors=num_series)
 
 def get_palette(palette_name, n_colors=None):
     """
@@ -107,8 +255,44 @@ def get_palette(palette_name, n_colors=None):
     list
         List of RGB color tuples
     """
-    config = load_config()
-    return sns.color_palette(config['colors'][palette_name], n_colors=n_colors)
+    style = get_style()
+    return style.palette(style.config['colors'][palette_name], n_colors=n_colors)
+
+def _write_atomic(output_file, text):
+    """
+    Write a text file so readers never see it half-written.
+    
+    The text goes to a temporary file in the same directory, which then
+    replaces the target in one step. Safe when several processes render
+    figures at the same time.
+    """
+    output_file = Path(output_file)
+    tmp_file = output_file.with_name(f".{output_file.name}.{os.getpid()}.tmp")
+    with open(tmp_file, "w") as f:
+        f.write(text)
+    os.replace(tmp_file, output_file)
+
+def save_figure(fig, output_path, dpi=None):
+    """
+    Save a figure atomically at the configured resolution.
+    
+    Parameters:
+    -----------
+    fig : matplotlib.figure.Figure
+        Figure to save
+    output_path : str or Path
+        Destination file; the format follows its extension
+    dpi : int, optional
+        Resolution, defaults to the dpi in plot_config.yaml
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(exist_ok=True, parents=True)
+    if dpi is None:
+        dpi = load_config()["global"]["dpi"]
+    
+    tmp_path = output_path.with_name(f".{output_path.stem}.{os.getpid()}.tmp{output_path.suffix}")
+    fig.savefig(tmp_path, dpi=dpi, bbox_inches="tight")
+    os.replace(tmp_path, output_path)
 
 def log_metrics(figure_num, metrics_dict):
     """
@@ -125,8 +309,7 @@ def log_metrics(figure_num, metrics_dict):
     output_dir.mkdir(exist_ok=True, parents=True)
     
     output_file = output_dir / "metrics.json"
-    with open(output_file, "w") as f:
-        json.dump(metrics_dict, f, indent=2)
+    _write_atomic(output_file, json.dumps(metrics_dict, indent=2))
     
     print(f"Metrics for Figure {figure_num} saved to {output_file}")
 
@@ -209,9 +392,9 @@ def save_caption(figure_num, caption):
         Caption to save
     """
     output_dir = Path(__file__).parent.parent / "figures" / f"figure{figure_num}"
-    output_file = output_dir / "caption.txt"
+    output_dir.mkdir(exist_ok=True, parents=True)
     
-    with open(output_file, "w") as f:
-        f.write(caption)
+    output_file = output_dir / "caption.txt"
+    _write_atomic(output_file, caption)
     
     print(f"Caption for Figure {figure_num} saved to {output_file}") 
\ No newline at end of file
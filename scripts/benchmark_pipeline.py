@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the pipeline stages.
+
+Every stage is timed and memory-profiled on synthetic fixtures at several
+multiples of the current data size (1x, 10x and 100x by default):
+
+    process_scores   process_scores_by_series.main on scores.csv with every
+                     series' tasks repeated scale times
+    split_blocks     split_text_into_blocks on scale episode-sized transcripts
+    analyze_script   analyze_script on the same transcript, with the LLM
+                     replaced by a stub that answers instantly
+    plot_config      plot_utils config and palette calls, 1000 x scale rounds
+    render_figure    one series deep dive rendered to a temporary file
+    latex            one pdflatex build of the manuscript
+
+The last two don't depend on the data size and only run at 1x. Stages whose
+imports or tools are missing (the LLM utils, pdflatex) are recorded as
+skipped with the reason.
+
+Time is the best of --repeats runs (the first run, which pays for cold
+caches, is kept separately). Peak memory is measured with tracemalloc in an
+extra run, so it covers Python and numpy allocations but not pdflatex.
+Each invocation appends a record to data/processed/benchmark_history.json
+and compares it with the previous record of the same machine. The history
+is local to each checkout and is not committed.
+
+Usage:
+    python scripts/benchmark_pipeline.py
+    python scripts/benchmark_pipeline.py --stages process_scores split_blocks --scales 1 10
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import warnings
+import tracemalloc
+import subprocess
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_loader import RAW_DIR, REPO_ROOT, load_raw
+
+sys.path.insert(0, str(REPO_ROOT / "config"))
+
+HISTORY_PATH = REPO_ROOT / "data" / "processed" / "benchmark_history.json"
+
+DEFAULT_SCALES = (1, 10, 100)
+
+# A stage this much slower than in the previous record is reported
+REGRESSION_TOLERANCE = 0.2
+
+class SkipStage(Exception):
+    """Raised by a stage setup when the stage can't run here."""
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+def scaled_scores(scale, output_dir):
+    """
+    Write scores.csv with every series' tasks repeated scale times.
+
+    Copies get fresh task IDs, so each series has scale times as many tasks
+    for the same contestants.
+    """
+    scores = pd.read_csv(RAW_DIR / "scores.csv")
+    offset = int(scores["task_id"].max())
+    copies = [scores.assign(task_id=scores["task_id"] + i * offset,
+                            task_episode_id=scores["task_episode_id"].astype(str) + f"_{i}")
+              for i in range(1, scale)]
+    path = Path(output_dir) / "scores.csv"
+    pd.concat([scores] + copies, ignore_index=True).to_csv(path, index=False)
+    return path
+
+def synthetic_transcript(scale, seed=0):
+    """
+    Transcript text of scale average-length episodes.
+
+    Sentences of random words from a small vocabulary that includes the host
+    names, with sentence breaks and [laughter] tags at about their real rates.
+    """
+    stats = load_raw("sentiment.csv", columns=["num_words", "num_sentences", "laughter_count"])
+    words_per_episode = int(stats["num_words"].mean())
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(["the", "a", "task", "point", "greg", "alex", "five", "really", "what", "is", "that",
+                           "oh", "no", "yes", "cake", "hat", "time", "you", "have", "to", "do", "it", "so"])
+    n_words = words_per_episode * scale
+    words = vocabulary[rng.integers(0, len(vocabulary), n_words)].astype(object)
+
+    # Full stops at the real sentence rate, one line per sentence
+    sentence_ends = rng.random(n_words) < stats["num_sentences"].mean() / words_per_episode
+    words[sentence_ends] = words[sentence_ends] + ".\n"
+    tags = rng.random(n_words) < stats["laughter_count"].mean() / words_per_episode
+    words[tags] = words[tags] + " [laughter]"
+    return " ".join(words)
+
+class _StubLLM:
+    """Drop-in for AsyncLLMAPI that answers every request with fixed scores."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def generate(self, **kwargs):
+        from sentiment_analysis import SENTIMENT_CATEGORIES
+        return json.dumps({category: 1.0 for category in SENTIMENT_CATEGORIES})
+
+@contextmanager
+def _working_directory(path):
+    """Temporarily change the working directory."""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+# ---------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------
+# Each setup function prepares its fixture in a scratch directory and returns
+# (size, run): a description of the input size and a no-argument callable
+# running the stage once.
+
+def setup_process_scores(scale, work_dir):
+    import process_scores_by_series
+
+    raw_dir = Path(work_dir) / "raw"
+    raw_dir.mkdir()
+    path = scaled_scores(scale, raw_dir)
+    rows = sum(1 for _ in open(path)) - 1
+    loader = partial(load_raw, raw_dir=raw_dir, cache_dir=Path(work_dir) / "cache")
+
+    def run():
+        original = process_scores_by_series.load_raw
+        process_scores_by_series.load_raw = loader
+        try:
+            process_scores_by_series.main(output_dir=Path(work_dir) / "scores_by_series")
+        finally:
+            process_scores_by_series.load_raw = original
+    return f"{rows} score rows", run
+
+def setup_split_blocks(scale, work_dir):
+    try:
+        from sentiment_analysis import split_text_into_blocks
+    except ImportError as e:
+        raise SkipStage(f"sentiment_analysis unavailable ({e})")
+    text = synthetic_transcript(scale)
+    return f"{len(text)} characters", lambda: split_text_into_blocks(text)
+
+def setup_analyze_script(scale, work_dir):
+    try:
+        import sentiment_analysis
+    except ImportError as e:
+        raise SkipStage(f"sentiment_analysis unavailable ({e})")
+    path = Path(work_dir) / "transcript.txt"
+    path.write_text(synthetic_transcript(scale), encoding="utf-8")
+
+    def run():
+        return asyncio.run(sentiment_analysis.analyze_script(str(path), api_key="stub", llm_api=_StubLLM()))
+    return f"{path.stat().st_size} bytes", run
+
+def setup_plot_config(scale, work_dir):
+    import plot_utils
+    rounds = 1000 * scale
+
+    def run():
+        for _ in range(rounds):
+            plot_utils.load_config()
+            plot_utils.get_series_colors(18)
+            plot_utils.get_palette("archetype_palette")
+            plot_utils.get_palette("task_type_palette", 12)
+    return f"{rounds} rounds", run
+
+def setup_render_figure(scale, work_dir):
+    os.environ["MPLBACKEND"] = "Agg"
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import render_figures
+
+    spec = render_figures.FIGURES["series_9_deep_dive"]
+    output = Path(work_dir) / "deep_dive.png"
+
+    def run():
+        try:
+            spec.render([output], **spec.params)
+        finally:
+            plt.close("all")
+    return spec.name, run
+
+def setup_latex(scale, work_dir):
+    if shutil.which("pdflatex") is None:
+        raise SkipStage("pdflatex not installed")
+    from compile_submission import run_pdflatex
+
+    tex_file = Path(work_dir) / "final.tex"
+    shutil.copy(REPO_ROOT / "source" / "final.tex", tex_file)
+    build_dir = Path(work_dir) / "build"
+    build_dir.mkdir()
+
+    def run():
+        # Figures resolve against the repository root
+        with _working_directory(work_dir):
+            if not run_pdflatex(str(tex_file), build_dir=str(build_dir), texinputs=str(REPO_ROOT)):
+                raise RuntimeError("pdflatex failed")
+    return "final.tex", run
+
+# name -> (setup, scales with the data)
+STAGES = {
+    "process_scores": (setup_process_scores, True),
+    "split_blocks": (setup_split_blocks, True),
+    "analyze_script": (setup_analyze_script, True),
+    "plot_config": (setup_plot_config, True),
+    "render_figure": (setup_render_figure, False),
+    "latex": (setup_latex, False)
+}
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def _quiet(run):
+    """Run a stage with its console output and warnings discarded."""
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull), redirect_stderr(devnull), \
+            warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        run()
+
+def measure(run, repeats=3):
+    """
+    Time a stage and measure its peak traced memory.
+
+    Returns:
+    --------
+    dict
+        first_seconds, best_seconds and peak_mb
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        _quiet(run)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        _quiet(run)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"first_seconds": times[0], "best_seconds": min(times), "peak_mb": peak / 2 ** 20}
+
+def run_benchmarks(stages=None, scales=DEFAULT_SCALES, repeats=3):
+    """
+    Run the selected stages at every scale.
+
+    Returns:
+    --------
+    list of dict
+        One result per (stage, scale) with status ("ok", "skipped" or
+        "failed"), size and the measure() numbers
+    """
+    results = []
+    for name in stages or list(STAGES):
+        setup, scalable = STAGES[name]
+        for scale in (scales if scalable else [1]):
+            result = {"stage": name, "scale": scale}
+            with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as work_dir:
+                try:
+                    size, run = setup(scale, work_dir)
+                    result.update(status="ok", size=size, **measure(run, repeats))
+                except SkipStage as e:
+                    result.update(status="skipped", reason=str(e))
+                except Exception as e:
+                    result.update(status="failed", reason=f"{type(e).__name__}: {e}")
+            results.append(result)
+            print(format_result(result))
+    return results
+
+def format_result(result):
+    """One console line for a benchmark result."""
+    label = f"{result['stage']:<15} {result['scale']:>4}x"
+    if result["status"] != "ok":
+        return f"⏭️  {label}  {result['status']}: {result['reason']}"
+    return (f"⏱️  {label}  {result['best_seconds']:8.3f}s (first {result['first_seconds']:.3f}s)  "
+            f"peak {result['peak_mb']:8.1f} MB  [{result['size']}]")
+
+def environment():
+    """Commit and machine the benchmarks ran on."""
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True,
+                                  timeout=30).stdout.strip()
+        except (OSError, subprocess.TimeoutExpired):
+            return ""
+    return {
+        "commit": git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "machine": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count()
+    }
+
+def load_history(path=HISTORY_PATH):
+    """Benchmark records of earlier runs, oldest first."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def save_history(history, path=HISTORY_PATH):
+    """Write the benchmark history atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, path)
+
+def compare(record, history, tolerance=REGRESSION_TOLERANCE):
+    """
+    Compare a record with the previous one from the same machine.
+
+    Returns:
+    --------
+    list of dict
+        stage, scale, previous and current best seconds, and the ratio, for
+        every measurement present in both records; an empty list when there
+        is no earlier record
+    """
+    previous = next((r for r in reversed(history) if r["environment"]["machine"] == record["environment"]["machine"]),
+                    None)
+    if previous is None:
+        return []
+    before = {(r["stage"], r["scale"]): r for r in previous["results"] if r["status"] == "ok"}
+    changes = []
+    for result in record["results"]:
+        old = before.get((result["stage"], result["scale"]))
+        if result["status"] == "ok" and old:
+            ratio = result["best_seconds"] / max(old["best_seconds"], 1e-9)
+            changes.append({"stage": result["stage"], "scale": result["scale"], "previous": old["best_seconds"],
+                            "current": result["best_seconds"], "ratio": ratio,
+                            "regression": ratio > 1 + tolerance, "commit": previous["environment"]["commit"]})
+    return changes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and memory-profile the pipeline stages at several data scales")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=None, help="Stages to run (default: all)")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES), help="Data size multiples")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per measurement")
+    parser.add_argument("--history", default=str(HISTORY_PATH), help="JSON benchmark history")
+    parser.add_argument("--no-record", action="store_true", help="Don't append this run to the history")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="Slowdown ratio above 1 reported as a regression")
+    args = parser.parse_args()
+
+    print("📏 Pipeline benchmarks")
+    record = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(),
+              "repeats": args.repeats, "results": run_benchmarks(args.stages, args.scales, args.repeats)}
+
+    history = load_history(args.history)
+    changes = compare(record, history, args.tolerance)
+    if changes:
+        print(f"\n📈 Compared with {changes[0]['commit']}:")
+        for change in changes:
+            flag = "⚠️ " if change["regression"] else "  "
+            print(f"{flag} {change['stage']:<15} {change['scale']:>4}x  {change['previous']:.3f}s -> "
+                  f"{change['current']:.3f}s ({change['ratio']:.2f}x)")
+
+    if not args.no_record:
+        save_history(history + [record], args.history)
+        print(f"\n💾 Recorded in {args.history}")
+    sys.exit(1 if any(change["regression"] for change in changes) else 0)
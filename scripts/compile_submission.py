@@ -5,11 +5,44 @@ Cleans, compiles, and prepares all documents for journal submission
 """
 
 import os
+import io
+import re
+import json
+import time
+import hashlib
+import argparse
 import subprocess
 import glob
 import shutil
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+import instrumentation
+
+# Per-document build directories are created under here
+BUILD_ROOT = '.build'
+
+# figures/... paths in the sources are also looked up here, so the documents
+# build from source/ as well as from a directory holding their own figures
+FIGURE_ROOT = str(Path(__file__).resolve().parent.parent)
+
+# Source/figure hashes of the last successful build of each output PDF
+BUILD_CACHE = os.path.join(BUILD_ROOT, 'build_cache.json')
+
+# pdflatex reruns until these files stop changing, up to MAX_PASSES passes
+AUX_EXTENSIONS = ['.aux', '.toc', '.lof', '.lot', '.out']
+MAX_PASSES = 4
+
+# Extensions tried, in order, for \includegraphics paths given without one
+GRAPHICS_EXTENSIONS = ['', '.pdf', '.png', '.jpg', '.jpeg', '.eps']
+
+# Low-resolution figure tree used by draft builds (see scripts/figure_store.py)
+DRAFT_FIGURES = os.path.join(BUILD_ROOT, 'draft')
+DRAFT_DPI = 90
+
+INCLUDEGRAPHICS_RE = re.compile(r'\\includegraphics\s*(?:\[[^\]]*\])?\s*\{([^}]+)\}')
+
 def clean_latex_files():
     """Remove all LaTeX intermediate files"""
     print("🧹 Cleaning LaTeX intermediate files...")
@@ -29,38 +62,126 @@ def clean_latex_files():
             except OSError:
                 pass
 
-def run_pdflatex(tex_file, output_name=None):
-    """Run pdflatex twice non-interactively"""
+def file_hash(path):
+    """SHA-256 of a file's contents, or None if it doesn't exist"""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def find_figures(tex_file):
+    """List the figure files a .tex source includes with \\includegraphics"""
+    with open(tex_file, 'r', encoding='utf-8', errors='replace') as f:
+        source = f.read()
+    
+    # Ignore commented-out lines
+    source = re.sub(r'(?<!\\)%.*', '', source)
+    
+    figures = []
+    for name in INCLUDEGRAPHICS_RE.findall(source):
+        name = name.strip()
+        candidates = [name + ext for ext in GRAPHICS_EXTENSIONS]
+        candidates += [os.path.join(FIGURE_ROOT, c) for c in candidates]
+        found = next((c for c in candidates if os.path.isfile(c)), name)
+        if found not in figures:
+            figures.append(found)
+    return figures
+
+def build_key(tex_file, draft=False):
+    """Hash of a document's source, every figure it includes and the build mode"""
+    digest = hashlib.sha256()
+    digest.update(f"{tex_file}:{file_hash(tex_file)}:{'draft' if draft else 'final'}\n".encode())
+    for figure in sorted(find_figures(tex_file)):
+        digest.update(f"{figure}:{file_hash(figure)}\n".encode())
+    return digest.hexdigest()
+
+def load_build_cache():
+    """Load the build keys of previously built PDFs"""
+    try:
+        with open(BUILD_CACHE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_build_cache(cache):
+    """Persist the build keys of built PDFs"""
+    os.makedirs(BUILD_ROOT, exist_ok=True)
+    tmp_file = BUILD_CACHE + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, BUILD_CACHE)
+
+def aux_snapshot(build_dir, tex_file):
+    """Contents of the cross-reference files pdflatex writes for a document"""
+    stem = os.path.join(build_dir, Path(tex_file).stem)
+    snapshot = {}
+    for ext in AUX_EXTENSIONS:
+        if os.path.exists(stem + ext):
+            with open(stem + ext, 'rb') as f:
+                snapshot[ext] = f.read()
+    return snapshot
+
+def run_pdflatex(tex_file, output_name=None, build_dir=None, max_passes=MAX_PASSES, texinputs=None):
+    """
+    Run pdflatex non-interactively until cross-references settle.
+    
+    Passes are repeated until the .aux/.toc/... files are the same after a
+    pass as before it, up to max_passes. With a build directory kept from an
+    earlier build, an unchanged document needs a single pass.
+    
+    texinputs is searched before the default TeX paths, which lets a draft
+    build pick up preview figures under the same relative names. FIGURE_ROOT
+    is searched after the working directory.
+    """
     print(f"📄 Compiling {tex_file}...")
     
-    # First compilation
     cmd = [
         'pdflatex', 
         '-interaction=nonstopmode',  # Non-interactive mode
         '-halt-on-error',            # Stop on first error
         '-file-line-error',          # Better error reporting
-        tex_file
     ]
+    if build_dir:
+        # Keep .aux/.log/.pdf out of the shared working directory
+        cmd.append(f'-output-directory={build_dir}')
+    cmd.append(tex_file)
+    
+    search_path = [os.path.abspath(texinputs)] if texinputs else []
+    search_path += ['.', FIGURE_ROOT]
+    # Trailing separator keeps the default search path after ours
+    env = dict(os.environ, TEXINPUTS=os.pathsep.join(search_path) + os.pathsep)
     
     try:
-        # First pass
-        result1 = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
-        if result1.returncode != 0:
-            print(f"❌ First pass failed for {tex_file}")
-            print("STDOUT:", result1.stdout[-1000:])  # Last 1000 chars
-            print("STDERR:", result1.stderr[-1000:])
-            return False
+        previous = aux_snapshot(build_dir or '.', tex_file)
+        for pass_num in range(1, max_passes + 1):
+            start = time.perf_counter()
+            with instrumentation.stage("pdflatex.pass", document=tex_file, pass_num=pass_num):
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=120, env=env)
+            instrumentation.observe("pdflatex.pass_seconds", time.perf_counter() - start)
+            instrumentation.count("pdflatex.passes")
+            if result.returncode != 0:
+                print(f"❌ Pass {pass_num} failed for {tex_file}")
+                print("STDOUT:", result.stdout[-1000:])  # Last 1000 chars
+                print("STDERR:", result.stderr[-1000:])
+                return False
             
-        # Second pass for cross-references
-        result2 = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
-        if result2.returncode != 0:
-            print(f"❌ Second pass failed for {tex_file}")
-            print("STDOUT:", result2.stdout[-1000:])
-            print("STDERR:", result2.stderr[-1000:])
-            return False
+            current = aux_snapshot(build_dir or '.', tex_file)
+            if current == previous:
+                break
+            previous = current
+        else:
+            print(f"⚠️  Cross-references of {tex_file} still changing after {max_passes} passes")
+        print(f"   {pass_num} pdflatex pass{'es' if pass_num > 1 else ''}")
             
         # Check if PDF was created
         pdf_file = tex_file.replace('.tex', '.pdf')
+        if build_dir:
+            built_pdf = os.path.join(build_dir, os.path.basename(pdf_file))
+            if os.path.exists(built_pdf):
+                shutil.move(built_pdf, pdf_file)
         if os.path.exists(pdf_file):
             print(f"✅ Successfully compiled {pdf_file}")
             
@@ -80,6 +201,33 @@ def run_pdflatex(tex_file, output_name=None):
         print(f"❌ Error compiling {tex_file}: {e}")
         return False
 
+def build_document(tex_file, output_name, texinputs=None):
+    """
+    Build one document in its own build directory.
+    
+    The directory (.build/<document>) is kept between runs so the previous
+    .aux files seed the pass count. Runs in a worker process; console output
+    is captured and returned so the parent can report each document in one
+    piece.
+    """
+    start = time.time()
+    log = io.StringIO()
+    
+    with redirect_stdout(log), instrumentation.stage("latex.document", document=tex_file):
+        build_dir = os.path.join(BUILD_ROOT, Path(tex_file).stem)
+        os.makedirs(build_dir, exist_ok=True)
+        success = run_pdflatex(tex_file, output_name, build_dir=build_dir, texinputs=texinputs)
+    
+    return {
+        'tex_file': tex_file,
+        'output_name': output_name,
+        'success': success,
+        'seconds': time.time() - start,
+        'log': log.getvalue(),
+        # Timings recorded in this worker, merged by the parent
+        'telemetry': instrumentation.drain()
+    }
+
 def create_track_changes():
     """Create track changes version using latexdiff"""
     print("🔄 Creating track changes version...")
@@ -91,7 +239,8 @@ def create_track_changes():
     try:
         # Run latexdiff
         cmd = ['latexdiff', 'old_submission.tex', 'final.tex']
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        with instrumentation.stage("latex.latexdiff"):
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
         
         if result.returncode != 0:
             print(f"❌ latexdiff failed: {result.stderr}")
@@ -111,30 +260,100 @@ def create_track_changes():
         print(f"❌ Error creating track changes: {e}")
         return False
 
-def compile_all_documents():
-    """Compile all four required documents"""
+def prepare_draft_figures():
+    """
+    Link low-resolution previews of every stored figure under DRAFT_FIGURES.
+    
+    The tree keeps the figures/... names used by \\includegraphics. Returns
+    the directory to search before the sources, or None if the figure
+    store is empty (the masters are used then).
+    """
+    import figure_store
+    
+    count = figure_store.materialize(DRAFT_FIGURES, dpi=DRAFT_DPI)
+    if not count:
+        print("⚠️  Figure store is empty, draft build uses full-resolution figures")
+        return None
+    print(f"🖼️  Using {count} preview figures at {DRAFT_DPI} dpi")
+    return DRAFT_FIGURES
+
+def compile_all_documents(max_workers=4, force=False, draft=False):
+    """
+    Compile all four required documents in parallel.
+    
+    Documents whose source and included figures are unchanged since their
+    last successful build are skipped, unless force is set. Draft builds use
+    low-resolution figure previews; their PDFs are not reused by a final build.
+    """
     print("🚀 Starting compilation process...")
     
-    success_count = 0
+    texinputs = prepare_draft_figures() if draft else None
     
-    # 1. Compile main manuscript
-    if run_pdflatex('final.tex', 'Manuscript.pdf'):
-        success_count += 1
+    documents = [
+        ('final.tex', 'Manuscript.pdf'),
+        ('response_to_reviewers.tex', 'Response to Reviewers.pdf'),
+        ('supplementary.tex', 'Supporting Information.pdf')
+    ]
     
-    # 2. Create and compile track changes
-    if create_track_changes():
-        if run_pdflatex('final_tracked_changes.tex', 'Revised Manuscript with Track Changes.pdf'):
-            success_count += 1
+    cache = {} if force else load_build_cache()
+    results = []
+    futures = {}
     
-    # 3. Compile response to reviewers
-    if run_pdflatex('response_to_reviewers.tex', 'Response to Reviewers.pdf'):
-        success_count += 1
+    def submit(pool, tex_file, output_name):
+        key = build_key(tex_file, draft=draft)
+        if os.path.exists(output_name) and cache.get(output_name) == key:
+            print(f"⏭️  {output_name} is up to date")
+            results.append({
+                'tex_file': tex_file,
+                'output_name': output_name,
+                'success': True,
+                'skipped': True,
+                'seconds': 0.0,
+                'log': ''
+            })
+            return
+        futures[pool.submit(build_document, tex_file, output_name, texinputs)] = key
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for tex_file, output_name in documents:
+            submit(pool, tex_file, output_name)
+        
+        # latexdiff runs while the independent documents build
+        if create_track_changes():
+            submit(pool, 'final_tracked_changes.tex', 'Revised Manuscript with Track Changes.pdf')
+        else:
+            results.append({
+                'tex_file': 'final_tracked_changes.tex',
+                'output_name': 'Revised Manuscript with Track Changes.pdf',
+                'success': False,
+                'seconds': 0.0,
+                'log': ''
+            })
+        
+        for future in as_completed(futures):
+            result = future.result()
+            instrumentation.merge(result.pop('telemetry', None))
+            print(result['log'], end='')
+            results.append(result)
+            if result['success']:
+                cache[result['output_name']] = futures[future]
+            else:
+                cache.pop(result['output_name'], None)
     
-    # 4. Compile supplementary information
-    if run_pdflatex('supplementary.tex', 'Supporting Information.pdf'):
-        success_count += 1
+    save_build_cache(cache)
+    report_build_results(results)
     
-    return success_count
+    return sum(1 for result in results if result['success'])
+
+def report_build_results(results):
+    """Print a per-document summary of the builds"""
+    print("\n📋 Build summary:")
+    for result in sorted(results, key=lambda r: r['output_name']):
+        if result.get('skipped'):
+            print(f"   ⏭️  {result['output_name']} (up to date)")
+            continue
+        status = "✅" if result['success'] else "❌"
+        print(f"   {status} {result['output_name']} ({result['tex_file']}, {result['seconds']:.1f}s)")
 
 def check_files():
     """Check if all required files exist"""
@@ -221,15 +440,20 @@ def summarize_results():
     else:
         print(f"\n⚠️  Only {success_count} documents created successfully")
 
-def main():
-    """Main execution function"""
+def main(force=False, draft=False, source_dir=None):
+    """
+    Main execution function
+    
+    The documents are built in source_dir (default: the directory of this
+    script), which must hold the .tex sources; the PDFs are written there.
+    """
     print("🔬 PLOS ONE Submission Compiler")
     print("="*50)
     
-    # Change to script directory
-    script_dir = Path(__file__).parent.absolute()
-    os.chdir(script_dir)
-    print(f"📁 Working directory: {script_dir}")
+    # Change to the source directory
+    source_dir = Path(source_dir or Path(__file__).parent).absolute()
+    os.chdir(source_dir)
+    print(f"📁 Working directory: {source_dir}")
     
     # Step 1: Check dependencies
     if not check_dependencies():
@@ -243,7 +467,8 @@ def main():
     clean_latex_files()
     
     # Step 4: Compile all documents
-    success_count = compile_all_documents()
+    with instrumentation.stage("latex.compile_all", force=force, draft=draft):
+        success_count = compile_all_documents(force=force, draft=draft)
     
     # Step 5: Clean up intermediate files again
     clean_latex_files()
@@ -254,4 +479,10 @@ def main():
     return 0 if success_count == 4 else 1
 
 if __name__ == "__main__":
-    exit(main()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Compile all PLOS ONE submission documents")
+    parser.add_argument("--force", action="store_true", help="Rebuild documents even if they are up to date")
+    parser.add_argument("--draft", action="store_true", help="Build with low-resolution figure previews")
+    parser.add_argument("--source-dir", default=None,
+                        help="Directory holding the .tex sources (default: this script's directory)")
+    args = parser.parse_args()
+    exit(main(force=args.force, draft=args.draft, source_dir=args.source_dir)) 
\ No newline at end of file
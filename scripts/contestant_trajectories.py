@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Contestant trajectory features and hierarchical clustering.
+
+All per-series score matrices in data/processed/scores_by_series are stacked
+into one padded tensor of shape (series, contestants, tasks), with masks for
+the padding. Cumulative totals, per-task ranks and the 15 trajectory
+features used for the performance archetypes are then computed for every
+contestant at once:
+
+    total_score       final cumulative score
+    mean_score        mean score per task
+    score_std         standard deviation of task scores (consistency)
+    early_avg         mean score over the first third of the tasks
+    late_avg          mean score over the last third of the tasks
+    late_early_ratio  late_avg / early_avg
+    growth_rate       slope of task score against series progress (0-1)
+    acceleration      curvature of task score against series progress
+    rank_mean         mean standing after each task (1 = leading)
+    rank_variance     variance of the standing
+    rank_volatility   mean absolute change in standing between tasks
+    final_rank        standing after the last task
+    best_rank         best standing reached
+    comeback_factor   places recovered from the worst standing to the final
+    time_leading      share of tasks after which the contestant led
+
+The standardized features are clustered with Ward linkage. The condensed
+distance matrix and the linkage are persisted under data/cache and reused
+while the features are unchanged, so re-cutting the tree into a different
+number of archetypes never recomputes them.
+
+Usage:
+    python scripts/contestant_trajectories.py --clusters 5
+"""
+
+import re
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.spatial.distance import pdist
+
+from data_loader import CACHE_DIR, REPO_ROOT
+
+SERIES_DIR = REPO_ROOT / "data" / "processed" / "scores_by_series"
+
+LINKAGE_NAME = "trajectory_linkage.npz"
+DISTANCES_NAME = "trajectory_distances.npy"
+
+FEATURES = [
+    "total_score", "mean_score", "score_std", "early_avg", "late_avg", "late_early_ratio",
+    "growth_rate", "acceleration", "rank_mean", "rank_variance", "rank_volatility",
+    "final_rank", "best_rank", "comeback_factor", "time_leading"
+]
+
+def stack_series(matrices):
+    """
+    Stack per-series score matrices into one padded tensor.
+
+    Parameters:
+    -----------
+    matrices : list of array-like
+        One (contestants, tasks) score matrix per series
+
+    Returns:
+    --------
+    dict
+        "scores" (series, contestants, tasks) float array with padding set
+        to 0, "contestant_mask" and "task_mask" marking the real entries,
+        and "num_tasks" per series
+    """
+    matrices = [np.asarray(m, dtype=float) for m in matrices]
+    num_series = len(matrices)
+    max_contestants = max(m.shape[0] for m in matrices)
+    max_tasks = max(m.shape[1] for m in matrices)
+
+    scores = np.zeros((num_series, max_contestants, max_tasks))
+    contestant_mask = np.zeros((num_series, max_contestants), dtype=bool)
+    num_tasks = np.array([m.shape[1] for m in matrices])
+    for i, m in enumerate(matrices):
+        scores[i, :m.shape[0], :m.shape[1]] = np.nan_to_num(m)
+        contestant_mask[i, :m.shape[0]] = True
+
+    task_mask = np.arange(max_tasks)[None, :] < num_tasks[:, None]
+    return {"scores": scores, "contestant_mask": contestant_mask, "task_mask": task_mask, "num_tasks": num_tasks}
+
+def load_score_tensor(series_dir=SERIES_DIR):
+    """
+    Read every series_<N>_scores.csv into a padded tensor.
+
+    Returns:
+    --------
+    dict
+        stack_series output plus "series" numbers and "names"/"contestant_id"
+        arrays of shape (series, contestants), empty/0 for padding
+    """
+    files = sorted(Path(series_dir).glob("series_*_scores.csv"),
+                   key=lambda p: int(re.search(r"series_(\d+)_scores", p.name).group(1)))
+    frames = [pd.read_csv(f) for f in files]
+    tensor = stack_series([f.filter(like="Score_Task_").to_numpy(dtype=float) for f in frames])
+
+    shape = tensor["contestant_mask"].shape
+    names = np.full(shape, "", dtype=object)
+    ids = np.zeros(shape, dtype=np.int64)
+    for i, frame in enumerate(frames):
+        names[i, :len(frame)] = frame["ContestantName"].astype(str).to_numpy()
+        ids[i, :len(frame)] = frame["ContestantID"].to_numpy()
+
+    tensor["series"] = np.array([int(re.search(r"series_(\d+)_scores", f.name).group(1)) for f in files])
+    tensor["names"] = names
+    tensor["contestant_id"] = ids
+    return tensor
+
+def cumulative_ranks(tensor):
+    """
+    Cumulative totals and standings after every task.
+
+    Standings use competition ranking (tied contestants share the better
+    place). Padded contestants never outrank real ones.
+
+    Returns:
+    --------
+    tuple
+        (cumulative, ranks), both of shape (series, contestants, tasks)
+    """
+    cumulative = np.cumsum(tensor["scores"], axis=2)
+    standing = np.where(tensor["contestant_mask"][:, :, None], cumulative, -np.inf)
+    # Rank = 1 + number of contestants strictly ahead
+    ranks = 1 + (standing[:, None, :, :] > standing[:, :, None, :]).sum(axis=2)
+    return cumulative, ranks.astype(float)
+
+def _masked_mean(values, mask, axis=-1):
+    """Mean over the entries where mask is set (0 where there are none)."""
+    count = mask.sum(axis=axis)
+    return np.where(mask, values, 0).sum(axis=axis) / np.maximum(count, 1)
+
+def trajectory_features(tensor):
+    """
+    Compute the 15 trajectory features of every contestant.
+
+    Parameters:
+    -----------
+    tensor : dict
+        Output of stack_series or load_score_tensor
+
+    Returns:
+    --------
+    tuple
+        (features, series_index, contestant_index): features is an array of
+        shape (real contestants, 15) in FEATURES order, the index arrays give
+        each row's position in the tensor
+    """
+    scores = tensor["scores"]
+    task_mask = tensor["task_mask"][:, None, :]
+    num_tasks = tensor["num_tasks"][:, None].astype(float)
+    tasks = np.arange(scores.shape[2])[None, :]
+    cumulative, ranks = cumulative_ranks(tensor)
+
+    mean_score = _masked_mean(scores, task_mask)
+    score_std = np.sqrt(_masked_mean((scores - mean_score[..., None]) ** 2, task_mask))
+
+    third = np.maximum(np.ceil(num_tasks / 3), 1)
+    early = (tasks < third)[:, None, :] & task_mask
+    late = (tasks >= num_tasks - third)[:, None, :] & task_mask
+    early_avg = _masked_mean(scores, early)
+    late_avg = _masked_mean(scores, late)
+    late_early_ratio = late_avg / np.maximum(early_avg, 0.1)
+
+    # Quadratic least-squares fit of score on progress x in [0, 1], one
+    # normal-equation system per series shared by its contestants
+    progress = tasks / np.maximum(num_tasks - 1, 1)
+    design = np.stack([np.ones_like(progress), progress, progress ** 2], axis=-1) * tensor["task_mask"][..., None]
+    gram = np.einsum("stj,stk->sjk", design, design) + 1e-9 * np.eye(3)
+    moments = np.einsum("stj,sct->scj", design, scores * task_mask)
+    coefficients = np.linalg.solve(gram[:, None, :, :], moments[..., None])[..., 0]
+    # Slope and curvature at the middle of the series
+    growth_rate = coefficients[..., 1] + coefficients[..., 2]
+    acceleration = 2 * coefficients[..., 2]
+
+    last = (tensor["num_tasks"] - 1)[:, None, None]
+    final_rank = np.take_along_axis(ranks, np.broadcast_to(last, ranks.shape[:2] + (1,)), axis=2)[..., 0]
+    total_score = np.take_along_axis(cumulative, np.broadcast_to(last, ranks.shape[:2] + (1,)), axis=2)[..., 0]
+    rank_mean = _masked_mean(ranks, task_mask)
+    rank_variance = _masked_mean((ranks - rank_mean[..., None]) ** 2, task_mask)
+    step_mask = task_mask[..., 1:] & task_mask[..., :-1]
+    rank_volatility = _masked_mean(np.abs(np.diff(ranks, axis=2)), step_mask)
+    best_rank = np.where(task_mask, ranks, np.inf).min(axis=2)
+    worst_rank = np.where(task_mask, ranks, -np.inf).max(axis=2)
+    comeback_factor = worst_rank - final_rank
+    time_leading = _masked_mean(ranks == 1, task_mask)
+
+    stacked = np.stack([
+        total_score, mean_score, score_std, early_avg, late_avg, late_early_ratio,
+        growth_rate, acceleration, rank_mean, rank_variance, rank_volatility,
+        final_rank, best_rank, comeback_factor, time_leading
+    ], axis=-1)
+    series_index, contestant_index = np.nonzero(tensor["contestant_mask"])
+    return stacked[series_index, contestant_index], series_index, contestant_index
+
+def standardize(features):
+    """Z-score every feature column (constant columns become 0)."""
+    std = features.std(axis=0)
+    return (features - features.mean(axis=0)) / np.where(std > 0, std, 1)
+
+def load_linkage(features, method="ward", cache_dir=CACHE_DIR, rebuild=False):
+    """
+    Condensed distance matrix and linkage of the standardized features.
+
+    The linkage is stored in data/cache/trajectory_linkage.npz together
+    with a hash of the feature matrix and the method, and the distances in
+    data/cache/trajectory_distances.npy. Both are only recomputed when the
+    hash changes; the stored distances are memory-mapped, so a cached call
+    doesn't read the O(n^2) matrix unless it is used.
+
+    Parameters:
+    -----------
+    features : numpy.ndarray
+        Raw feature matrix from trajectory_features
+    method : str, optional
+        scipy linkage method
+    cache_dir : Path, optional
+        Directory of the cache files
+    rebuild : bool, optional
+        Recompute even if the stored linkage is fresh
+
+    Returns:
+    --------
+    tuple
+        (condensed distances, linkage matrix)
+    """
+    features = np.ascontiguousarray(features, dtype=float)
+    key = hashlib.sha256(features.tobytes() + str(features.shape).encode() + method.encode()).hexdigest()
+    linkage_path = Path(cache_dir) / LINKAGE_NAME
+    distances_path = Path(cache_dir) / DISTANCES_NAME
+
+    if linkage_path.exists() and distances_path.exists() and not rebuild:
+        with np.load(linkage_path) as stored:
+            if str(stored["key"]) == key:
+                return np.load(distances_path, mmap_mode="r"), stored["linkage"]
+
+    distances = pdist(standardize(features))
+    tree = linkage(distances, method=method)
+    linkage_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = distances_path.with_suffix(".tmp.npy")
+    np.save(tmp_path, distances)
+    tmp_path.replace(distances_path)
+    # Written last: a linkage file with a matching key implies fresh distances
+    tmp_path = linkage_path.with_suffix(".tmp.npz")
+    np.savez(tmp_path, key=np.array(key), linkage=tree)
+    tmp_path.replace(linkage_path)
+    return distances, tree
+
+def cut_archetypes(tree, n_clusters):
+    """Cut a linkage into n_clusters flat clusters (labels 1..n_clusters)."""
+    return fcluster(tree, t=n_clusters, criterion="maxclust")
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Trajectory features and clustering of all contestants")
+    parser.add_argument("--clusters", type=int, default=5, help="Number of archetype clusters")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute the cached linkage")
+    args = parser.parse_args()
+
+    start = time.time()
+    tensor = load_score_tensor()
+    features, series_index, contestant_index = trajectory_features(tensor)
+    _, tree = load_linkage(features, rebuild=args.rebuild)
+    labels = cut_archetypes(tree, args.clusters)
+    print(f"{len(features)} contestants, {len(FEATURES)} features, {time.time() - start:.2f}s")
+
+    table = pd.DataFrame(features, columns=FEATURES)
+    table.insert(0, "series", tensor["series"][series_index])
+    table.insert(1, "contestant", tensor["names"][series_index, contestant_index])
+    table["cluster"] = labels
+    print(table.groupby("cluster")[FEATURES].mean().round(2).T.to_string())
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Shared loader for the raw Taskmaster datasets.
+
+Each file in data/raw is parsed with pandas once and converted into a typed
+columnar cache under data/cache/<file name>/:
+
+- bool columns are stored as bool arrays
+- integer columns are downcast to the smallest type that fits (int8 for scores)
+- float columns are stored as float64 arrays
+- repetitive strings are stored as categorical codes plus a category list
+- long free text is stored as one UTF-8 blob plus an offsets array
+
+Every column lives in its own .npy file, so numeric columns are memory-mapped
+and a read only touches the columns that were asked for. The cache is rebuilt
+automatically when the source file changes (mtime and size are checked first,
+then the SHA-256 of the contents).
+
+Usage:
+    from data_loader import load_raw
+    scores = load_raw("scores.csv", columns=["task_episode_id", "total_score"])
+"""
+
+import os
+import json
+import hashlib
+import shutil
+import tempfile
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RAW_DIR = REPO_ROOT / "data" / "raw"
+CACHE_DIR = REPO_ROOT / "data" / "cache"
+
+# Bump when the on-disk layout changes so old caches are rebuilt
+CACHE_VERSION = 1
+
+# Strings with at most this share of distinct values are stored as categories
+CATEGORY_MAX_RATIO = 0.5
+
+def _file_sha256(path):
+    """Return the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _write_json_atomic(path, data):
+    """Write JSON next to its destination and move it into place."""
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{Path(path).name}.", suffix=".tmp", dir=Path(path).parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _read_source(source_path):
+    """Parse a raw CSV/TSV with pandas."""
+    sep = "\t" if source_path.suffix == ".tsv" else ","
+    return pd.read_csv(source_path, sep=sep)
+
+def _write_column(values, column_dir, file_stem):
+    """
+    Write one column to disk and return its metadata entry.
+
+    Parameters:
+    -----------
+    values : pandas.Series
+        Column values as parsed by pandas
+    column_dir : Path
+        Cache directory of the dataset
+    file_stem : str
+        Base name of the files for this column
+
+    Returns:
+    --------
+    dict
+        Column metadata (kind, file names)
+    """
+    entry = {"file": file_stem}
+
+    if pd.api.types.is_bool_dtype(values):
+        entry["kind"] = "bool"
+        np.save(column_dir / f"{file_stem}.npy", values.to_numpy(dtype=bool))
+
+    elif pd.api.types.is_integer_dtype(values):
+        entry["kind"] = "int"
+        downcast = pd.to_numeric(values, downcast="integer")
+        np.save(column_dir / f"{file_stem}.npy", downcast.to_numpy())
+
+    elif pd.api.types.is_float_dtype(values):
+        entry["kind"] = "float"
+        np.save(column_dir / f"{file_stem}.npy", values.to_numpy(dtype=np.float64))
+
+    else:
+        values = values.astype(object)
+        valid = values.notna().to_numpy()
+        strings = values.where(valid, "").astype(str)
+
+        if strings[valid].nunique() <= CATEGORY_MAX_RATIO * max(len(values), 1):
+            entry["kind"] = "category"
+            categorical = pd.Categorical(values.where(valid, None))
+            np.save(column_dir / f"{file_stem}.npy", categorical.codes.astype(np.int32))
+            with open(column_dir / f"{file_stem}.categories.json", "w", encoding="utf-8") as f:
+                json.dump([str(c) for c in categorical.categories], f, ensure_ascii=False)
+        else:
+            entry["kind"] = "text"
+            encoded = [s.encode("utf-8") for s in strings]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+            with open(column_dir / f"{file_stem}.utf8", "wb") as f:
+                f.write(b"".join(encoded))
+            np.save(column_dir / f"{file_stem}.offsets.npy", offsets)
+            np.save(column_dir / f"{file_stem}.valid.npy", valid)
+
+    return entry
+
+def _read_column(entry, column_dir):
+    """Load one cached column as a numpy array or pandas Categorical."""
+    file_stem = entry["file"]
+    kind = entry["kind"]
+
+    if kind in ("bool", "int", "float"):
+        return np.load(column_dir / f"{file_stem}.npy", mmap_mode="r")
+
+    if kind == "category":
+        codes = np.load(column_dir / f"{file_stem}.npy", mmap_mode="r")
+        with open(column_dir / f"{file_stem}.categories.json", "r", encoding="utf-8") as f:
+            categories = json.load(f)
+        return pd.Categorical.from_codes(np.asarray(codes), categories=categories)
+
+    offsets = np.load(column_dir / f"{file_stem}.offsets.npy", mmap_mode="r")
+    valid = np.load(column_dir / f"{file_stem}.valid.npy", mmap_mode="r")
+    blob = (column_dir / f"{file_stem}.utf8").read_bytes()
+    values = np.empty(len(valid), dtype=object)
+    for i in range(len(valid)):
+        values[i] = blob[offsets[i]:offsets[i + 1]].decode("utf-8") if valid[i] else np.nan
+    return values
+
+def build_cache(name, raw_dir=RAW_DIR, cache_dir=CACHE_DIR):
+    """
+    Convert a raw file into the columnar cache, replacing any existing cache.
+
+    Safe to run from several processes at once: each build writes into its
+    own temporary directory, and a build that finds a fresh cache already
+    swapped in by another process discards its own copy and uses that one.
+
+    Parameters:
+    -----------
+    name : str
+        File name inside the raw directory, e.g. "scores.csv"
+    raw_dir : Path, optional
+        Directory holding the raw files
+    cache_dir : Path, optional
+        Root directory of the cache
+
+    Returns:
+    --------
+    dict
+        The metadata written for the dataset
+    """
+    source_path = Path(raw_dir) / name
+    dataset_dir = Path(cache_dir) / name
+
+    stat = source_path.stat()
+    df = _read_source(source_path)
+
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{name}.", suffix=".tmp", dir=cache_dir))
+
+    columns = []
+    for i, column in enumerate(df.columns):
+        entry = _write_column(df[column], tmp_dir, f"c{i:03d}")
+        entry["name"] = column
+        columns.append(entry)
+
+    meta = {
+        "version": CACHE_VERSION,
+        "source": name,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": _file_sha256(source_path),
+        "num_rows": len(df),
+        "columns": columns
+    }
+    with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+    # Swap the finished cache in so readers never see a partial build
+    try:
+        if _swap_in(tmp_dir, dataset_dir, meta["sha256"]):
+            return meta
+        # Another process swapped in a cache of the same contents first
+        return _fresh_meta(name, raw_dir, cache_dir) or meta
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def _swap_in(tmp_dir, dataset_dir, sha256):
+    """
+    Move a finished build to dataset_dir.
+
+    Returns False without touching dataset_dir if it already holds a cache
+    of the same source contents, which happens when concurrent processes
+    build the same dataset.
+    """
+    for _ in range(3):
+        try:
+            os.rename(tmp_dir, dataset_dir)
+            return True
+        except OSError:
+            if not dataset_dir.exists():
+                continue
+
+        existing = _read_meta(dataset_dir / "meta.json")
+        if existing and existing.get("version") == CACHE_VERSION and existing.get("sha256") == sha256:
+            return False
+
+        # Move the stale cache aside; losing this race to another process is fine
+        old_dir = Path(tempfile.mkdtemp(prefix=f".{dataset_dir.name}.", suffix=".old", dir=dataset_dir.parent))
+        try:
+            os.rename(dataset_dir, old_dir / "cache")
+        except OSError:
+            pass
+        shutil.rmtree(old_dir, ignore_errors=True)
+    raise RuntimeError(f"Could not replace the cache in {dataset_dir}")
+
+def _read_meta(meta_path):
+    """Load a meta.json, or None if it is missing or being replaced."""
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _fresh_meta(name, raw_dir, cache_dir):
+    """Return the cache metadata if it still matches the source, else None."""
+    source_path = Path(raw_dir) / name
+    meta_path = Path(cache_dir) / name / "meta.json"
+    meta = _read_meta(meta_path)
+    if meta is None or meta.get("version") != CACHE_VERSION:
+        return None
+
+    stat = source_path.stat()
+    if meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size:
+        return meta
+
+    # The file was touched; only rebuild if the contents actually changed
+    if meta["size"] != stat.st_size or meta["sha256"] != _file_sha256(source_path):
+        return None
+    meta["mtime_ns"] = stat.st_mtime_ns
+    try:
+        _write_json_atomic(meta_path, meta)
+    except OSError:
+        # The cache directory was swapped out by a concurrent build
+        pass
+    return meta
+
+def get_meta(name, raw_dir=RAW_DIR, cache_dir=CACHE_DIR):
+    """
+    Return the metadata of a cached dataset, building the cache if needed.
+
+    Parameters:
+    -----------
+    name : str
+        File name inside the raw directory, e.g. "scores.csv"
+
+    Returns:
+    --------
+    dict
+        Dataset metadata including the column list and their stored kinds
+    """
+    meta = _fresh_meta(name, raw_dir, cache_dir)
+    if meta is None:
+        meta = build_cache(name, raw_dir, cache_dir)
+    return meta
+
+def list_columns(name, raw_dir=RAW_DIR, cache_dir=CACHE_DIR):
+    """Return the column names of a raw dataset without loading any data."""
+    return [entry["name"] for entry in get_meta(name, raw_dir, cache_dir)["columns"]]
+
+def load_raw(name, columns=None, raw_dir=RAW_DIR, cache_dir=CACHE_DIR):
+    """
+    Load a raw dataset through the columnar cache.
+
+    Only the requested columns are read from disk, so long text columns such
+    as task_description are never decoded unless asked for.
+
+    Parameters:
+    -----------
+    name : str
+        File name inside the raw directory, e.g. "scores.csv"
+    columns : list of str, optional
+        Columns to load, in the order they should appear. Loads all columns
+        if None
+    raw_dir : Path, optional
+        Directory holding the raw files
+    cache_dir : Path, optional
+        Root directory of the cache
+
+    Returns:
+    --------
+    pandas.DataFrame
+        The requested columns, with categorical dtype for repetitive strings
+    """
+    meta = get_meta(name, raw_dir, cache_dir)
+    entries = {entry["name"]: entry for entry in meta["columns"]}
+
+    if columns is None:
+        columns = list(entries)
+    missing = [c for c in columns if c not in entries]
+    if missing:
+        raise KeyError(f"Columns not found in {name}: {missing}")
+
+    dataset_dir = Path(cache_dir) / name
+    data = {column: _read_column(entries[column], dataset_dir) for column in columns}
+    return pd.DataFrame(data, columns=columns, index=pd.RangeIndex(meta["num_rows"]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the columnar cache for the raw datasets")
+    parser.add_argument("names", nargs="*", help="Raw files to cache (default: all CSV/TSV files)")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the cache is fresh")
+    args = parser.parse_args()
+
+    names = args.names or sorted(p.name for p in RAW_DIR.iterdir() if p.suffix in (".csv", ".tsv"))
+    for name in names:
+        if args.force:
+            meta = build_cache(name)
+        else:
+            meta = get_meta(name)
+        kinds = {}
+        for entry in meta["columns"]:
+            kinds[entry["kind"]] = kinds.get(entry["kind"], 0) + 1
+        summary = ", ".join(f"{count} {kind}" for kind, count in sorted(kinds.items()))
+        print(f"Cached {name}: {meta['num_rows']} rows ({summary})")
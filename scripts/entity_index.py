@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Integer-keyed entity index shared by all analyses.
+
+The raw datasets key the same entities in different ways:
+
+- scores.csv: task_episode_id ("1_1_1") plus series/episode/task_id columns
+- imdb_ratings.csv, sentiment.csv: episode_id ("1_1")
+- taskmaster_histograms_corrected.csv: season/episode
+- taskmaster_uk_episodes.csv: "Series 1"/"Episode 1" strings
+- contestants.csv, Cont_lon_lat.tsv: contestant name
+
+This module assigns dense integer IDs to episodes, tasks and contestants and
+records, for every row of every dataset, which entity it belongs to (-1 when
+the row doesn't map, e.g. specials or Alex Horne). A cross-dataset join then
+becomes an array scatter/gather instead of a string merge:
+
+    index = load_entity_index()
+    ratings = scatter(index, "imdb_ratings.csv", "episode", imdb["imdb_rating"])
+    task_ratings = ratings[index["task_episode"]]
+
+Episodes are ordered by (series, episode), tasks by (series, episode, task_id)
+and contestants by (series, name), so contestant ID + 1 equals the
+ContestantID used in data/processed/scores_by_series.
+
+The index is persisted to data/cache/entity_index.npz and rebuilt when any
+source file changes.
+"""
+
+import re
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from data_loader import CACHE_DIR, RAW_DIR, get_meta, load_raw
+
+INDEX_NAME = "entity_index.npz"
+
+# Bump when the set of stored arrays changes so old indexes are rebuilt
+INDEX_VERSION = 1
+
+SOURCES = [
+    "scores.csv",
+    "imdb_ratings.csv",
+    "sentiment.csv",
+    "taskmaster_histograms_corrected.csv",
+    "taskmaster_uk_episodes.csv",
+    "contestants.csv",
+    "Cont_lon_lat.tsv"
+]
+
+def _episode_key(series, episode):
+    """Pack (series, episode) pairs into a single sortable integer key."""
+    return np.asarray(series, dtype=np.int64) * 1000 + np.asarray(episode, dtype=np.int64)
+
+def _split_episode_id(episode_ids):
+    """Split "series_episode" strings into two integer arrays."""
+    parts = pd.Series(episode_ids, dtype=str).str.split("_", expand=True).astype(int)
+    return parts[0].to_numpy(), parts[1].to_numpy()
+
+def _parse_numbered(labels, prefix):
+    """Extract N from labels like "Series N"; anything else (specials) maps to -1."""
+    pattern = re.compile(rf"^{prefix} (\d+)$")
+    numbers = np.full(len(labels), -1, dtype=np.int64)
+    for i, label in enumerate(labels):
+        match = pattern.match(str(label))
+        if match:
+            numbers[i] = int(match.group(1))
+    return numbers
+
+def _lookup(sorted_keys, keys):
+    """
+    Find the position of each key in a sorted key array.
+
+    Returns -1 for keys that are not present.
+    """
+    keys = np.asarray(keys)
+    pos = np.searchsorted(sorted_keys, keys)
+    pos = np.minimum(pos, len(sorted_keys) - 1)
+    found = sorted_keys[pos] == keys
+    return np.where(found, pos, -1).astype(np.int32)
+
+def _offsets(owner_ids, num_owners):
+    """CSR-style offsets for an array sorted by owner ID."""
+    counts = np.bincount(owner_ids, minlength=num_owners)
+    offsets = np.zeros(num_owners + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+def _source_hashes(raw_dir, cache_dir):
+    """SHA-256 of every source file, taken from the columnar cache metadata."""
+    return np.array([get_meta(name, raw_dir, cache_dir)["sha256"] for name in SOURCES])
+
+def build_entity_index(raw_dir=RAW_DIR, cache_dir=CACHE_DIR):
+    """
+    Build the entity index from the raw datasets.
+
+    Parameters:
+    -----------
+    raw_dir : Path, optional
+        Directory holding the raw files
+    cache_dir : Path, optional
+        Directory of the columnar cache
+
+    Returns:
+    --------
+    dict
+        Mapping of array name to numpy array. Entity tables are named
+        episode_*, task_* and contestant_*; per-row mappings are named
+        "<source file>:<entity>"
+    """
+    load = lambda name, columns: load_raw(name, columns=columns, raw_dir=raw_dir, cache_dir=cache_dir)
+
+    scores = load("scores.csv", ["series", "episode", "task_id", "contestant_name"])
+    imdb = load("imdb_ratings.csv", ["episode_id"])
+    sentiment = load("sentiment.csv", ["episode_id"])
+    histograms = load("taskmaster_histograms_corrected.csv", ["season", "episode"])
+    uk_episodes = load("taskmaster_uk_episodes.csv", ["series", "episode_num"])
+    contestants = load("contestants.csv", ["name", "series"])
+    locations = load("Cont_lon_lat.tsv", ["Contestant Name"])
+
+    imdb_series, imdb_episode = _split_episode_id(imdb["episode_id"])
+    sentiment_series, sentiment_episode = _split_episode_id(sentiment["episode_id"])
+    uk_series = _parse_numbered(uk_episodes["series"], "Series")
+    uk_episode = _parse_numbered(uk_episodes["episode_num"], "Episode")
+    uk_valid = (uk_series > 0) & (uk_episode > 0)
+
+    # Episodes: every (series, episode) pair seen in any dataset
+    episode_key = np.unique(np.concatenate([
+        _episode_key(scores["series"], scores["episode"]),
+        _episode_key(imdb_series, imdb_episode),
+        _episode_key(sentiment_series, sentiment_episode),
+        _episode_key(histograms["season"], histograms["episode"]),
+        _episode_key(uk_series[uk_valid], uk_episode[uk_valid])
+    ]))
+    num_episodes = len(episode_key)
+    episode_series = (episode_key // 1000).astype(np.int16)
+    episode_number = (episode_key % 1000).astype(np.int16)
+
+    # Tasks: one per task_id in scores.csv, ordered by episode then task_id
+    tasks = (scores[["series", "episode", "task_id"]].drop_duplicates("task_id")
+             .sort_values(["series", "episode", "task_id"], kind="mergesort"))
+    task_id = tasks["task_id"].to_numpy(dtype=np.int64)
+    task_episode = _lookup(episode_key, _episode_key(tasks["series"], tasks["episode"]))
+    task_order = np.argsort(task_id, kind="mergesort")
+    sorted_task_id = task_id[task_order]
+
+    # Contestants: regular contestants ordered by series, then name
+    roster = (pd.DataFrame({"name": contestants["name"].astype(str), "series": contestants["series"]})
+              .sort_values(["series", "name"], kind="mergesort"))
+    contestant_name = roster["name"].to_numpy(dtype=str)
+    contestant_series = roster["series"].to_numpy(dtype=np.int16)
+    name_order = np.argsort(contestant_name, kind="mergesort")
+    sorted_names = contestant_name[name_order]
+
+    def contestants_of(names):
+        pos = _lookup(sorted_names, np.asarray(names, dtype=str))
+        return np.where(pos >= 0, name_order[np.maximum(pos, 0)], -1).astype(np.int32)
+
+    def tasks_of(ids):
+        pos = _lookup(sorted_task_id, np.asarray(ids, dtype=np.int64))
+        return np.where(pos >= 0, task_order[np.maximum(pos, 0)], -1).astype(np.int32)
+
+    num_series = int(max(episode_series.max(), contestant_series.max()))
+    uk_episode_ids = np.full(len(uk_episodes), -1, dtype=np.int32)
+    uk_episode_ids[uk_valid] = _lookup(episode_key, _episode_key(uk_series[uk_valid], uk_episode[uk_valid]))
+
+    return {
+        "version": np.array(INDEX_VERSION),
+        "source_sha256": _source_hashes(raw_dir, cache_dir),
+
+        "episode_series": episode_series,
+        "episode_number": episode_number,
+        "episode_key": episode_key,
+        "episode_task_offsets": _offsets(task_episode, num_episodes),
+        "series_episode_offsets": _offsets(episode_series, num_series + 1),
+
+        "task_id": task_id,
+        "task_episode": task_episode,
+
+        "contestant_name": contestant_name,
+        "contestant_series": contestant_series,
+        "series_contestant_offsets": _offsets(contestant_series, num_series + 1),
+
+        "scores.csv:episode": _lookup(episode_key, _episode_key(scores["series"], scores["episode"])),
+        "scores.csv:task": tasks_of(scores["task_id"]),
+        "scores.csv:contestant": contestants_of(scores["contestant_name"].astype(str)),
+        "imdb_ratings.csv:episode": _lookup(episode_key, _episode_key(imdb_series, imdb_episode)),
+        "sentiment.csv:episode": _lookup(episode_key, _episode_key(sentiment_series, sentiment_episode)),
+        "taskmaster_histograms_corrected.csv:episode": _lookup(
+            episode_key, _episode_key(histograms["season"], histograms["episode"])),
+        "taskmaster_uk_episodes.csv:episode": uk_episode_ids,
+        "contestants.csv:contestant": contestants_of(contestants["name"].astype(str)),
+        "Cont_lon_lat.tsv:contestant": contestants_of(locations["Contestant Name"].astype(str))
+    }
+
+def load_entity_index(raw_dir=RAW_DIR, cache_dir=CACHE_DIR, rebuild=False):
+    """
+    Load the persisted entity index, rebuilding it if any source changed.
+
+    Parameters:
+    -----------
+    raw_dir : Path, optional
+        Directory holding the raw files
+    cache_dir : Path, optional
+        Directory where the index is stored
+    rebuild : bool, optional
+        Force a rebuild even if the stored index is fresh
+
+    Returns:
+    --------
+    dict
+        Mapping of array name to numpy array (see build_entity_index)
+    """
+    index_path = Path(cache_dir) / INDEX_NAME
+
+    if index_path.exists() and not rebuild:
+        with np.load(index_path) as stored:
+            index = {name: stored[name] for name in stored.files}
+        fresh = (int(index["version"]) == INDEX_VERSION
+                 and np.array_equal(index["source_sha256"], _source_hashes(raw_dir, cache_dir)))
+        if fresh:
+            return index
+
+    index = build_entity_index(raw_dir, cache_dir)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_suffix(".tmp.npz")
+    np.savez(tmp_path, **index)
+    tmp_path.replace(index_path)
+    return index
+
+def row_ids(index, source, entity):
+    """
+    Return the entity ID of every row of a raw dataset.
+
+    Parameters:
+    -----------
+    index : dict
+        Entity index from load_entity_index
+    source : str
+        Raw file name, e.g. "imdb_ratings.csv"
+    entity : str
+        "episode", "task" or "contestant"
+
+    Returns:
+    --------
+    numpy.ndarray
+        int32 IDs, -1 for rows that don't map to an entity
+    """
+    return index[f"{source}:{entity}"]
+
+def num_entities(index, entity):
+    """Number of episodes, tasks or contestants in the index."""
+    return len(index[{"episode": "episode_key", "task": "task_id", "contestant": "contestant_name"}[entity]])
+
+def scatter(index, source, entity, values, fill=np.nan):
+    """
+    Place per-row values of a dataset into a dense per-entity array.
+
+    Rows that don't map to an entity are dropped; entities with no row get
+    the fill value. If several rows map to the same entity the last one wins.
+
+    Parameters:
+    -----------
+    index : dict
+        Entity index from load_entity_index
+    source : str
+        Raw file name the values came from
+    entity : str
+        "episode", "task" or "contestant"
+    values : array-like
+        One value per row of the source dataset
+    fill : scalar, optional
+        Value for entities without a row
+
+    Returns:
+    --------
+    numpy.ndarray
+        Array of length num_entities(index, entity)
+    """
+    ids = row_ids(index, source, entity)
+    values = np.asarray(values)
+    out = np.full(num_entities(index, entity), fill, dtype=np.result_type(values.dtype, np.asarray(fill).dtype))
+    mapped = ids >= 0
+    out[ids[mapped]] = values[mapped]
+    return out
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the integer-keyed entity index")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild even if the index is fresh")
+    args = parser.parse_args()
+
+    index = load_entity_index(rebuild=args.rebuild)
+    print(f"Episodes: {num_entities(index, 'episode')}")
+    print(f"Tasks: {num_entities(index, 'task')}")
+    print(f"Contestants: {num_entities(index, 'contestant')}")
+    for name in sorted(k for k in index if ":" in k):
+        ids = index[name]
+        print(f"  {name}: {int((ids >= 0).sum())}/{len(ids)} rows mapped")
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store for rendered figures.
+
+Every figure file is stored once under figures/.store/objects/, named by the
+SHA-256 of its contents. The familiar paths (figures/main/Fig1a.png,
+figures/supplementary/S3_Fig_series9.png, ...) are recorded in
+figures/manifest.json with the hash of their object. Named paths are
+tracked files, so they stay independent copies: they are never linked to the
+store or to each other, and an alias is written as a copy of the stored
+object (a reflink where the filesystem supports it, which shares blocks
+without sharing the file).
+
+The store also keeps low-resolution preview variants of each object. A draft
+tree with the same layout as figures/ but pointing at the previews can be
+materialized for fast draft LaTeX builds, while the full-resolution masters
+are used for the final submission.
+
+Usage:
+    python scripts/figure_store.py ingest figures/main figures/supplementary
+    python scripts/figure_store.py status
+    python scripts/figure_store.py draft --dpi 100
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+FIGURES_DIR = REPO_ROOT / "figures"
+STORE_DIR = FIGURES_DIR / ".store"
+MANIFEST_PATH = FIGURES_DIR / "manifest.json"
+
+# Resolution assumed for masters whose file doesn't record one, as set in
+# config/plot_config.yaml
+MASTER_DPI = 450
+
+# Default resolution of preview variants
+PREVIEW_DPI = 90
+
+FIGURE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+
+# ioctl request that clones a file's extents on Linux (btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+def file_hash(path):
+    """SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def object_path(digest, suffix=".png"):
+    """Location of a stored master object."""
+    return STORE_DIR / "objects" / digest[:2] / f"{digest}{suffix}"
+
+def preview_path(digest, dpi=PREVIEW_DPI, suffix=".png"):
+    """Location of a stored preview variant."""
+    return STORE_DIR / "previews" / str(dpi) / digest[:2] / f"{digest}{suffix}"
+
+def load_manifest():
+    """Return the manifest mapping repo-relative figure paths to object hashes."""
+    try:
+        with open(MANIFEST_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest):
+    """Write the manifest atomically."""
+    tmp_path = MANIFEST_PATH.with_name(MANIFEST_PATH.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def _copy(source, tmp_path):
+    """Copy source to a new file, as a reflink when the filesystem allows it."""
+    if sys.platform.startswith("linux"):
+        import fcntl
+        with open(source, "rb") as src, open(tmp_path, "wb") as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                shutil.copystat(source, tmp_path)
+                return
+            except OSError:
+                pass
+    shutil.copy2(source, tmp_path)
+
+def _place(source, dest, mode="copy"):
+    """
+    Atomically replace dest with the contents of source.
+
+    "copy" gives dest its own inode and is the only mode used for named
+    figure paths. "hardlink" is reserved for untracked trees built from the
+    store, such as the draft tree, and falls back to a copy.
+    """
+    tmp_path = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    if tmp_path.exists() or tmp_path.is_symlink():
+        tmp_path.unlink()
+    if mode == "hardlink":
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            # Different filesystem or no hard link support
+            _copy(source, tmp_path)
+    else:
+        _copy(source, tmp_path)
+    os.replace(tmp_path, dest)
+
+def store_file(path, mode="copy", manifest=None):
+    """
+    Add one figure file to the store and record its named path.
+
+    The named path keeps its own copy of the figure. If it is still a hard
+    link left by an older version of the store, it is turned back into an
+    independent copy.
+
+    Parameters:
+    -----------
+    path : str or Path
+        Figure file inside the figures directory
+    mode : str, optional
+        "copy" to repair named paths that are linked to other files, or
+        "none" to leave them untouched
+    manifest : dict, optional
+        Manifest to update; loaded and saved automatically if None
+
+    Returns:
+    --------
+    str
+        Hash of the stored object
+    """
+    own_manifest = manifest is None
+    if own_manifest:
+        manifest = load_manifest()
+
+    path = Path(path).resolve()
+    digest = file_hash(path)
+    target = object_path(digest, path.suffix)
+
+    if not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_target = target.with_name(target.name + ".tmp")
+        shutil.copy2(path, tmp_target)
+        os.replace(tmp_target, target)
+
+    if mode != "none" and path.stat().st_nlink > 1:
+        _place(target, path)
+
+    manifest[str(path.relative_to(REPO_ROOT))] = digest
+    if own_manifest:
+        save_manifest(manifest)
+    return digest
+
+def link_alias(path, alias, mode="copy", manifest=None):
+    """
+    Give another named path a copy of the object already stored for path.
+
+    Parameters:
+    -----------
+    path : str or Path
+        Figure file that has been stored with store_file
+    alias : str or Path
+        Named path that should hold the same figure
+    mode : str, optional
+        "copy", or "none" to only record the alias in the manifest
+    manifest : dict, optional
+        Manifest to update; loaded and saved automatically if None
+
+    Returns:
+    --------
+    str
+        Hash of the shared object
+    """
+    own_manifest = manifest is None
+    if own_manifest:
+        manifest = load_manifest()
+
+    path = Path(path).resolve()
+    alias = Path(alias).resolve()
+    digest = manifest.get(str(path.relative_to(REPO_ROOT))) or file_hash(path)
+    target = object_path(digest, path.suffix)
+
+    alias.parent.mkdir(parents=True, exist_ok=True)
+    if mode != "none" and (not alias.exists() or alias.stat().st_nlink > 1
+                           or file_hash(alias) != digest):
+        _place(target, alias)
+
+    manifest[str(alias.relative_to(REPO_ROOT))] = digest
+    if own_manifest:
+        save_manifest(manifest)
+    return digest
+
+def ingest(paths, mode="copy"):
+    """
+    Add figure files (or every figure under directories) to the store.
+
+    Parameters:
+    -----------
+    paths : list of str or Path
+        Files or directories to ingest
+    mode : str, optional
+        "copy" or "none" for the named paths, see store_file
+
+    Returns:
+    --------
+    dict
+        Statistics: files seen, unique objects, and duplicate_bytes, the size
+        of files whose contents were already stored under another path
+    """
+    manifest = load_manifest()
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*")
+                                if p.suffix.lower() in FIGURE_EXTENSIONS and ".store" not in p.parts))
+        else:
+            files.append(path)
+
+    digests = {}
+    duplicate_bytes = 0
+    for path in files:
+        size = path.stat().st_size
+        digest = store_file(path, mode=mode, manifest=manifest)
+        if digest in digests:
+            duplicate_bytes += size
+        digests.setdefault(digest, []).append(path)
+
+    save_manifest(manifest)
+    return {"files": len(files), "objects": len(digests), "duplicate_bytes": duplicate_bytes}
+
+def make_preview(digest, dpi=PREVIEW_DPI, suffix=".png"):
+    """
+    Create (or reuse) a low-resolution variant of a stored master.
+
+    The image is scaled by dpi over the resolution recorded in the master
+    (MASTER_DPI if it has none), so its physical size in the PDF is
+    unchanged.
+
+    Returns:
+    --------
+    Path
+        Path of the preview file
+    """
+    from PIL import Image
+
+    target = preview_path(digest, dpi, suffix)
+    if target.exists():
+        return target
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with Image.open(object_path(digest, suffix)) as image:
+        master_dpi = image.info.get("dpi", (MASTER_DPI, MASTER_DPI))[0]
+        scale = dpi / float(master_dpi)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        preview = image.resize(size, Image.LANCZOS)
+        tmp_target = target.with_name(target.name + ".tmp" + suffix)
+        preview.save(tmp_target, dpi=(dpi, dpi))
+    os.replace(tmp_target, target)
+    return target
+
+def materialize(dest_dir, variant="preview", dpi=PREVIEW_DPI):
+    """
+    Build a tree of figure paths pointing at masters or previews.
+
+    The tree mirrors the repo-relative manifest paths under dest_dir, e.g.
+    dest_dir/figures/main/Fig2.png, so it can be put ahead of the source
+    directory on TEXINPUTS for a draft build. The tree is untracked and is
+    only read by LaTeX, so its files are hard links to the store objects.
+
+    Parameters:
+    -----------
+    dest_dir : str or Path
+        Root of the tree to create
+    variant : str, optional
+        "preview" or "master"
+    dpi : int, optional
+        Preview resolution
+
+    Returns:
+    --------
+    int
+        Number of figure paths written
+    """
+    dest_dir = Path(dest_dir)
+    count = 0
+    for name, digest in load_manifest().items():
+        suffix = Path(name).suffix
+        source = make_preview(digest, dpi, suffix) if variant == "preview" else object_path(digest, suffix)
+        link_path = dest_dir / name
+        link_path.parent.mkdir(parents=True, exist_ok=True)
+        _place(source, link_path, "hardlink")
+        count += 1
+    return count
+
+def status():
+    """
+    Check that every manifest entry matches its stored object.
+
+    Returns:
+    --------
+    list of str
+        Paths whose file is missing or differs from the stored object
+    """
+    problems = []
+    for name, digest in sorted(load_manifest().items()):
+        path = REPO_ROOT / name
+        if not path.exists() or file_hash(path) != digest:
+            problems.append(name)
+    return problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Content-addressed figure store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Add figures to the store")
+    ingest_parser.add_argument("paths", nargs="*", default=[str(FIGURES_DIR)])
+    ingest_parser.add_argument("--mode", choices=["copy", "none"], default="copy")
+
+    draft_parser = subparsers.add_parser("draft", help="Build a preview tree for draft compiles")
+    draft_parser.add_argument("--dest", default=str(STORE_DIR / "draft"))
+    draft_parser.add_argument("--dpi", type=int, default=PREVIEW_DPI)
+
+    subparsers.add_parser("status", help="Check named figures against the store")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        stats = ingest(args.paths, mode=args.mode)
+        print(f"Stored {stats['files']} figures as {stats['objects']} objects "
+              f"({stats['duplicate_bytes'] / (1024 * 1024):.1f} MB in files identical to another)")
+    elif args.command == "draft":
+        count = materialize(args.dest, dpi=args.dpi)
+        print(f"Linked {count} preview figures under {args.dest}")
+    else:
+        problems = status()
+        for name in problems:
+            print(f"Changed or missing: {name}")
+        print(f"{len(load_manifest()) - len(problems)} figures match the store")
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Lightweight instrumentation for the pipeline scripts.
+
+Stage timers, counters, histograms and resident-memory sampling, exported as
+a JSON summary and a Chrome trace (open it at chrome://tracing or
+https://ui.perfetto.dev):
+
+    from instrumentation import count, observe, stage, timed
+
+    with stage("scores.build", series=18):
+        ...
+
+    @timed("figures.render")
+    def render(...):
+        ...
+
+    count("llm.cache_hits")
+    observe("pdflatex.pass_seconds", 1.7)
+
+Instrumentation is off unless enable() is called or the TASKMASTER_INSTRUMENT
+environment variable names an output directory, in which case it is enabled
+on import and telemetry_summary.json and trace.json are written there when
+the process exits. While disabled every call returns after a single check of
+a module global, so the hooks can stay in hot paths.
+
+While enabled, a background thread samples the resident set size; each
+stage records the peak RSS seen while it was open, and the samples appear
+as a counter track in the trace. The track keeps at most MAX_RSS_SAMPLES
+points per process: once full, every other point is dropped and later
+samples are kept at half the rate, so long runs stay bounded.
+
+Worker processes record into their own recorder. Return drain() from the
+worker and merge() it in the parent to get one summary and trace for the
+whole run.
+
+Usage:
+    TASKMASTER_INSTRUMENT=.build/telemetry python scripts/compile_submission.py
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import bisect
+import threading
+import functools
+import inspect
+from pathlib import Path
+
+ENV_VAR = "TASKMASTER_INSTRUMENT"
+
+SUMMARY_NAME = "telemetry_summary.json"
+TRACE_NAME = "trace.json"
+
+# Seconds between resident-memory samples
+SAMPLE_INTERVAL = 0.05
+
+# Resident-memory points kept in the trace per process before thinning
+MAX_RSS_SAMPLES = 2000
+
+# Upper bounds of the histogram buckets: 1 ms to ~2.3 h, doubling
+BUCKET_BOUNDS = [0.001 * 2 ** i for i in range(24)]
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+def current_rss_mb():
+    """Resident set size of this process in MB (peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KB elsewhere
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+class Histogram:
+    """Bucketed distribution of observed values with exact count, sum, min and max."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def add(self, value):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        """Add the observations of another histogram (or its as_dict form)."""
+        if isinstance(other, dict):
+            for i, n in enumerate(other["buckets"]):
+                self.buckets[i] += n
+            self.count += other["count"]
+            self.total += other["sum"]
+            if other["count"]:
+                self.min = min(self.min, other["min"])
+                self.max = max(self.max, other["max"])
+            return
+        self.merge(other.as_dict())
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding quantile q (clipped to the observed range)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                bound = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                return min(max(bound, self.min), self.max)
+        return self.max
+
+    def as_dict(self):
+        empty = not self.count
+        return {"count": self.count, "sum": self.total, "min": None if empty else self.min,
+                "max": None if empty else self.max, "mean": None if empty else self.total / self.count,
+                "p50": self.quantile(0.5), "p90": self.quantile(0.9), "p99": self.quantile(0.99),
+                "buckets": list(self.buckets)}
+
+class Recorder:
+    """Collects the events, counters and histograms of one process."""
+
+    def __init__(self, sample_interval=SAMPLE_INTERVAL):
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+        self.wall_start = time.time()
+        self.events = []
+        # RSS counter events, thinned separately from the stage events
+        self.rss_events = []
+        self._rss_stride = 1
+        self._rss_pending = 0
+        self.counters = {}
+        self.histograms = {}
+        self.peak_rss_mb = self.last_rss_mb = current_rss_mb()
+        # Peak RSS of worker processes whose recordings were merged in
+        self.worker_peak_rss_mb = {}
+        self._open = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sample_interval = sample_interval
+        self._sampler = None
+        if sample_interval:
+            self._sampler = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+            self._sampler.start()
+
+    def _now_us(self):
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def _sample(self):
+        while not self._stop.wait(self._sample_interval):
+            rss = current_rss_mb()
+            with self._lock:
+                self.last_rss_mb = rss
+                self.peak_rss_mb = max(self.peak_rss_mb, rss)
+                for record in self._open:
+                    record.peak_rss_mb = max(record.peak_rss_mb, rss)
+                self._rss_pending += 1
+                if self._rss_pending < self._rss_stride:
+                    continue
+                self._rss_pending = 0
+                self.rss_events.append({"name": "rss_mb", "ph": "C", "ts": self._now_us(), "pid": self.pid,
+                                        "args": {"rss_mb": round(rss, 1)}})
+                if len(self.rss_events) >= MAX_RSS_SAMPLES:
+                    del self.rss_events[1::2]
+                    self._rss_stride *= 2
+
+    def trace_events(self):
+        """Stage and RSS events, for the trace (call with the lock held)."""
+        return self.events + self.rss_events
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def open_stage(self, record):
+        with self._lock:
+            self._open.add(record)
+
+    def close_stage(self, record, seconds, error):
+        with self._lock:
+            self._open.discard(record)
+            args = dict(record.args, peak_rss_mb=round(max(record.peak_rss_mb, self.last_rss_mb), 1))
+            if error is not None:
+                args["error"] = error
+            self.events.append({"name": record.name, "cat": "stage", "ph": "X", "ts": record.start_us,
+                                "dur": seconds * 1e6, "pid": self.pid, "tid": record.tid, "args": args})
+
+    def _histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        with self._lock:
+            self._histogram(name).add(value)
+
+class _Stage:
+    """Open stage: times itself and tracks the peak RSS while it runs."""
+
+    __slots__ = ("recorder", "name", "args", "start", "start_us", "tid", "peak_rss_mb")
+
+    def __init__(self, recorder, name, args):
+        self.recorder = recorder
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.tid = threading.get_ident()
+        # Latest sample; reading /proc here would cost more than short stages take
+        self.peak_rss_mb = self.recorder.last_rss_mb
+        self.start_us = self.recorder._now_us()
+        self.start = time.perf_counter()
+        self.recorder.open_stage(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        self.recorder.close_stage(self, seconds, None if exc_type is None else exc_type.__name__)
+        return False
+
+class _NullStage:
+    """Stage returned while instrumentation is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+_recorder = None
+_outputs = None
+# Process whose exit handler is registered
+_atexit_pid = None
+
+def enabled():
+    """Whether instrumentation is recording in this process."""
+    return _recorder is not None
+
+def enable(output_dir=None, sample_interval=SAMPLE_INTERVAL):
+    """
+    Start recording in this process.
+
+    Parameters:
+    -----------
+    output_dir : str or Path, optional
+        Directory receiving the summary and trace when the process exits;
+        None to only record (call write() yourself)
+    sample_interval : float, optional
+        Seconds between RSS samples, 0 to disable sampling
+    """
+    global _recorder, _outputs, _atexit_pid
+    if _recorder is not None:
+        _recorder.stop()
+    _recorder = Recorder(sample_interval)
+    _outputs = None if output_dir is None else Path(output_dir).resolve()
+    if _outputs is not None and _atexit_pid != _recorder.pid:
+        # One handler per process; it writes to whatever _outputs is at exit
+        atexit.register(_write_at_exit, _recorder.pid)
+        _atexit_pid = _recorder.pid
+
+def disable():
+    """Stop recording and discard everything recorded."""
+    global _recorder, _outputs
+    if _recorder is not None:
+        _recorder.stop()
+    _recorder = None
+    _outputs = None
+
+def stage(name, **args):
+    """
+    Context manager timing a named stage.
+
+    Keyword arguments are attached to the stage's trace event.
+    """
+    if _recorder is None:
+        return _NULL_STAGE
+    return _Stage(_recorder, name, args)
+
+def timed(name=None):
+    """
+    Decorator timing every call of a function (or coroutine function) as a stage.
+
+    Parameters:
+    -----------
+    name : str, optional
+        Stage name, default is the function's qualified name
+    """
+    def decorate(func):
+        stage_name = name or func.__qualname__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _recorder is None:
+                    return await func(*args, **kwargs)
+                with _Stage(_recorder, stage_name, {}):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return func(*args, **kwargs)
+            with _Stage(_recorder, stage_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def count(name, value=1):
+    """Add value to a named counter."""
+    if _recorder is not None:
+        _recorder.count(name, value)
+
+def observe(name, value):
+    """Add one observation to a named histogram."""
+    if _recorder is not None:
+        _recorder.observe(name, value)
+
+def record_llm_request(seconds, prompt_tokens=0, completion_tokens=0, error=None):
+    """
+    Record one LLM request: latency histogram, token counters and errors.
+
+    Parameters:
+    -----------
+    seconds : float
+        Request latency
+    prompt_tokens, completion_tokens : int, optional
+        Tokens sent and received
+    error : str, optional
+        Exception type name if the request failed
+    """
+    if _recorder is None:
+        return
+    _recorder.observe("llm.latency_seconds", seconds)
+    _recorder.count("llm.requests", 1)
+    _recorder.count("llm.prompt_tokens", prompt_tokens)
+    _recorder.count("llm.completion_tokens", completion_tokens)
+    if error is not None:
+        _recorder.count("llm.errors", 1)
+        _recorder.count(f"llm.errors.{error}", 1)
+
+def drain():
+    """
+    Hand over everything recorded so far in this process and start afresh.
+
+    Returns None while disabled. The result is plain data, so a worker process
+    can return it to the parent for merge().
+    """
+    global _recorder
+    if _recorder is None:
+        return None
+    recorder = _recorder
+    recorder.stop()
+    _recorder = Recorder(recorder._sample_interval)
+    return {"pid": recorder.pid, "events": recorder.trace_events(), "counters": recorder.counters,
+            "histograms": {name: h.as_dict() for name, h in recorder.histograms.items()},
+            "peak_rss_mb": recorder.peak_rss_mb, "wall_start": recorder.wall_start}
+
+def merge(drained):
+    """Add the output of drain() from another process to this process's recording."""
+    if _recorder is None or not drained:
+        return
+    # Move the worker's timestamps onto this process's clock
+    shift_us = (drained["wall_start"] - _recorder.wall_start) * 1e6
+    with _recorder._lock:
+        for event in drained["events"]:
+            _recorder.events.append(dict(event, ts=event["ts"] + shift_us))
+        for name, value in drained["counters"].items():
+            _recorder.counters[name] = _recorder.counters.get(name, 0) + value
+        for name, histogram in drained["histograms"].items():
+            _recorder._histogram(name).merge(histogram)
+        peaks = _recorder.worker_peak_rss_mb
+        peaks[drained["pid"]] = max(peaks.get(drained["pid"], 0.0), drained["peak_rss_mb"])
+
+def summary():
+    """
+    Aggregated view of the recording.
+
+    Returns:
+    --------
+    dict
+        Stage timings (count, total, mean, max, peak RSS), counters,
+        histograms, derived LLM metrics and peak RSS per process; None while
+        disabled
+    """
+    if _recorder is None:
+        return None
+    with _recorder._lock:
+        stages = {}
+        for event in _recorder.events:
+            if event["ph"] != "X":
+                continue
+            entry = stages.setdefault(event["name"], {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                                                      "peak_rss_mb": 0.0})
+            seconds = event["dur"] / 1e6
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["peak_rss_mb"] = max(entry["peak_rss_mb"], event["args"]["peak_rss_mb"])
+        for entry in stages.values():
+            entry["mean_seconds"] = entry["total_seconds"] / entry["count"]
+
+        counters = dict(_recorder.counters)
+        histograms = {name: h.as_dict() for name, h in _recorder.histograms.items()}
+        processes = {str(_recorder.pid): round(_recorder.peak_rss_mb, 1)}
+        for pid, peak in _recorder.worker_peak_rss_mb.items():
+            processes[str(pid)] = round(peak, 1)
+
+    llm = {}
+    lookups = counters.get("llm.cache_hits", 0) + counters.get("llm.cache_misses", 0)
+    if lookups:
+        llm["cache_hit_rate"] = counters.get("llm.cache_hits", 0) / lookups
+    if counters.get("llm.requests"):
+        llm["retry_rate"] = counters.get("llm.retries", 0) / counters["llm.requests"]
+        llm["error_rate"] = counters.get("llm.errors", 0) / counters["llm.requests"]
+
+    return {"started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(_recorder.wall_start)),
+            "wall_seconds": time.perf_counter() - _recorder.origin, "stages": stages, "counters": counters,
+            "histograms": histograms, "llm": llm, "peak_rss_mb": processes}
+
+def write(output_dir):
+    """
+    Write the JSON summary and the Chrome trace to output_dir.
+
+    Returns:
+    --------
+    tuple
+        (summary path, trace path), or None while disabled
+    """
+    if _recorder is None:
+        return None
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with _recorder._lock:
+        trace = {"traceEvents": _recorder.trace_events(), "displayTimeUnit": "ms"}
+    paths = []
+    for name, payload in [(SUMMARY_NAME, summary()), (TRACE_NAME, trace)]:
+        path = output_dir / name
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f, indent=2 if name == SUMMARY_NAME else None)
+        os.replace(tmp_path, path)
+        paths.append(path)
+    return tuple(paths)
+
+def _write_at_exit(pid):
+    """Write the outputs of the process that enabled instrumentation."""
+    # Forked children inherit the handler but not the responsibility
+    if _recorder is not None and _outputs is not None and os.getpid() == pid:
+        _recorder.stop()
+        write(_outputs)
+
+def _reset_in_child():
+    """Give a forked child an empty recording of its own."""
+    global _recorder, _outputs
+    if _recorder is not None:
+        _recorder = Recorder(_recorder._sample_interval)
+        _outputs = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_in_child)
+
+# Processes started with the variable set (including spawned workers, which
+# inherit it) record; only the process that set it writes the outputs
+if os.environ.get(ENV_VAR):
+    _owner = os.environ.setdefault(f"{ENV_VAR}_OWNER", str(os.getpid()))
+    enable(os.environ[ENV_VAR] if _owner == str(os.getpid()) else None)
@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the whole analysis-to-PDF pipeline.
+
+Every stage is declared with the repository files it reads and writes:
+
+    raw data -> per-series score matrices -> analyses -> figures
+    scripts -> sentiment scores -> episode sentiment table -> analyses
+    figures -> promoted figures -> submission PDFs
+
+The DAG is derived from those declarations: a stage runs after every stage
+producing one of its inputs. Stages whose upstream stages are done run
+concurrently, each in its own worker process with its own working
+directory, so scripts that chdir (compile_submission) don't interfere with
+the others.
+
+A stage is skipped when its outputs exist and its inputs (data, code and
+parameters) hash to the same key as its last successful run. A stage that
+reruns but writes identical outputs therefore doesn't invalidate what comes
+after it, and a refresh after a new episode redoes only the affected work.
+Stages needing something this machine lacks (an API key, pdflatex) are
+reported as unavailable and their downstream stages use the existing files.
+
+The per-script scores in data/analysis are written into the episode-level
+sentiment table the analyses read (data/raw/sentiment.csv). The figures
+stage renders into the untracked figures/rendered/ tree (see
+render_figures.py) and the PDFs are built from the committed figures. The
+promote_figures stage, which copies rendered figures over the committed
+ones, only runs with --promote-figures; otherwise the PDFs use the committed
+figures as they are.
+
+Usage:
+    python scripts/pipeline.py                        # refresh everything stale
+    python scripts/pipeline.py --until figures        # figures and what they need
+    python scripts/pipeline.py --only pdfs --force
+    python scripts/pipeline.py --until pdfs --promote-figures
+    python scripts/pipeline.py --list
+"""
+
+import io
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import fnmatch
+import hashlib
+import argparse
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import instrumentation
+from data_loader import REPO_ROOT
+
+# Last successful run key of every stage
+PIPELINE_STATE = REPO_ROOT / "data" / "processed" / ".pipeline_state.json"
+
+SERIES = range(1, 19)
+
+# Raw tables behind the episode feature matrix of rating_model_cv
+FEATURE_INPUTS = ["data/raw/contestants.csv", "data/raw/imdb_ratings.csv", "data/raw/sentiment.csv",
+                  "data/raw/taskmaster_UK_tasks.csv", "scripts/rating_model_cv.py"]
+
+# Helpers imported by every stage; a change to them invalidates all stages
+COMMON_CODE = ["scripts/data_loader.py", "scripts/instrumentation.py"]
+
+# Modules behind the sentiment stage
+SENTIMENT_CODE = ["scripts/sentiment_analysis.py", "scripts/sentiment_scheduler.py", "scripts/sentiment_cache.py",
+                  "scripts/sentiment_journal.py"]
+
+SCORE_MATRICES = [f"data/processed/scores_by_series/series_{s}_scores.csv" for s in SERIES]
+
+DOCUMENTS = ["Manuscript.pdf", "Response to Reviewers.pdf", "Supporting Information.pdf",
+             "Revised Manuscript with Track Changes.pdf"]
+
+@dataclass
+class StageSpec:
+    """A pipeline stage: what it reads, what it writes and how to run it."""
+    name: str
+    run: Callable[..., Any]
+    inputs: List[str]
+    outputs: List[str]
+    params: Dict[str, Any] = field(default_factory=dict)
+    requires: Optional[Callable[[], Optional[str]]] = None
+
+STAGES: Dict[str, StageSpec] = {}
+
+def add_stage(name, run, inputs, outputs, requires=None, **params):
+    """
+    Register a stage.
+
+    Parameters:
+    -----------
+    name : str
+        Unique stage name
+    run : callable
+        Module-level function called as run(**params) in a worker process.
+        It may return a short summary string, which is reported by the runner
+    inputs : list of str
+        Repository-relative files or glob patterns the stage reads,
+        including the code it runs; COMMON_CODE is added to every stage
+    outputs : list of str
+        Repository-relative files or glob patterns the stage writes
+    requires : callable, optional
+        Returns None if the stage can run on this machine, or the reason it
+        can't
+    **params
+        Keyword arguments for the run function
+    """
+    if name in STAGES:
+        raise ValueError(f"Stage {name} is already registered")
+    inputs = list(inputs) + [path for path in COMMON_CODE if path not in inputs]
+    STAGES[name] = StageSpec(name, run, inputs, list(outputs), params, requires)
+
+def _overlaps(output, pattern):
+    """Whether an output path or pattern can be the file an input names."""
+    return fnmatch.fnmatch(output, pattern) or fnmatch.fnmatch(pattern, output)
+
+def upstream(name):
+    """Stages writing a file the given stage reads."""
+    spec = STAGES[name]
+    return [other.name for other in STAGES.values() if other.name != name
+            and any(_overlaps(output, pattern) for output in other.outputs for pattern in spec.inputs)]
+
+def topological_order(names=None):
+    """
+    Registered stages (default: all) in dependency order.
+
+    Raises ValueError if the declared inputs and outputs form a cycle.
+    """
+    names = list(STAGES) if names is None else list(names)
+    remaining = {name: set(upstream(name)) & set(names) for name in names}
+    order = []
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Stages form a cycle: {sorted(remaining)}")
+        for name in ready:
+            order.append(name)
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return order
+
+def ancestors(names):
+    """The given stages and every stage they transitively depend on."""
+    selected = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(upstream(name))
+    return selected
+
+def _expand(pattern):
+    """Existing repository files matching a path or glob pattern."""
+    if glob.has_magic(pattern):
+        return sorted(str(Path(path).relative_to(REPO_ROOT)) for path in glob.glob(str(REPO_ROOT / pattern)))
+    return [pattern] if (REPO_ROOT / pattern).exists() else []
+
+def _file_hash(path):
+    """SHA-256 of a file's contents, or a marker if it doesn't exist."""
+    path = Path(path)
+    if not path.exists():
+        return "missing"
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def stage_key(spec):
+    """Hash every input file of a stage and its parameters."""
+    digest = hashlib.sha256()
+    for pattern in spec.inputs:
+        paths = _expand(pattern)
+        digest.update(f"{pattern}:{len(paths)}\n".encode())
+        for path in paths:
+            digest.update(f"{path}:{_file_hash(REPO_ROOT / path)}\n".encode())
+    digest.update(json.dumps(spec.params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+def outputs_exist(spec):
+    """Whether every declared output (at least one match per pattern) exists."""
+    return all(_expand(pattern) for pattern in spec.outputs)
+
+def _load_state():
+    try:
+        with open(PIPELINE_STATE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_state(state):
+    PIPELINE_STATE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = PIPELINE_STATE.with_name(PIPELINE_STATE.name + ".tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, PIPELINE_STATE)
+
+def _run_stage(name):
+    """Run one stage with captured output (runs in a worker process)."""
+    spec = STAGES[name]
+    log = io.StringIO()
+    previous = os.getcwd()
+    start = time.time()
+    try:
+        os.chdir(REPO_ROOT)
+        with redirect_stdout(log), redirect_stderr(log), instrumentation.stage(f"pipeline.{name}"):
+            summary = spec.run(**spec.params)
+        error = None
+    except Exception:
+        summary = None
+        error = traceback.format_exc()
+    finally:
+        os.chdir(previous)
+    return {"name": name, "success": error is None, "seconds": time.time() - start, "summary": summary,
+            "error": error, "log": log.getvalue(), "telemetry": instrumentation.drain()}
+
+def run_pipeline(names=None, max_workers=None, force=False, dry_run=False):
+    """
+    Run the selected stages in dependency order, concurrently where possible.
+
+    Upstream stages outside the selection are not run; their existing
+    outputs are used as they are.
+
+    Parameters:
+    -----------
+    names : iterable of str, optional
+        Stages to consider, default is every registered stage
+    max_workers : int, optional
+        Number of stages running at once, default is the number of CPUs
+    force : bool, optional
+        Run stages even if their key is unchanged
+    dry_run : bool, optional
+        Only report which stages are stale now; stages downstream of a stale
+        one may become stale once it has run
+
+    Returns:
+    --------
+    list of dict
+        One result per stage with name, status (ran, failed, skipped,
+        unavailable, blocked or stale on a dry run), seconds, summary and
+        error
+    """
+    names = list(STAGES) if names is None else list(names)
+    unknown = [name for name in names if name not in STAGES]
+    if unknown:
+        raise KeyError(f"Unknown stages: {unknown}")
+    order = topological_order(names)
+    deps = {name: set(upstream(name)) & set(order) for name in order}
+
+    state = _load_state()
+    results = {}
+    keys = {}
+
+    def settle(name):
+        """Resolve a stage that doesn't need a worker, or return its key."""
+        spec = STAGES[name]
+        failed = [dep for dep in deps[name] if results[dep]["status"] in ("failed", "blocked")]
+        if failed:
+            results[name] = {"name": name, "status": "blocked", "error": f"{', '.join(failed)} failed"}
+            return None
+        reason = spec.requires() if spec.requires else None
+        if reason:
+            results[name] = {"name": name, "status": "unavailable", "error": reason}
+            return None
+        key = stage_key(spec)
+        if not force and outputs_exist(spec) and state.get(name) == key:
+            results[name] = {"name": name, "status": "skipped"}
+            return None
+        if dry_run:
+            results[name] = {"name": name, "status": "stale"}
+            return None
+        return key
+
+    print(f"🔗 Pipeline: {len(order)} stages")
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        while len(results) < len(order):
+            for name in order:
+                if name in results or name in keys or not deps[name].issubset(results):
+                    continue
+                key = settle(name)
+                if name in results:
+                    print(_format_result(results[name]))
+                    continue
+                keys[name] = key
+                print(f"▶️  {name}")
+                running[pool.submit(_run_stage, name)] = name
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                result = future.result()
+                instrumentation.merge(result.pop("telemetry", None))
+                result["status"] = "ran" if result["success"] else "failed"
+                if result["success"] and not outputs_exist(STAGES[name]):
+                    result["status"] = "failed"
+                    result["error"] = "missing outputs: " + ", ".join(
+                        pattern for pattern in STAGES[name].outputs if not _expand(pattern))
+                results[name] = result
+                if result["status"] == "ran":
+                    state[name] = keys[name]
+                else:
+                    state.pop(name, None)
+                    if result["log"]:
+                        print(result["log"], end="" if result["log"].endswith("\n") else "\n")
+                print(_format_result(result))
+                # Record progress so an interrupted run resumes after its last stage
+                _save_state(state)
+
+    return [results[name] for name in order]
+
+def _format_result(result):
+    """One status line for a stage result."""
+    icons = {"ran": "✅", "failed": "❌", "skipped": "⏭️ ", "unavailable": "⚠️ ", "blocked": "⛔", "stale": "🔄"}
+    line = f"{icons[result['status']]} {result['name']}: {result['status']}"
+    if result["status"] in ("ran", "failed"):
+        line += f" ({result['seconds']:.1f}s)"
+    if result.get("summary"):
+        line += f" - {result['summary']}"
+    if result.get("error"):
+        error = result["error"].strip().splitlines()
+        line += f" - {error[-1]}" if result["status"] == "failed" else f" ({error[0]})"
+    return line
+
+# ---------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------
+
+def run_scores():
+    import process_scores_by_series
+    process_scores_by_series.main(incremental=True)
+
+def sentiment_available():
+    if not os.getenv("OPENAI_API_KEY"):
+        return "OPENAI_API_KEY is not set"
+    try:
+        import sentiment_analysis  # noqa: F401
+    except ImportError as e:
+        return f"sentiment_analysis unavailable ({e})"
+    return None
+
+def run_sentiment(scripts_dir, output_dir):
+    import asyncio
+    import sentiment_analysis
+    asyncio.run(sentiment_analysis.process_all_scripts(str(REPO_ROOT / scripts_dir), str(REPO_ROOT / output_dir),
+                                                       os.environ["OPENAI_API_KEY"]))
+
+def analyses_available(analysis_dir="data/analysis"):
+    if not glob.glob(str(REPO_ROOT / analysis_dir / "*_analysis.json")):
+        return f"no script analyses in {analysis_dir}"
+    return None
+
+def run_sentiment_table(analysis_dir, output):
+    import sentiment_analysis
+    count = sentiment_analysis.update_sentiment_table(str(REPO_ROOT / analysis_dir), str(REPO_ROOT / output))
+    return f"{count} episodes updated"
+
+def run_rating_mixture(output, n_boot, seed):
+    import rating_mixture
+    table = rating_mixture.fit_rating_mixtures(n_boot=n_boot, seed=seed)
+    table.to_csv(REPO_ROOT / output, index=False)
+    episodes = table[table["level"] == "episode"]
+    return f"{len(episodes)} episodes, tri-peak MAE {episodes['tri_peak_mae'].mean():.3f}"
+
+def run_rating_cv(output):
+    import rating_model_cv
+    results = rating_model_cv.run_cv(results_path=REPO_ROOT / output)
+    return f"R² {results['r2'].mean():.3f} ± {results['r2'].std():.3f}"
+
+def run_permutation_tests(output, n_permutations, seed):
+    import pandas as pd
+    import permutation_tests
+    features = permutation_tests.feature_rating_tests(n_permutations, seed)
+    trends = permutation_tests.sentiment_trend_tests(n_permutations, seed).rename(columns={"emotion": "feature"})
+    table = pd.concat([features.assign(test="rating_within_series"), trends.assign(test="trend_across_series")])
+    table[["test", "feature", "r", "p_value", "p_adjusted"]].to_csv(REPO_ROOT / output, index=False)
+    return f"{int((table['p_adjusted'] < 0.05).sum())} of {len(table)} tests significant after BH"
+
+def run_rating_trajectories(output, n_simulations, thresholds, seed):
+    import pandas as pd
+    import rating_trajectories
+    series, raw, relative = rating_trajectories.load_series_ratings()
+    null = rating_trajectories.trajectory_null(raw, relative, n_simulations, thresholds, seed=seed)
+    rows = []
+    for t, threshold in enumerate(null["thresholds"]):
+        for a, archetype in enumerate(rating_trajectories.ARCHETYPES):
+            rows.append({"threshold": threshold, "archetype": archetype,
+                         "observed": null["observed_counts"][t, a], "p_value": null["count_p"][t, a]})
+        rows.append({"threshold": threshold, "archetype": "Rising or J-shaped",
+                     "observed": null["observed_upward"][t], "p_value": null["upward_p"][t]})
+    pd.DataFrame(rows).to_csv(REPO_ROOT / output, index=False)
+    return f"first-vs-last gain {null['observed_gain']:+.2f}, P = {null['gain_p']:.2g}"
+
+def run_contestant_archetypes(output, n_clusters):
+    import pandas as pd
+    import contestant_trajectories as ct
+    tensor = ct.load_score_tensor()
+    features, series_index, contestant_index = ct.trajectory_features(tensor)
+    _, tree = ct.load_linkage(features)
+    table = pd.DataFrame(features, columns=ct.FEATURES)
+    table.insert(0, "series", tensor["series"][series_index])
+    table.insert(1, "contestant", tensor["names"][series_index, contestant_index])
+    table["cluster"] = ct.cut_archetypes(tree, n_clusters)
+    table.to_csv(REPO_ROOT / output, index=False)
+    return f"{len(table)} contestants in {n_clusters} clusters"
+
+def _figure_paths():
+    import render_figures
+    inputs = sorted({path for spec in render_figures.FIGURES.values() for path in spec.inputs})
+    outputs = [path for spec in render_figures.FIGURES.values() for path in render_figures.named_paths(spec)]
+    code = render_figures.SHARED_DEPENDENCIES + ["scripts/render_figures.py", "scripts/figure_store.py"]
+    committed = [str(render_figures.reference_path(path)) for path in outputs]
+    return inputs + code, outputs, committed
+
+def run_figures():
+    import render_figures
+    results = render_figures.render_figures()
+    failed = [r["name"] for r in results if not r["success"]]
+    if failed:
+        raise RuntimeError(f"Failed figures: {', '.join(failed)}")
+    return f"{sum(not r['skipped'] for r in results)} of {len(results)} figures rendered"
+
+def promotion_requested():
+    if not os.getenv("PIPELINE_PROMOTE_FIGURES"):
+        return "committed figures are only replaced with --promote-figures"
+    return None
+
+def run_promote_figures():
+    import render_figures
+    manifest = render_figures.figure_store.load_manifest()
+    changed = [path for name in render_figures.FIGURES
+               for path in render_figures.promote_figure(name, manifest=manifest)]
+    render_figures.figure_store.save_manifest(manifest)
+    return f"{len(changed)} committed figures replaced"
+
+def latex_available():
+    missing = [tool for tool in ("pdflatex", "latexdiff") if shutil.which(tool) is None]
+    return f"{' and '.join(missing)} not found" if missing else None
+
+def run_pdfs(source_dir):
+    import compile_submission
+    if compile_submission.main(source_dir=REPO_ROOT / source_dir) != 0:
+        raise RuntimeError("Not every document compiled")
+
+add_stage("scores", run_scores,
+          inputs=["data/raw/scores.csv", "scripts/process_scores_by_series.py"],
+          outputs=SCORE_MATRICES)
+
+add_stage("sentiment", run_sentiment,
+          inputs=["data/scripts/*.txt"] + SENTIMENT_CODE,
+          outputs=["data/analysis/*_analysis.json"],
+          requires=sentiment_available,
+          scripts_dir="data/scripts", output_dir="data/analysis")
+
+add_stage("sentiment_table", run_sentiment_table,
+          inputs=["data/analysis/*_analysis.json", "scripts/sentiment_analysis.py"],
+          outputs=["data/raw/sentiment.csv"],
+          requires=analyses_available,
+          analysis_dir="data/analysis", output="data/raw/sentiment.csv")
+
+add_stage("rating_mixture", run_rating_mixture,
+          inputs=["data/raw/taskmaster_histograms_corrected.csv", "scripts/rating_mixture.py"],
+          outputs=["data/processed/rating_mixture.csv"],
+          output="data/processed/rating_mixture.csv", n_boot=500, seed=0)
+
+add_stage("rating_cv", run_rating_cv,
+          inputs=FEATURE_INPUTS,
+          outputs=["data/processed/rating_cv_results.csv"],
+          output="data/processed/rating_cv_results.csv")
+
+add_stage("permutation_tests", run_permutation_tests,
+          inputs=FEATURE_INPUTS + ["scripts/permutation_tests.py"],
+          outputs=["data/processed/permutation_tests.csv"],
+          output="data/processed/permutation_tests.csv", n_permutations=100000, seed=0)
+
+add_stage("rating_trajectories", run_rating_trajectories,
+          inputs=["data/raw/imdb_ratings.csv", "scripts/rating_trajectories.py"],
+          outputs=["data/processed/rating_trajectories.csv"],
+          output="data/processed/rating_trajectories.csv", n_simulations=1000000, thresholds=[0.25, 0.5, 1.0],
+          seed=0)
+
+add_stage("contestant_archetypes", run_contestant_archetypes,
+          inputs=["data/processed/scores_by_series/series_*_scores.csv", "scripts/contestant_trajectories.py"],
+          outputs=["data/processed/contestant_archetypes.csv"],
+          output="data/processed/contestant_archetypes.csv", n_clusters=5)
+
+_figure_inputs, _figure_outputs, _committed_figures = _figure_paths()
+add_stage("figures", run_figures, inputs=_figure_inputs, outputs=_figure_outputs)
+
+add_stage("promote_figures", run_promote_figures,
+          inputs=_figure_outputs + ["scripts/render_figures.py", "scripts/figure_store.py"],
+          outputs=_committed_figures,
+          requires=promotion_requested)
+
+add_stage("pdfs", run_pdfs,
+          inputs=["source/*.tex", "figures/main/*", "figures/supplementary/*", "scripts/compile_submission.py",
+                  "scripts/figure_store.py"],
+          outputs=[f"source/{document}" for document in DOCUMENTS],
+          requires=latex_available,
+          source_dir="source")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the analysis-to-PDF pipeline, skipping fresh stages")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--only", nargs="+", metavar="STAGE", help="Run just these stages")
+    target.add_argument("--until", nargs="+", metavar="STAGE", help="Run these stages and everything they need")
+    parser.add_argument("--force", action="store_true", help="Run stages even if their inputs are unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="Show which stages are stale and exit")
+    parser.add_argument("--workers", type=int, default=None, help="Number of stages running at once")
+    parser.add_argument("--list", action="store_true", help="List stages and their dependencies and exit")
+    parser.add_argument("--promote-figures", action="store_true",
+                        help="Let promote_figures copy rendered figures over the committed ones")
+    args = parser.parse_args()
+    if args.promote_figures:
+        os.environ["PIPELINE_PROMOTE_FIGURES"] = "1"
+
+    if args.list:
+        for name in topological_order():
+            print(f"{name}: after {', '.join(upstream(name)) or '-'}")
+            print(f"   {', '.join(STAGES[name].inputs)} -> {', '.join(STAGES[name].outputs[:3])}"
+                  f"{' ...' if len(STAGES[name].outputs) > 3 else ''}")
+        sys.exit(0)
+
+    selected = args.only or (sorted(ancestors(args.until)) if args.until else None)
+    start = time.time()
+    results = run_pipeline(selected, max_workers=args.workers, force=args.force, dry_run=args.dry_run)
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    print(f"\n📋 {', '.join(f'{n} {status}' for status, n in counts.items())} in {time.time() - start:.1f}s")
+    sys.exit(1 if counts.get("failed") or counts.get("blocked") else 0)
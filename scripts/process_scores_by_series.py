@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 """
-Process scores.csv and break it into 18 CSVs (one per series) with the format:
+Process scores.csv and break it into one CSV per series (18 for the broadcast
+data, however many series the input holds) with the format:
 ContestantID, ContestantName, Score_Task_1, Score_Task_2, ...
 
-ContestantID is a running number from 1 to 90, where:
+ContestantID is a running number (1 to 90 for the broadcast data), where:
 - 1-5 are Series 1 contestants
 - 6-10 are Series 2 contestants
 - etc.
@@ -13,99 +14,149 @@ Note: Alex Horne (the show's assistant) is excluded from the data processing.
 
 import pandas as pd
 import os
-import numpy as np
+import json
+import hashlib
+import argparse
 from pathlib import Path
 
-def main():
+import instrumentation
+from data_loader import load_raw, REPO_ROOT
+
+OUTPUT_DIR = REPO_ROOT / "data" / "processed" / "scores_by_series"
+
+MANIFEST_NAME = ".series_manifest.json"
+
+def hash_series_rows(series_scores, first_id):
+    """
+    Hash the input rows of one series.
+
+    The first ContestantID of the series is part of the key because IDs are
+    assigned cumulatively, so a change in an earlier series shifts the IDs of
+    every later one.
+    """
+    columns = ['task_id', 'contestant_name', 'total_score']
+    rows = series_scores[columns].sort_values(columns[:2], kind='mergesort')
+    digest = hashlib.sha256(str(first_id).encode())
+    digest.update(pd.util.hash_pandas_object(rows, index=False).values.tobytes())
+    return digest.hexdigest()
+
+def build_series_matrices(scores_df, contestant_name_map):
+    """
+    Build the contestant x task score matrix of every series in one pivot.
+
+    Tasks are numbered 1..N within each series in task_id order, so a single
+    unstack over (series, contestant_id) x task number covers all series at
+    once. Cells for tasks a contestant didn't take part in are filled with 0.
+
+    Returns a dict mapping series number to its output DataFrame.
+    """
+    task_number = scores_df.groupby('series')['task_id'].rank(method='dense').astype(int)
+    wide = (scores_df.assign(task_number=task_number)
+            .set_index(['series', 'contestant_id', 'task_number'])['total_score']
+            .unstack('task_number'))
+
+    matrices = {}
+    for series, block in wide.groupby(level='series'):
+        block = block.droplevel('series').dropna(axis=1, how='all')
+
+        # Columns without gaps keep the integer dtype of the raw scores
+        complete = block.columns[block.notna().all()]
+        block = block.fillna(0)
+        block[complete] = block[complete].astype(scores_df['total_score'].dtype)
+
+        block.columns = [f'Score_Task_{i}' for i in block.columns]
+        block.index.name = 'ContestantID'
+        block.insert(0, 'ContestantName', block.index.map(contestant_name_map))
+        matrices[series] = block.sort_index().reset_index()
+
+    return matrices
+
+def main(incremental=False, output_dir=OUTPUT_DIR):
+    """
+    Write one score matrix CSV per series.
+
+    Parameters:
+    -----------
+    incremental : bool, optional
+        Only rewrite the series files whose input rows changed since the
+        last run, according to the hash manifest kept in the output directory
+    output_dir : str or Path, optional
+        Directory receiving the series CSVs, default is
+        data/processed/scores_by_series under the repository root
+    """
     # Create output directory if it doesn't exist
-    output_dir = Path("data/processed/scores_by_series")
+    output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Load the scores data
-    scores_df = pd.read_csv("data/raw/scores.csv")
+    with instrumentation.stage("scores.load"):
+        scores_df = load_raw("scores.csv", columns=['series', 'task_id', 'contestant_name', 'total_score'])
+    instrumentation.count("scores.rows", len(scores_df))
+    scores_df['contestant_name'] = scores_df['contestant_name'].astype(str)
     
     # Filter out Alex Horne (who is not a regular contestant but the show's assistant)
     scores_df = scores_df[scores_df['contestant_name'] != "Alex Horne"]
     
     # Map contestant names to IDs based on the specified rules
-    # Get unique contestants by series
+    # Get unique contestants by series, for every series in the data
+    series_numbers = sorted(int(series) for series in scores_df['series'].unique())
+    names_by_series = scores_df.groupby('series')['contestant_name'].unique()
     contestants_by_series = {}
-    for series in range(1, 19):
-        series_scores = scores_df[scores_df['series'] == series]
-        unique_contestants = sorted(series_scores['contestant_name'].unique())
-        contestants_by_series[series] = unique_contestants
+    for series in series_numbers:
+        names = names_by_series.get(series, [])
+        contestants_by_series[series] = sorted(names)
     
     # Create a mapping of contestant names to IDs
     contestant_id_map = {}
     contestant_name_map = {}  # Reverse mapping from ID to name
+    first_id_by_series = {}
     current_id = 1
     
-    for series in range(1, 19):
+    for series in series_numbers:
+        first_id_by_series[series] = current_id
         for contestant in contestants_by_series[series]:
             contestant_id_map[contestant] = current_id
             contestant_name_map[current_id] = contestant
             current_id += 1
     
     # Add contestant_id column to the scores dataframe
-    scores_df['contestant_id'] = scores_df['contestant_name'].map(contestant_id_map)
+    scores_df = scores_df.assign(contestant_id=scores_df['contestant_name'].map(contestant_id_map))
     
-    # Process each series
-    for series in range(1, 19):
-        # Filter scores for this series
-        series_scores = scores_df[scores_df['series'] == series]
-        
-        if len(series_scores) == 0:
-            print(f"No data found for Series {series}")
+    # Work out which series need rebuilding
+    manifest_path = output_dir / MANIFEST_NAME
+    manifest = {}
+    if incremental and manifest_path.exists():
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    
+    rows_by_series = dict(tuple(scores_df.groupby('series')))
+    stale = {}
+    for series in series_numbers:
+        series_hash = hash_series_rows(rows_by_series[series], first_id_by_series[series])
+        output_path = output_dir / f"series_{series}_scores.csv"
+        if incremental and manifest.get(str(series)) == series_hash and output_path.exists():
+            print(f"Series {series} unchanged, skipping")
             continue
-            
-        # Get unique tasks for this series
-        tasks = series_scores['task_id'].unique()
-        tasks = sorted(tasks)
-        
-        # Get unique contestants for this series
-        contestants = series_scores['contestant_id'].unique()
-        
-        # Create a pivot table with contestants as rows and tasks as columns
-        # First, create a DataFrame with the right structure
-        result_df = pd.DataFrame(index=contestants)
-        result_df.index.name = 'ContestantID'
-        
-        # Add contestant names
-        result_df['ContestantName'] = result_df.index.map(contestant_name_map)
-        
-        # Add columns for each task
-        for i, task_id in enumerate(tasks, 1):
-            # Filter data for this task
-            task_data = series_scores[series_scores['task_id'] == task_id]
-            
-            # Create a Series mapping contestant_id to score
-            score_series = pd.Series(
-                task_data['total_score'].values,
-                index=task_data['contestant_id'].values
-            )
-            
-            # Add to result DataFrame
-            result_df[f'Score_Task_{i}'] = result_df.index.map(lambda x: score_series.get(x, np.nan))
-        
-        # Fill NaN values with 0 (for tasks a contestant didn't participate in)
-        result_df = result_df.fillna(0)
-        
-        # Reset index to make ContestantID a column
-        result_df = result_df.reset_index()
-        
-        # Sort by ContestantID
-        result_df = result_df.sort_values('ContestantID')
-        
-        # Reorder columns to put ContestantID and ContestantName first
-        cols = result_df.columns.tolist()
-        cols = ['ContestantID', 'ContestantName'] + [col for col in cols if col not in ['ContestantID', 'ContestantName']]
-        result_df = result_df[cols]
-        
+        stale[series] = series_hash
+    
+    # Build all stale series matrices in a single pass
+    stale_scores = scores_df[scores_df['series'].isin(list(stale))]
+    with instrumentation.stage("scores.build", series=len(stale)):
+        matrices = build_series_matrices(stale_scores, contestant_name_map) if stale else {}
+    instrumentation.count("scores.series_skipped", len(rows_by_series) - len(stale))
+    
+    for series, result_df in matrices.items():
         # Save to CSV
         output_path = output_dir / f"series_{series}_scores.csv"
-        result_df.to_csv(output_path, index=False)
+        with instrumentation.stage("scores.write", series=series):
+            result_df.to_csv(output_path, index=False)
+        manifest[str(series)] = stale[series]
         
-        print(f"Processed Series {series}: {len(contestants)} contestants, {len(tasks)} tasks")
+        num_tasks = result_df.shape[1] - 2
+        print(f"Processed Series {series}: {len(result_df)} contestants, {num_tasks} tasks")
+    
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
     
     # Create a readme file explaining the data format
     readme_path = output_dir / "README.md"
@@ -118,7 +169,7 @@ def main():
         f.write("ContestantID, ContestantName, Score_Task_1, Score_Task_2, ...\n")
         f.write("```\n\n")
         f.write("Where:\n")
-        f.write("- ContestantID is a running number from 1 to 90\n")
+        f.write(f"- ContestantID is a running number from 1 to {current_id - 1}\n")
         f.write("- ContestantName is the contestant's name\n")
         f.write("- Score_Task_X is the score (0-5) for task X in that series\n\n")
         f.write("## Contestant ID Mapping\n\n")
@@ -126,16 +177,19 @@ def main():
         f.write("|--------|---------------|-------------|\n")
         
         start_id = 1
-        for series in range(1, 19):
-            if series in contestants_by_series:
-                num_contestants = len(contestants_by_series[series])
-                end_id = start_id + num_contestants - 1
-                contestants_str = ", ".join(contestants_by_series[series])
-                f.write(f"| {series} | {start_id}-{end_id} | {contestants_str} |\n")
-                start_id = end_id + 1
+        for series in series_numbers:
+            num_contestants = len(contestants_by_series[series])
+            end_id = start_id + num_contestants - 1
+            contestants_str = ", ".join(contestants_by_series[series])
+            f.write(f"| {series} | {start_id}-{end_id} | {contestants_str} |\n")
+            start_id = end_id + 1
     
     print(f"\nProcessed data saved to {output_dir}")
     print(f"Created README at {readme_path}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Split scores.csv into per-series score matrices")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only rewrite series whose input rows changed since the last run")
+    args = parser.parse_args()
+    main(incremental=args.incremental)
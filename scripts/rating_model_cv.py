@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Parallel series-held-out cross-validation of the IMDb rating Random Forest.
+
+The rating model is a Random Forest over 45 episode-level features:
+
+- 21 sentiment features (transcript counts plus mean and total intensity of
+  each emotion) from sentiment.csv
+- 19 task-mix features: the share of each task type in the episode, from
+  taskmaster_UK_tasks.csv
+- 5 contestant features of the episode's line-up (mean age, age range, share
+  of men, share of comedians, mean years of experience) from contestants.csv
+
+Every (hyperparameters, seed, fold) combination is an independent job on a
+process pool. Folds hold out whole series. The feature matrix is written
+once to data/cache and memory-mapped read-only by every worker, so jobs only
+carry their parameters and test series. Per-fold R^2 and feature importances
+are appended to the results CSV as jobs finish.
+
+Usage:
+    python scripts/rating_model_cv.py                                # 500 trees, depth 5
+    python scripts/rating_model_cv.py --trees 100 300 500 --depths 3 5 8 --seeds 0 1 2
+"""
+
+import os
+import csv
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from pathlib import Path
+
+from data_loader import CACHE_DIR, REPO_ROOT, load_raw
+
+RESULTS_PATH = REPO_ROOT / "data" / "processed" / "rating_cv_results.csv"
+FEATURE_CACHE = CACHE_DIR / "rating_features.npy"
+
+SENTIMENT_COLUMNS = [
+    "num_sentences", "num_words", "mean_sentence_length", "greg_mentions", "alex_mentions",
+    "laughter_count", "applause_count"
+] + [f"{kind}_{emotion}" for kind in ["avg", "total"] for emotion in [
+    "anger", "awkwardness", "frustration_or_despair", "humor", "joy_or_excitement", "sarcasm", "self_deprecation"
+]]
+
+# is_multiple and is_adapted are the complements of is_single and is_original
+TASK_COLUMNS = [
+    "is_solo", "is_team", "is_special", "is_split", "is_tiebreaker", "is_prize", "is_filmed", "is_homework",
+    "is_live", "is_creative", "is_mental", "is_physical", "is_social", "is_objective", "is_subjective",
+    "is_combination", "is_unjudged", "is_single", "is_original"
+]
+
+CONTESTANT_COLUMNS = ["mean_age", "age_range", "male_share", "comedian_share", "mean_experience"]
+
+FEATURE_NAMES = SENTIMENT_COLUMNS + [f"task_{c[3:]}_share" for c in TASK_COLUMNS] + CONTESTANT_COLUMNS
+
+def _contestant_features():
+    """Line-up features of every series."""
+    contestants = load_raw("contestants.csv", columns=[
+        "series", "gender", "date_of_birth", "age_during_taskmaster", "occupation", "years_active"])
+    show_year = (pd.to_datetime(contestants["date_of_birth"], errors="coerce").dt.year
+                 + contestants["age_during_taskmaster"])
+    start_year = pd.to_numeric(contestants["years_active"].astype(str).str.extract(r"(\d{4})")[0], errors="coerce")
+    experience = (show_year - start_year).clip(lower=0)
+
+    frame = pd.DataFrame({
+        "series": contestants["series"],
+        "age": contestants["age_during_taskmaster"],
+        "male": (contestants["gender"].astype(str) == "Male").astype(float),
+        "comedian": contestants["occupation"].astype(str).str.contains("comedian", case=False).astype(float),
+        "experience": experience.fillna(experience.mean())
+    })
+    grouped = frame.groupby("series")
+    return pd.DataFrame({
+        "mean_age": grouped["age"].mean(),
+        "age_range": grouped["age"].max() - grouped["age"].min(),
+        "male_share": grouped["male"].mean(),
+        "comedian_share": grouped["comedian"].mean(),
+        "mean_experience": grouped["experience"].mean()
+    })
+
+def build_feature_matrix():
+    """
+    Assemble the episode feature matrix and rating target.
+
+    Only episodes with an IMDb rating, a sentiment row and at least one task
+    are kept.
+
+    Returns:
+    --------
+    tuple
+        (X, y, groups, feature_names): float64 features of shape
+        (episodes, 45), IMDb ratings, series of each episode, column names
+    """
+    ratings = load_raw("imdb_ratings.csv", columns=["series", "episode", "imdb_rating"])
+    sentiment = load_raw("sentiment.csv", columns=["series", "episode"] + SENTIMENT_COLUMNS)
+
+    tasks = load_raw("taskmaster_UK_tasks.csv", columns=["series_name", "episode_num"] + TASK_COLUMNS)
+    tasks["series"] = pd.to_numeric(tasks["series_name"].astype(str).str.extract(r"^Series (\d+)$")[0], errors="coerce")
+    tasks["episode"] = pd.to_numeric(tasks["episode_num"].astype(str).str.extract(r"^Episode (\d+)$")[0], errors="coerce")
+    task_mix = (tasks.dropna(subset=["series", "episode"])
+                .astype({"series": int, "episode": int})
+                .groupby(["series", "episode"])[TASK_COLUMNS].mean())
+    task_mix.columns = [f"task_{c[3:]}_share" for c in TASK_COLUMNS]
+
+    episodes = (ratings.merge(sentiment, on=["series", "episode"])
+                .merge(task_mix.reset_index(), on=["series", "episode"])
+                .merge(_contestant_features().reset_index(), on="series")
+                .sort_values(["series", "episode"]))
+    return (episodes[FEATURE_NAMES].to_numpy(dtype=np.float64), episodes["imdb_rating"].to_numpy(dtype=np.float64),
+            episodes["series"].to_numpy(), list(FEATURE_NAMES))
+
+def series_folds(groups, n_folds=5):
+    """
+    Split episodes into folds that hold out whole series.
+
+    Series are dealt round-robin in order, so the split is deterministic and
+    each fold gets series from across the run of the show.
+
+    Returns:
+    --------
+    list of numpy.ndarray
+        Test-set series of each fold
+    """
+    series = np.unique(groups)
+    return [series[i::n_folds] for i in range(n_folds)]
+
+# Shared read-only data of a worker process
+_SHARED = {}
+
+def _init_worker(matrix_path, target, groups):
+    """Memory-map the feature matrix once per worker."""
+    _SHARED["X"] = np.load(matrix_path, mmap_mode="r")
+    _SHARED["y"] = target
+    _SHARED["groups"] = groups
+
+def _run_job(job):
+    """Fit one forest on one fold (runs in a worker process)."""
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import r2_score
+
+    X, y, groups = _SHARED["X"], _SHARED["y"], _SHARED["groups"]
+    start = time.time()
+    test = np.isin(groups, job["test_series"])
+    model = RandomForestRegressor(n_estimators=job["n_estimators"], max_depth=job["max_depth"],
+                                  random_state=job["seed"], n_jobs=1)
+    model.fit(X[~test], y[~test])
+    prediction = model.predict(X[test])
+    return dict(job, test_series=" ".join(map(str, job["test_series"])), n_test=int(test.sum()),
+                r2=float(r2_score(y[test], prediction)), seconds=time.time() - start,
+                importances=model.feature_importances_)
+
+def run_cv(n_estimators=(500,), max_depth=(5,), seeds=(0,), n_folds=5, max_workers=None,
+           results_path=RESULTS_PATH):
+    """
+    Run every (trees, depth, seed, fold) job and stream results to a CSV.
+
+    Parameters:
+    -----------
+    n_estimators, max_depth : sequence of int, optional
+        Hyperparameter grid
+    seeds : sequence of int, optional
+        Random seeds of the forests
+    n_folds : int, optional
+        Number of series-held-out folds
+    max_workers : int, optional
+        Size of the process pool, default is the number of CPUs
+    results_path : Path, optional
+        CSV receiving one row per finished job
+
+    Returns:
+    --------
+    pandas.DataFrame
+        All per-fold results
+    """
+    X, y, groups, names = build_feature_matrix()
+    FEATURE_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = FEATURE_CACHE.with_suffix(".tmp.npy")
+    np.save(tmp_path, X)
+    os.replace(tmp_path, FEATURE_CACHE)
+
+    folds = series_folds(groups, n_folds)
+    jobs = [{"n_estimators": trees, "max_depth": depth, "seed": seed, "fold": fold, "test_series": test_series}
+            for trees, depth, seed in product(n_estimators, max_depth, seeds)
+            for fold, test_series in enumerate(folds)]
+    print(f"🌲 {len(jobs)} jobs: {len(X)} episodes x {len(names)} features, {n_folds} series-held-out folds")
+
+    columns = ["n_estimators", "max_depth", "seed", "fold", "test_series", "n_test", "r2", "seconds"]
+    results_path = Path(results_path)
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(results_path, "w", newline="") as f, \
+            ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                initargs=(str(FEATURE_CACHE), y, groups)) as pool:
+        writer = csv.writer(f)
+        writer.writerow(columns + [f"importance_{name}" for name in names])
+        futures = [pool.submit(_run_job, job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            writer.writerow([result[c] for c in columns] + result["importances"].tolist())
+            f.flush()
+            print(f"   [{done}/{len(jobs)}] trees={result['n_estimators']} depth={result['max_depth']} "
+                  f"seed={result['seed']} fold={result['fold']}: R² = {result['r2']:.3f}")
+
+    return pd.read_csv(results_path)
+
+def summarize_cv(results):
+    """Mean and standard deviation of R^2 per hyperparameter setting."""
+    return (results.groupby(["n_estimators", "max_depth"])["r2"]
+            .agg(["mean", "std", "count"]).rename(columns={"mean": "r2_mean", "std": "r2_std", "count": "jobs"}))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Series-held-out CV of the rating Random Forest")
+    parser.add_argument("--trees", type=int, nargs="+", default=[500], help="Tree counts to sweep")
+    parser.add_argument("--depths", type=int, nargs="+", default=[5], help="Maximum depths to sweep")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0], help="Random seeds")
+    parser.add_argument("--folds", type=int, default=5, help="Number of series-held-out folds")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--output", default=str(RESULTS_PATH), help="Results CSV")
+    args = parser.parse_args()
+
+    start = time.time()
+    results = run_cv(args.trees, args.depths, args.seeds, n_folds=args.folds, max_workers=args.workers,
+                     results_path=args.output)
+    print(f"\n📊 R² by setting ({time.time() - start:.1f}s):")
+    print(summarize_cv(results).round(3).to_string())
+    importances = results.filter(like="importance_").mean().sort_values(ascending=False)
+    print("\nTop features:")
+    for name, value in importances.head(10).items():
+        print(f"   {name[len('importance_'):]}: {100 * value:.1f}%")
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Episode rating trajectory archetypes and their Monte Carlo null.
+
+Every series is classified from the relative IMDb ratings
+(imdb_rating_relative, z-scored within series) of its first, middle and last
+episode:
+
+    Rising     (123)  first < middle < last
+    J-shaped   (213)  middle < first < last
+    Declining  (321)  first > middle > last
+    Flat              the three ratings lie within the threshold of each other
+    Other             any other ordering
+
+The null hypothesis is that episode order carries no information, i.e. the
+ratings of a series are shuffled within the series. Only the three ratings at
+the first, middle and last positions matter, and under a uniform shuffle
+they are a uniform draw of three distinct episodes, so each simulation draws
+three indices per series instead of permuting the whole series. Simulations
+are run in chunks and only histograms are kept, so memory stays bounded for
+any number of simulations:
+
+- the number of series in each archetype (and in Rising or J-shaped
+  together), per threshold
+- the mean first-vs-last gain in IMDb points across series
+
+Usage:
+    python scripts/rating_trajectories.py --simulations 1000000 --thresholds 0.25 0.5 1.0
+"""
+
+import time
+import argparse
+import numpy as np
+
+from data_loader import load_raw
+
+ARCHETYPES = ["Rising", "J-shaped", "Declining", "Flat", "Other"]
+
+# Archetype of each (first, middle, last) rank code; ties fall into Other
+ORDER_CODES = {123: 0, 213: 1, 321: 2}
+
+DEFAULT_THRESHOLDS = (0.5,)
+
+def load_series_ratings():
+    """
+    Raw and relative IMDb ratings of every series, in episode order.
+
+    Returns:
+    --------
+    tuple
+        (series, raw, relative): series numbers and one float array per
+        series for each rating column
+    """
+    ratings = load_raw("imdb_ratings.csv", columns=["series", "episode", "imdb_rating", "imdb_rating_relative"])
+    ratings = ratings.dropna(subset=["imdb_rating"]).sort_values(["series", "episode"])
+    grouped = ratings.groupby("series")
+    series = np.array(list(grouped.groups))
+    raw = [group["imdb_rating"].to_numpy(dtype=float) for _, group in grouped]
+    relative = [group["imdb_rating_relative"].to_numpy(dtype=float) for _, group in grouped]
+    return series, raw, relative
+
+def key_positions(n_episodes):
+    """Indices of the first, middle and last episode of a series."""
+    return 0, (n_episodes - 1) // 2, n_episodes - 1
+
+def classify(first, middle, last, thresholds=DEFAULT_THRESHOLDS):
+    """
+    Archetype index of every (first, middle, last) triple.
+
+    Parameters:
+    -----------
+    first, middle, last : array-like
+        Relative ratings of the same shape
+    thresholds : sequence of float, optional
+        Triples whose ratings all lie closer than the threshold are Flat
+
+    Returns:
+    --------
+    numpy.ndarray
+        int8 indices into ARCHETYPES of shape (len(thresholds),) + first.shape
+    """
+    first, middle, last = (np.asarray(v, dtype=float) for v in (first, middle, last))
+    rank_first = 1 + (first > middle) + (first > last)
+    rank_middle = 1 + (middle > first) + (middle > last)
+    rank_last = 1 + (last > first) + (last > middle)
+    code = 100 * rank_first + 10 * rank_middle + rank_last
+
+    order = np.full(code.shape, ARCHETYPES.index("Other"), dtype=np.int8)
+    for value, archetype in ORDER_CODES.items():
+        order[code == value] = archetype
+
+    spread = np.maximum(np.maximum(first, middle), last) - np.minimum(np.minimum(first, middle), last)
+    thresholds = np.asarray(thresholds, dtype=float).reshape((-1,) + (1,) * spread.ndim)
+    return np.where(spread < thresholds, np.int8(ARCHETYPES.index("Flat")), order).astype(np.int8)
+
+def _draw_positions(n_episodes, size, rng):
+    """Three distinct episode indices per simulation, uniformly at random."""
+    first = rng.integers(0, n_episodes, size)
+    middle = rng.integers(0, n_episodes - 1, size)
+    middle += middle >= first
+    last = rng.integers(0, n_episodes - 2, size)
+    # Shift past the smaller taken index first, then past the larger one
+    last += last >= np.minimum(first, middle)
+    last += last >= np.maximum(first, middle)
+    return first, middle, last
+
+def trajectory_null(raw, relative, n_simulations=1000000, thresholds=DEFAULT_THRESHOLDS, chunk_size=100000,
+                    gain_bins=200, seed=0):
+    """
+    Monte Carlo null of archetype counts and first-vs-last gain.
+
+    Parameters:
+    -----------
+    raw, relative : list of array-like
+        Raw and relative ratings of every series in episode order (series
+        need at least three episodes)
+    n_simulations : int, optional
+        Number of shuffles of all series
+    thresholds : sequence of float, optional
+        Flat thresholds in relative-rating units, evaluated on the same draws
+    chunk_size : int, optional
+        Simulations drawn at once
+    gain_bins : int, optional
+        Number of bins of the gain histogram
+    seed : int, optional
+        Random seed
+
+    Returns:
+    --------
+    dict
+        "observed": archetype counts (thresholds, archetypes) and mean gain
+        of the real episode order; "count_histogram": (thresholds,
+        archetypes, series + 1) number of simulations with each count;
+        "upward_histogram": same for Rising plus J-shaped; "gain_histogram"
+        and "gain_edges"; gain mean, std and the one-sided p-values of the
+        observed counts (P[count >= observed]) and gain (P[gain >= observed])
+    """
+    thresholds = np.atleast_1d(np.asarray(thresholds, dtype=float))
+    raw = [np.asarray(r, dtype=float) for r in raw]
+    relative = [np.asarray(r, dtype=float) for r in relative]
+    n_series, n_archetypes, n_thresholds = len(raw), len(ARCHETYPES), len(thresholds)
+    if min(len(r) for r in raw) < 3:
+        raise ValueError("Every series needs at least three episodes")
+    upward = [ARCHETYPES.index("Rising"), ARCHETYPES.index("J-shaped")]
+
+    # Observed classification and gain
+    positions = [key_positions(len(r)) for r in raw]
+    observed_labels = classify(*(np.array([r[p[k]] for r, p in zip(relative, positions)]) for k in range(3)),
+                               thresholds=thresholds)
+    observed_counts = np.stack([(observed_labels == a).sum(axis=1) for a in range(n_archetypes)], axis=1)
+    observed_gain = np.mean([r[p[2]] - r[p[0]] for r, p in zip(raw, positions)])
+
+    # Largest possible mean gain bounds the histogram
+    gain_limit = np.mean([r.max() - r.min() for r in raw])
+    gain_edges = np.linspace(-gain_limit, gain_limit, gain_bins + 1)
+    gain_histogram = np.zeros(gain_bins, dtype=np.int64)
+    gain_sum = gain_sum_squares = 0.0
+    gain_exceed = 0
+    count_histogram = np.zeros((n_thresholds, n_archetypes, n_series + 1), dtype=np.int64)
+    upward_histogram = np.zeros((n_thresholds, n_series + 1), dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_simulations, chunk_size):
+        size = min(chunk_size, n_simulations - start)
+        triples = np.empty((3, size, n_series))
+        gain = np.zeros(size)
+        for s in range(n_series):
+            first, middle, last = _draw_positions(len(raw[s]), size, rng)
+            triples[0, :, s], triples[1, :, s], triples[2, :, s] = relative[s][[first, middle, last]]
+            gain += raw[s][last] - raw[s][first]
+        gain /= n_series
+
+        labels = classify(*triples, thresholds=thresholds)
+        # counts[t, k, a] = series of simulation k in archetype a
+        counts = np.stack([(labels == a).sum(axis=2) for a in range(n_archetypes)], axis=2)
+        offsets = (np.arange(n_thresholds)[:, None, None] * n_archetypes
+                   + np.arange(n_archetypes)[None, None, :]) * (n_series + 1)
+        count_histogram += np.bincount((offsets + counts).ravel(),
+                                       minlength=count_histogram.size).reshape(count_histogram.shape)
+        upward_counts = counts[:, :, upward].sum(axis=2)
+        upward_histogram += np.bincount((np.arange(n_thresholds)[:, None] * (n_series + 1) + upward_counts).ravel(),
+                                        minlength=upward_histogram.size).reshape(upward_histogram.shape)
+
+        gain_histogram += np.histogram(gain, bins=gain_edges)[0]
+        gain_sum += gain.sum()
+        gain_sum_squares += (gain ** 2).sum()
+        gain_exceed += int((gain >= observed_gain - 1e-12).sum())
+
+    # P[count >= observed] from the upper tail of each histogram, with the
+    # observed arrangement counted as one of the permutations (as gain_p)
+    tail = np.cumsum(count_histogram[..., ::-1], axis=-1)[..., ::-1]
+    count_exceed = np.take_along_axis(tail, observed_counts[..., None], axis=-1)[..., 0]
+    count_p = (count_exceed + 1) / (n_simulations + 1)
+    observed_upward = observed_counts[:, upward].sum(axis=1)
+    upward_tail = np.cumsum(upward_histogram[:, ::-1], axis=-1)[:, ::-1]
+    upward_p = (upward_tail[np.arange(n_thresholds), observed_upward] + 1) / (n_simulations + 1)
+    gain_mean = gain_sum / n_simulations
+
+    return {
+        "thresholds": thresholds,
+        "observed_counts": observed_counts,
+        "observed_upward": observed_upward,
+        "observed_gain": observed_gain,
+        "count_histogram": count_histogram,
+        "upward_histogram": upward_histogram,
+        "gain_histogram": gain_histogram,
+        "gain_edges": gain_edges,
+        "gain_mean": gain_mean,
+        "gain_std": np.sqrt(max(gain_sum_squares / n_simulations - gain_mean ** 2, 0.0)),
+        "count_p": count_p,
+        "upward_p": upward_p,
+        "gain_p": (gain_exceed + 1) / (n_simulations + 1)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo null of episode rating trajectory archetypes")
+    parser.add_argument("--simulations", type=int, default=1000000, help="Number of within-series shuffles")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=list(DEFAULT_THRESHOLDS),
+                        help="Flat thresholds in within-series SDs")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="Simulations per chunk")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    start = time.time()
+    series, raw, relative = load_series_ratings()
+    null = trajectory_null(raw, relative, args.simulations, args.thresholds, args.chunk_size, seed=args.seed)
+    print(f"⏱️  {args.simulations} simulations of {len(series)} series in {time.time() - start:.1f}s")
+
+    n_series = len(series)
+    expected = (null["count_histogram"] * np.arange(n_series + 1)).sum(axis=-1) / args.simulations
+    for t, threshold in enumerate(null["thresholds"]):
+        print(f"\nThreshold {threshold:g}:")
+        for a, archetype in enumerate(ARCHETYPES):
+            print(f"   {archetype:<10} observed {null['observed_counts'][t, a]:>2}, "
+                  f"null mean {expected[t, a]:.2f}, P(>= observed) = {null['count_p'][t, a]:.2g}")
+        print(f"   Rising or J-shaped: {null['observed_upward'][t]}/{n_series}, "
+              f"P(>= observed) = {null['upward_p'][t]:.2g}")
+    print(f"\nFirst-vs-last gain: {null['observed_gain']:+.2f} points, "
+          f"null {null['gain_mean']:+.3f} ± {null['gain_std']:.3f}, P(>= observed) = {null['gain_p']:.2g}")
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Figure registry and parallel renderer.
+
+Each figure is registered with the datasets it reads, the files it writes
+and a render function built on the config/plot_utils helpers. The runner
+renders figures on a process pool with the headless Agg backend and skips
+any figure whose inputs, plot configuration, code and parameters hash to
+the same key as its last successful render.
+
+Figures are rendered under figures/rendered/, which mirrors the layout of the
+committed figures/ tree but is not tracked. A rendered figure never replaces a
+committed one unless asked to: --compare reports how far each rendered file
+is from the committed figure at the same path, and --promote copies the
+rendered files over the committed ones once that comparison passes.
+
+Rendered files are added to the content-addressed figure store
+(scripts/figure_store.py). A figure that appears under several names, such as
+the series deep dives that are also supplementary S3 figures, is drawn once
+and its aliases are copies of the same stored object.
+
+Only the series deep dives are registered so far; the other main figures are
+produced by their own figureN scripts and are not rendered here.
+
+Usage:
+    python scripts/render_figures.py                  # render stale figures
+    python scripts/render_figures.py series_9_deep_dive --force
+    python scripts/render_figures.py --compare        # rendered vs committed
+    python scripts/render_figures.py --promote        # rendered -> committed
+    python scripts/render_figures.py --list
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import traceback
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "config"))
+
+import figure_store
+
+# Last successful render key of every figure
+RENDER_CACHE = REPO_ROOT / "figures" / ".render_cache.json"
+
+# Untracked tree the registry renders into; mirrors figures/
+RENDER_DIR = "figures/rendered"
+
+# Files whose contents change how every figure looks
+SHARED_DEPENDENCIES = ["config/plot_config.yaml", "config/plot_utils.py"]
+
+@dataclass
+class FigureSpec:
+    """A registered figure: what it reads, what it writes and how to draw it."""
+    name: str
+    render: Callable[..., Optional[Dict[str, Any]]]
+    inputs: List[str]
+    outputs: List[str]
+    params: Dict[str, Any] = field(default_factory=dict)
+    aliases: Dict[str, List[str]] = field(default_factory=dict)
+
+FIGURES: Dict[str, FigureSpec] = {}
+
+def add_figure(name, render, inputs, outputs, aliases=None, **params):
+    """
+    Register a figure.
+
+    Parameters:
+    -----------
+    name : str
+        Unique figure name
+    render : callable
+        Function called as render(output_paths, **params), where output_paths
+        are absolute Paths in the order of outputs. It may return a metrics
+        dict, which is reported by the runner
+    inputs : list of str
+        Repository-relative data files the figure reads
+    outputs : list of str
+        Repository-relative files the figure writes
+    aliases : dict, optional
+        Maps an output to other repository-relative paths that must hold the
+        same file; they are linked to the stored output, not rendered again
+    **params
+        Extra keyword arguments for the render function
+    """
+    if name in FIGURES:
+        raise ValueError(f"Figure {name} is already registered")
+    FIGURES[name] = FigureSpec(name, render, list(inputs), list(outputs), params, dict(aliases or {}))
+
+def register_figure(name, inputs, outputs, aliases=None, **params):
+    """Decorator form of add_figure."""
+    def decorator(render):
+        add_figure(name, render, inputs, outputs, aliases=aliases, **params)
+        return render
+    return decorator
+
+def _file_hash(path):
+    """SHA-256 of a file's contents, or a marker if it doesn't exist."""
+    path = Path(path)
+    if not path.exists():
+        return "missing"
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def figure_key(spec):
+    """
+    Hash everything a figure's output depends on.
+
+    Covers the input datasets, the plot config and helpers, the source file
+    of the render function and the render parameters.
+    """
+    digest = hashlib.sha256()
+    code_file = sys.modules[spec.render.__module__].__file__
+    for path in spec.inputs + SHARED_DEPENDENCIES:
+        digest.update(f"{path}:{_file_hash(REPO_ROOT / path)}\n".encode())
+    digest.update(f"code:{_file_hash(code_file)}:{spec.render.__name__}\n".encode())
+    digest.update(json.dumps(spec.params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+def named_paths(spec):
+    """Every path a figure provides: its outputs and their aliases."""
+    return spec.outputs + [alias for aliases in spec.aliases.values() for alias in aliases]
+
+def publish_outputs(spec):
+    """Store a rendered figure's outputs and link their aliases."""
+    manifest = figure_store.load_manifest()
+    for output in spec.outputs:
+        figure_store.store_file(REPO_ROOT / output, manifest=manifest)
+        for alias in spec.aliases.get(output, []):
+            figure_store.link_alias(REPO_ROOT / output, REPO_ROOT / alias, manifest=manifest)
+    figure_store.save_manifest(manifest)
+
+def _load_render_cache():
+    try:
+        with open(RENDER_CACHE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_render_cache(cache):
+    RENDER_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = RENDER_CACHE.with_name(RENDER_CACHE.name + ".tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, RENDER_CACHE)
+
+def _init_worker():
+    """Use the headless backend in render processes."""
+    os.environ["MPLBACKEND"] = "Agg"
+    import matplotlib
+    matplotlib.use("Agg")
+
+def _render_one(name):
+    """Render one registered figure (runs in a worker process)."""
+    import matplotlib.pyplot as plt
+
+    spec = FIGURES[name]
+    start = time.time()
+    try:
+        metrics = spec.render([REPO_ROOT / path for path in spec.outputs], **spec.params)
+        error = None
+    except Exception:
+        metrics = None
+        error = traceback.format_exc()
+    finally:
+        plt.close("all")
+    return {"name": name, "success": error is None, "seconds": time.time() - start,
+            "metrics": metrics, "error": error}
+
+def render_figures(names=None, max_workers=None, force=False):
+    """
+    Render registered figures in parallel, skipping the up-to-date ones.
+
+    Parameters:
+    -----------
+    names : list of str, optional
+        Figures to consider, default is every registered figure
+    max_workers : int, optional
+        Size of the process pool, default is the number of CPUs
+    force : bool, optional
+        Render even if the figure's key is unchanged
+
+    Returns:
+    --------
+    list of dict
+        One result per figure with name, success, skipped, seconds, metrics
+        and error
+    """
+    names = list(FIGURES) if names is None else list(names)
+    unknown = [name for name in names if name not in FIGURES]
+    if unknown:
+        raise KeyError(f"Unknown figures: {unknown}")
+
+    cache = _load_render_cache()
+    keys = {name: figure_key(FIGURES[name]) for name in names}
+    results = []
+    stale = []
+    for name in names:
+        outputs_exist = all((REPO_ROOT / path).exists() for path in named_paths(FIGURES[name]))
+        if not force and outputs_exist and cache.get(name) == keys[name]:
+            results.append({"name": name, "success": True, "skipped": True, "seconds": 0.0,
+                            "metrics": None, "error": None})
+        else:
+            stale.append(name)
+
+    print(f"🎨 Rendering {len(stale)} of {len(names)} figures ({len(names) - len(stale)} up to date)")
+    if stale:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(_render_one, name) for name in stale]
+            for future in as_completed(futures):
+                result = future.result()
+                result["skipped"] = False
+                results.append(result)
+                if result["success"]:
+                    publish_outputs(FIGURES[result["name"]])
+                    cache[result["name"]] = keys[result["name"]]
+                    print(f"✅ {result['name']} ({result['seconds']:.1f}s)")
+                else:
+                    cache.pop(result["name"], None)
+                    print(f"❌ {result['name']}\n{result['error']}")
+        _save_render_cache(cache)
+
+    return results
+
+def reference_path(path):
+    """The committed figure a rendered path stands in for."""
+    relative = Path(path).relative_to(RENDER_DIR)
+    return Path("figures") / relative
+
+def compare_figure(name, tolerance=2.0):
+    """
+    Compare a figure's rendered files with the committed figures.
+
+    Parameters:
+    -----------
+    name : str
+        Registered figure name
+    tolerance : float, optional
+        Largest mean absolute pixel difference (0-255 scale) that still
+        counts as a match
+
+    Returns:
+    --------
+    list of dict
+        One entry per named path with path, reference, size, reference_size,
+        identical, mean_diff and match
+    """
+    import numpy as np
+    from PIL import Image
+
+    comparisons = []
+    for path in named_paths(FIGURES[name]):
+        reference = reference_path(path)
+        entry = {"path": path, "reference": str(reference), "size": None, "reference_size": None,
+                 "identical": False, "mean_diff": None, "match": False}
+        rendered_file, reference_file = REPO_ROOT / path, REPO_ROOT / reference
+        if rendered_file.exists() and reference_file.exists():
+            entry["identical"] = _file_hash(rendered_file) == _file_hash(reference_file)
+            with Image.open(rendered_file) as rendered, Image.open(reference_file) as committed:
+                entry["size"], entry["reference_size"] = rendered.size, committed.size
+                if rendered.size == committed.size:
+                    difference = np.abs(np.asarray(rendered.convert("RGB"), dtype=np.int16)
+                                        - np.asarray(committed.convert("RGB"), dtype=np.int16))
+                    entry["mean_diff"] = float(difference.mean())
+            entry["match"] = entry["identical"] or (entry["mean_diff"] is not None
+                                                    and entry["mean_diff"] <= tolerance)
+        comparisons.append(entry)
+    return comparisons
+
+def promote_figure(name, manifest=None):
+    """
+    Copy a figure's rendered files over the committed figures.
+
+    Committed files that already hold the rendered figure are left alone.
+
+    Parameters:
+    -----------
+    name : str
+        Registered figure name, rendered beforehand
+    manifest : dict, optional
+        Figure store manifest to update; loaded and saved automatically if None
+
+    Returns:
+    --------
+    list of str
+        Committed paths that changed
+    """
+    own_manifest = manifest is None
+    if own_manifest:
+        manifest = figure_store.load_manifest()
+
+    changed = []
+    for path in named_paths(FIGURES[name]):
+        rendered_file, reference_file = REPO_ROOT / path, REPO_ROOT / reference_path(path)
+        if not rendered_file.exists():
+            raise FileNotFoundError(f"{path} has not been rendered")
+        if _file_hash(reference_file) != _file_hash(rendered_file):
+            changed.append(str(reference_path(path)))
+        figure_store.store_file(rendered_file, manifest=manifest)
+        figure_store.link_alias(rendered_file, reference_file, manifest=manifest)
+
+    if own_manifest:
+        figure_store.save_manifest(manifest)
+    return changed
+
+# ---------------------------------------------------------------------------
+# Figures
+# ---------------------------------------------------------------------------
+
+def render_series_deep_dive(output_paths, series):
+    """
+    Ranking and cumulative score trajectories of one series.
+
+    Parameters:
+    -----------
+    output_paths : list of Path
+        Where to save the figure
+    series : int
+        Series number
+    """
+    import numpy as np
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    from plot_utils import apply_plot_style, get_style, save_figure
+    from data_loader import load_raw
+
+    matrix = pd.read_csv(REPO_ROOT / "data" / "processed" / "scores_by_series" / f"series_{series}_scores.csv")
+    names = matrix["ContestantName"].tolist()
+    scores = matrix.filter(like="Score_Task_").to_numpy(dtype=float)
+    cumulative = np.cumsum(scores, axis=1)
+    ranks = pd.DataFrame(cumulative).rank(axis=0, method="first", ascending=False).to_numpy()
+    task_numbers = np.arange(1, scores.shape[1] + 1)
+
+    # Episode of each task number, in the task order of the score matrix
+    raw = load_raw("scores.csv", columns=["series", "episode", "task_id"])
+    episodes = (raw[raw["series"] == series].drop_duplicates("task_id")
+                .sort_values("task_id")["episode"].to_numpy())
+
+    apply_plot_style()
+    colors = get_style().palette("husl", len(names))
+    fig, (ax_rank, ax_cum) = plt.subplots(2, 1, figsize=(15.5, 9.25))
+
+    boundaries = np.flatnonzero(np.diff(episodes)) + 1.5
+    edges = np.concatenate([[0.5], boundaries, [len(episodes) + 0.5]])
+    for i, (left, right) in enumerate(zip(edges[:-1], edges[1:])):
+        if i % 2 == 0:
+            ax_rank.axvspan(left, right, color="0.9", alpha=0.6, zorder=0)
+        ax_rank.text((left + right) / 2, 0.2, f"Ep {episodes[int(left + 0.5) - 1]}", ha="center",
+                     fontsize=9, fontweight="bold", color="0.4")
+    for boundary in boundaries:
+        ax_rank.axvline(boundary, color="0.4", linestyle="--", linewidth=1.2)
+
+    for i, name in enumerate(names):
+        style = dict(color=colors[i], marker="o", linewidth=2.5, markersize=6,
+                     markeredgecolor="white", alpha=0.85, label=name)
+        ax_rank.plot(task_numbers, ranks[i], **style)
+        ax_cum.plot(task_numbers, cumulative[i], **style)
+
+    ax_rank.set_ylim(len(names) + 0.5, 0.5)
+    ax_rank.set_yticks(range(1, len(names) + 1))
+    ax_rank.set_xlabel("Task Number", fontweight="bold")
+    ax_rank.set_ylabel("Ranking Position", fontweight="bold")
+    ax_cum.set_xlabel("Task Number", fontweight="bold")
+    ax_cum.set_ylabel("Cumulative Score", fontweight="bold")
+    ax_cum.grid(True, alpha=0.3)
+    ax_cum.legend(bbox_to_anchor=(1.05, 1), loc="upper left")
+    fig.suptitle(f"Taskmaster Series {series} Deep Dive", fontsize=16, fontweight="bold")
+    fig.tight_layout(h_pad=3)
+
+    for output_path in output_paths:
+        save_figure(fig, output_path)
+
+    final = cumulative[:, -1]
+    return {"series": series, "winner": names[int(np.argmax(final))], "final_scores": final.tolist()}
+
+for _series in range(1, 19):
+    add_figure(
+        f"series_{_series}_deep_dive",
+        render_series_deep_dive,
+        inputs=[f"data/processed/scores_by_series/series_{_series}_scores.csv", "data/raw/scores.csv"],
+        outputs=[f"{RENDER_DIR}/main/series_{_series}_deep_dive.png"],
+        aliases={f"{RENDER_DIR}/main/series_{_series}_deep_dive.png": [
+            f"{RENDER_DIR}/supplementary/series_{_series}_deep_dive.png",
+            f"{RENDER_DIR}/supplementary/S3_Fig_series{_series}.png"
+        ]},
+        series=_series
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render registered figures in parallel")
+    parser.add_argument("figures", nargs="*", help="Figures to render (default: all)")
+    parser.add_argument("--force", action="store_true", help="Render even if inputs are unchanged")
+    parser.add_argument("--workers", type=int, default=None, help="Number of render processes")
+    parser.add_argument("--list", action="store_true", help="List registered figures and exit")
+    parser.add_argument("--compare", action="store_true",
+                        help="Compare rendered figures with the committed ones and exit")
+    parser.add_argument("--tolerance", type=float, default=2.0,
+                        help="Mean absolute pixel difference accepted by --compare")
+    parser.add_argument("--promote", action="store_true",
+                        help="Copy rendered figures over the committed ones and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for spec in FIGURES.values():
+            print(f"{spec.name}: {', '.join(spec.inputs)} -> {', '.join(named_paths(spec))}")
+        sys.exit(0)
+
+    if args.compare:
+        mismatched = []
+        for name in args.figures or list(FIGURES):
+            for entry in compare_figure(name, tolerance=args.tolerance):
+                if entry["identical"]:
+                    print(f"✅ {entry['path']}: identical to {entry['reference']}")
+                elif entry["mean_diff"] is not None:
+                    icon = "✅" if entry["match"] else "❌"
+                    print(f"{icon} {entry['path']}: mean pixel difference {entry['mean_diff']:.2f}")
+                else:
+                    print(f"❌ {entry['path']}: size {entry['size']} vs {entry['reference_size']}")
+                if not entry["match"]:
+                    mismatched.append(entry["path"])
+        sys.exit(1 if mismatched else 0)
+
+    if args.promote:
+        manifest = figure_store.load_manifest()
+        for name in args.figures or list(FIGURES):
+            for path in promote_figure(name, manifest=manifest):
+                print(f"📤 {path}")
+        figure_store.save_manifest(manifest)
+        sys.exit(0)
+
+    results = render_figures(args.figures or None, max_workers=args.workers, force=args.force)
+    failed = [r["name"] for r in results if not r["success"]]
+    if failed:
+        print(f"\n❌ Failed: {', '.join(failed)}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Scoring-pattern lookup over per-task score vectors.
+
+A task's scoring pattern is the multiset of points it awarded, i.e. its score
+vector sorted ascending. With five contestants scoring 0-5 there are
+C(10, 5) = 252 possible patterns; in general, n contestants scoring within
+[lo, hi] have C(hi - lo + n, n) patterns.
+
+Patterns are numbered by their colexicographic rank in the combinatorial
+number system. A sorted vector s maps to the strictly increasing sequence
+c_j = s_j - lo + j, and its ID is sum_j C(c_j, j + 1). Ranking is then a
+gather from a small binomial table, so every task of a dataset is mapped in
+one vectorized pass without a dictionary of patterns. IDs are only
+comparable within one pattern space: they are offset by lo, so a group whose
+range reaches down to negative scores numbers even the standard patterns
+differently. Compare patterns across spaces by their score vectors (unrank).
+
+Tasks are grouped by their number of scored entries, so two-player
+tie-breaks or tasks with a missing contestant get their own pattern space
+instead of being dropped. Negative scores and bonus points widen the score
+range of their group. map_task_patterns can also collapse each team of a
+team task to a single entry when given team labels; the raw score tables
+carry no team membership, so the command line maps every entry as it is.
+
+Usage:
+    python scripts/scoring_patterns.py
+    python scripts/scoring_patterns.py --source long_task_scores.csv
+"""
+
+import argparse
+import numpy as np
+from math import comb
+
+from data_loader import load_raw
+
+# Standard scoring: five contestants, 0-5 points
+STANDARD_PLAYERS = 5
+STANDARD_MIN = 0
+STANDARD_MAX = 5
+
+class PatternSpace:
+    """
+    All sorted score vectors of n_players entries within [min_score, max_score].
+
+    Parameters:
+    -----------
+    n_players : int
+        Length of the score vectors
+    min_score, max_score : int
+        Inclusive score range
+    """
+
+    def __init__(self, n_players=STANDARD_PLAYERS, min_score=STANDARD_MIN, max_score=STANDARD_MAX):
+        if n_players < 1 or max_score < min_score:
+            raise ValueError(f"Empty pattern space: {n_players} players, scores {min_score}..{max_score}")
+        self.n_players = int(n_players)
+        self.min_score = int(min_score)
+        self.max_score = int(max_score)
+        self.size = comb(self.max_score - self.min_score + self.n_players, self.n_players)
+        if self.size >= 2 ** 62:
+            raise ValueError(f"Pattern space of {self.size} patterns does not fit in int64 IDs")
+
+        # binomials[v, k] = C(v, k) for every value c_j can take
+        values = self.max_score - self.min_score + self.n_players
+        self._binomials = np.array([[comb(v, k) for k in range(self.n_players + 1)] for v in range(values)],
+                                   dtype=np.int64)
+        self._patterns = None
+        self._moments = None
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return f"PatternSpace({self.n_players} players, {self.min_score}..{self.max_score}, {self.size} patterns)"
+
+    def rank(self, sorted_scores):
+        """
+        Pattern IDs of score vectors sorted ascending along the last axis.
+
+        Parameters:
+        -----------
+        sorted_scores : array-like
+            Integer scores of shape (m, n_players)
+
+        Returns:
+        --------
+        numpy.ndarray
+            int64 pattern IDs in [0, size)
+        """
+        scores = np.asarray(sorted_scores, dtype=np.int64)
+        if scores.shape[-1] != self.n_players:
+            raise ValueError(f"Expected vectors of {self.n_players} scores, got {scores.shape[-1]}")
+        if scores.size and (scores.min() < self.min_score or scores.max() > self.max_score):
+            raise ValueError(f"Scores outside {self.min_score}..{self.max_score}")
+        positions = np.arange(self.n_players)
+        combination = scores - self.min_score + positions
+        return self._binomials[combination, positions + 1].sum(axis=-1)
+
+    def unrank(self, pattern_ids):
+        """
+        Sorted score vectors of the given pattern IDs.
+
+        Returns:
+        --------
+        numpy.ndarray
+            Scores of shape (len(pattern_ids), n_players)
+        """
+        remainder = np.array(pattern_ids, dtype=np.int64, copy=True).reshape(-1)
+        if remainder.size and (remainder.min() < 0 or remainder.max() >= self.size):
+            raise ValueError(f"Pattern IDs outside 0..{self.size - 1}")
+        scores = np.empty((len(remainder), self.n_players), dtype=np.int64)
+        for j in range(self.n_players - 1, -1, -1):
+            # Largest c with C(c, j + 1) <= remainder; the column is non-decreasing
+            c = np.searchsorted(self._binomials[:, j + 1], remainder, side="right") - 1
+            remainder -= self._binomials[c, j + 1]
+            scores[:, j] = c - j + self.min_score
+        return scores
+
+    @property
+    def patterns(self):
+        """Every pattern of the space, row i holding pattern ID i."""
+        if self._patterns is None:
+            self._patterns = self.unrank(np.arange(self.size))
+        return self._patterns
+
+    @property
+    def moments(self):
+        """Mean, variance and skewness of every pattern, shape (size, 3)."""
+        if self._moments is None:
+            self._moments = pattern_moments(self.patterns)
+        return self._moments
+
+    def is_standard(self):
+        """Whether each pattern only uses the standard 0-5 points."""
+        patterns = self.patterns
+        return (patterns.min(axis=1) >= STANDARD_MIN) & (patterns.max(axis=1) <= STANDARD_MAX)
+
+def pattern_moments(patterns):
+    """
+    Mean, variance and skewness of each score vector (population moments).
+
+    Constant vectors have zero skewness.
+
+    Parameters:
+    -----------
+    patterns : array-like
+        Scores of shape (m, n)
+
+    Returns:
+    --------
+    numpy.ndarray
+        Array of shape (m, 3)
+    """
+    patterns = np.asarray(patterns, dtype=float)
+    mean = patterns.mean(axis=1)
+    centered = patterns - mean[:, None]
+    variance = (centered ** 2).mean(axis=1)
+    third = (centered ** 3).mean(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        skewness = np.where(variance > 0, third / variance ** 1.5, 0.0)
+    return np.column_stack([mean, variance, skewness])
+
+def map_task_patterns(task_keys, scores, teams=None, min_score=STANDARD_MIN, max_score=STANDARD_MAX):
+    """
+    Map every task of a long-format score table to its scoring pattern.
+
+    Rows are grouped by task in one sort of a packed integer key; tasks are
+    then split by their number of entries and each group is ranked in its
+    own pattern space. The score range of a group covers [min_score, max_score] and every score
+    seen in the group.
+
+    Parameters:
+    -----------
+    task_keys : array-like
+        Integer task key of every row
+    scores : array-like
+        Integer score of every row
+    teams : array-like, optional
+        Team label of every row; rows of the same task and team count once
+    min_score, max_score : int, optional
+        Score range every pattern space covers at least
+
+    Returns:
+    --------
+    dict
+        Maps the number of entries per task to a dict with "space"
+        (PatternSpace), "task" (task keys, ascending) and "pattern_id"
+    """
+    task_keys = np.asarray(task_keys, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.int64)
+    if not len(scores):
+        return {}
+
+    if teams is not None:
+        # Keep one row per (task, team)
+        team_codes = np.unique(np.asarray(teams), return_inverse=True)[1].reshape(-1)
+        first = np.unique(np.column_stack([task_keys, team_codes]), axis=0, return_index=True)[1]
+        task_keys, scores = task_keys[first], scores[first]
+
+    # One sort of a packed (task, score) key groups rows by task with their
+    # scores in ascending order; unpacking it needs no gather
+    low, high = int(scores.min()), int(scores.max())
+    width = high - low + 1
+    if (int(task_keys.max()) - int(task_keys.min()) + 1) * width < 2 ** 62:
+        base = int(task_keys.min())
+        packed = np.sort((task_keys - base) * width + (scores - low))
+        task_keys, scores = packed // width + base, packed % width + low
+    else:
+        order = np.lexsort((scores, task_keys))
+        task_keys, scores = task_keys[order], scores[order]
+
+    starts = np.flatnonzero(np.concatenate([[True], task_keys[1:] != task_keys[:-1]]))
+    tasks = task_keys[starts]
+    sizes = np.diff(np.append(starts, len(task_keys)))
+
+    results = {}
+    for n_players in np.unique(sizes):
+        selected = sizes == n_players
+        # Rows of these tasks are contiguous runs of n_players sorted scores
+        rows = starts[selected][:, None] + np.arange(n_players)
+        vectors = scores[rows]
+        space = PatternSpace(int(n_players), min(min_score, int(vectors.min())), max(max_score, int(vectors.max())))
+        results[int(n_players)] = {"space": space, "task": tasks[selected], "pattern_id": space.rank(vectors)}
+    return results
+
+def pattern_usage(space, pattern_ids):
+    """
+    Number of tasks using each pattern of a space.
+
+    Returns:
+    --------
+    numpy.ndarray
+        int64 counts of length len(space)
+    """
+    return np.bincount(np.asarray(pattern_ids, dtype=np.int64), minlength=space.size)
+
+def load_task_scores(source="scores.csv"):
+    """
+    Task keys and scores of a raw score table.
+
+    scores.csv is keyed by task_id; long_task_scores.csv numbers tasks within
+    each episode, so its key packs (SeriesID, EpisodeID, TaskID).
+
+    Returns:
+    --------
+    tuple
+        (task_keys, scores) as int64 arrays
+    """
+    if source == "long_task_scores.csv":
+        data = load_raw(source, columns=["SeriesID", "EpisodeID", "TaskID", "Score"])
+        keys = (data["SeriesID"].to_numpy(np.int64) * 1000 + data["EpisodeID"].to_numpy(np.int64)) * 1000 \
+            + data["TaskID"].to_numpy(np.int64)
+        return keys, data["Score"].to_numpy(np.int64)
+    data = load_raw(source, columns=["task_id", "total_score"])
+    return data["task_id"].to_numpy(np.int64), data["total_score"].to_numpy(np.int64)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Map tasks to scoring patterns")
+    parser.add_argument("--source", default="scores.csv", choices=["scores.csv", "long_task_scores.csv"],
+                        help="Raw score table")
+    args = parser.parse_args()
+
+    keys, points = load_task_scores(args.source)
+    for n_players, mapping in sorted(map_task_patterns(keys, points).items()):
+        space = mapping["space"]
+        usage = pattern_usage(space, mapping["pattern_id"])
+        standard = space.is_standard()
+        print(f"{n_players} entries: {len(mapping['task'])} tasks, {space}")
+        print(f"  Used patterns: {(usage > 0).sum()}/{space.size}, "
+              f"standard 0-{STANDARD_MAX} patterns used: {(usage[standard] > 0).sum()}/{standard.sum()}")
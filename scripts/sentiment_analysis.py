@@ -6,14 +6,20 @@ in the Taskmaster UK analysis project.
 """
 
 import os
+import re
 import json
+import time
 import asyncio
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 
-# Import our API utilities
-from utils.api.llm_api import AsyncLLMAPI
-from utils.api.parallel_llm import process_in_parallel
+import instrumentation
+from sentiment_cache import BlockScoreCache, make_cache_key
+from sentiment_journal import BlockJournal
+from sentiment_scheduler import CHARS_PER_TOKEN, BlockScheduler
+
+if TYPE_CHECKING:
+    from utils.api.llm_api import AsyncLLMAPI
 
 # Define sentiment categories used in the project
 SENTIMENT_CATEGORIES = [
@@ -26,6 +32,11 @@ SENTIMENT_CATEGORIES = [
     "humor"
 ]
 
+# Model settings for sentiment scoring (part of the block cache key)
+SENTIMENT_MODEL = "gpt-4o-mini"  # Use gpt-4o-mini for best efficiency/quality tradeoff
+SENTIMENT_TEMPERATURE = 0.2
+SYSTEM_MESSAGE = "You are a sentiment analysis assistant for British comedy scripts."
+
 def build_sentiment_prompt(text_block: str) -> str:
     """
     Build a prompt for sentiment analysis of Taskmaster dialogue.
@@ -48,13 +59,79 @@ Text:
 {text_block}
 """
 
-async def analyze_text_block(text_block: str, llm_api: AsyncLLMAPI) -> Dict[str, float]:
+def _field(value: Any, name: str) -> Any:
+    """Read a field of an API response given as an object or a parsed dict."""
+    if isinstance(value, dict):
+        return value.get(name)
+    return getattr(value, name, None)
+
+def _reply_text_and_usage(response: Any) -> Tuple[str, Optional[int], Optional[int]]:
+    """
+    Split a generate() result into its reply text and reported token usage.
+    
+    Args:
+        response: Reply text, or a chat completion (object or dict) with
+            choices and usage
+        
+    Returns:
+        (text, prompt_tokens, completion_tokens); the counts are None when the
+        response doesn't report them
+    """
+    usage = _field(response, "usage")
+    if isinstance(response, str) or response is None:
+        text = response or ""
+    else:
+        choices = _field(response, "choices")
+        text = _field(_field(choices[0], "message"), "content") if choices else ""
+    return text, _field(usage, "prompt_tokens"), _field(usage, "completion_tokens")
+
+async def request_scores(llm_api: "AsyncLLMAPI", prompt: str) -> str:
+    """
+    Send one sentiment prompt to the model and return the raw reply.
+    
+    Latency and token counts are recorded with the instrumentation layer,
+    using the usage the API reports and a length-based estimate where it
+    reports none; failed requests are recorded with their error type and
+    re-raised.
+    
+    Args:
+        llm_api: Configured AsyncLLMAPI instance
+        prompt: User message
+        
+    Returns:
+        Reply text
+    """
+    start = time.perf_counter()
+    estimated_prompt_tokens = (len(SYSTEM_MESSAGE) + len(prompt)) // CHARS_PER_TOKEN
+    try:
+        response = await llm_api.generate(
+            model=SENTIMENT_MODEL,
+            system_message=SYSTEM_MESSAGE,
+            user_message=prompt,
+            response_format={"type": "json_object"},
+            temperature=SENTIMENT_TEMPERATURE
+        )
+    except Exception as e:
+        instrumentation.record_llm_request(time.perf_counter() - start, estimated_prompt_tokens,
+                                           error=type(e).__name__)
+        raise
+    text, prompt_tokens, completion_tokens = _reply_text_and_usage(response)
+    instrumentation.record_llm_request(
+        time.perf_counter() - start,
+        estimated_prompt_tokens if prompt_tokens is None else prompt_tokens,
+        len(text) // CHARS_PER_TOKEN if completion_tokens is None else completion_tokens
+    )
+    return text
+
+async def analyze_text_block(text_block: str, llm_api: "AsyncLLMAPI", raise_errors: bool = False) -> Dict[str, float]:
     """
     Analyze a single text block using the LLM API.
     
     Args:
         text_block: Text to analyze
         llm_api: Configured AsyncLLMAPI instance
+        raise_errors: Re-raise API and parsing errors instead of returning
+            zero scores, so the caller can retry
         
     Returns:
         Dictionary mapping sentiment categories to scores
@@ -62,47 +139,215 @@ async def analyze_text_block(text_block: str, llm_api: AsyncLLMAPI) -> Dict[str,
     prompt = build_sentiment_prompt(text_block)
     
     try:
-        response = await llm_api.generate(
-            model="gpt-4o-mini",  # Use gpt-4o-mini for best efficiency/quality tradeoff
-            system_message="You are a sentiment analysis assistant for British comedy scripts.",
-            user_message=prompt,
-            response_format={"type": "json_object"},
-            temperature=0.2
-        )
+        response = await request_scores(llm_api, prompt)
         
         # Parse the JSON response
         sentiment_scores = json.loads(response)
         return sentiment_scores
         
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error analyzing text block: {e}")
         # Return empty scores as fallback
         return {key: 0.0 for key in SENTIMENT_CATEGORIES}
 
-def split_text_into_blocks(full_text: str, block_size: int = 500) -> List[str]:
+def build_batch_sentiment_prompt(text_blocks: List[str]) -> str:
     """
-    Split a large text into smaller blocks for analysis.
+    Build a prompt that scores several text blocks in one request.
     
     Args:
-        full_text: Complete text to analyze
-        block_size: Approximate target size for each block (in characters)
+        text_blocks: Text segments to analyze, numbered from 0 in the prompt
         
     Returns:
-        List of text blocks
+        Formatted prompt for LLM analysis
+    """
+    sentiment_list = "\n".join(f"- {s}" for s in SENTIMENT_CATEGORIES)
+    excerpts = "\n\n".join(f"[Excerpt {i}]\n{block}" for i, block in enumerate(text_blocks))
+    return f"""Analyze the following {len(text_blocks)} excerpts from the Taskmaster UK comedy panel show.
+Score each excerpt separately for the presence of the following sentiments from 0 (not at all) to 5 (very strongly):
+
+{sentiment_list}
+
+Return a JSON object with a "results" list holding one entry per excerpt, in the form
+{{"excerpt": <excerpt number>, "scores": {{<sentiment>: <score>, ...}}}}.
+
+{excerpts}
+"""
+
+def parse_batch_response(response: str, num_blocks: int) -> List[Optional[Dict[str, float]]]:
+    """
+    Extract per-block scores from a batched response.
+    
+    Args:
+        response: Raw JSON text returned by the model
+        num_blocks: Number of blocks that were sent
+        
+    Returns:
+        One score dictionary per block, or None for blocks that are missing
+        or malformed in the response. If any excerpt number is out of range
+        or repeated (e.g. the model numbered the excerpts from 1), the
+        numbering cannot be trusted and every block is None
+    """
+    results: List[Optional[Dict[str, float]]] = [None] * num_blocks
+    try:
+        data = json.loads(response)
+    except ValueError:
+        return results
+    
+    entries = data.get("results") if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        return results
+    
+    seen = set()
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        index = entry.get("excerpt")
+        scores = entry.get("scores")
+        if not isinstance(index, int) or isinstance(index, bool):
+            continue
+        if not 0 <= index < num_blocks or index in seen:
+            # Shifted or duplicated numbering would attach scores to the wrong blocks
+            return [None] * num_blocks
+        seen.add(index)
+        if isinstance(scores, dict) and all(isinstance(v, (int, float)) for v in scores.values()):
+            results[index] = scores
+    
+    return results
+
+async def analyze_text_batch(text_blocks: List[str], llm_api: "AsyncLLMAPI") -> List[Optional[Dict[str, float]]]:
+    """
+    Analyze several text blocks with a single LLM request.
+    
+    Args:
+        text_blocks: Texts to analyze
+        llm_api: Configured AsyncLLMAPI instance
+        
+    Returns:
+        One score dictionary per block, None where the response was unusable.
+        API errors are raised so the caller can retry
+    """
+    response = await request_scores(llm_api, build_batch_sentiment_prompt(text_blocks))
+    return parse_batch_response(response, len(text_blocks))
+
+def sentiment_cache_key(text_block: str) -> str:
+    """
+    Cache key for the scores of one text block.
+    
+    Args:
+        text_block: Text segment to analyze
+        
+    Returns:
+        Hash of the prompt, model, temperature and sentiment categories
+    """
+    return make_cache_key(
+        prompt=build_sentiment_prompt(text_block),
+        model=SENTIMENT_MODEL,
+        temperature=SENTIMENT_TEMPERATURE,
+        categories=SENTIMENT_CATEGORIES,
+        system_message=SYSTEM_MESSAGE
+    )
+
+def with_cache(score_block: Callable[[str], Awaitable[Dict[str, float]]],
+               cache: Optional[BlockScoreCache]) -> Callable[[str], Awaitable[Dict[str, float]]]:
+    """
+    Wrap a block scoring function so results are read from and stored in a cache.
+    
+    Args:
+        score_block: Coroutine function scoring one text block
+        cache: Block score cache, or None to return score_block unchanged
+        
+    Returns:
+        Coroutine function with the same signature as score_block
+    """
+    if cache is None:
+        return score_block
+    
+    async def cached_score_block(block: str) -> Dict[str, float]:
+        return await cache.get_or_compute(sentiment_cache_key(block), lambda: score_block(block))
+    
+    return cached_score_block
+
+class TextStats:
     """
-    # Split on newlines first
-    lines = full_text.split('\n')
+    Basic text statistics accumulated in a single pass over a script.
+    
+    Feed the script line by line with update(); the counts match what
+    str.split(), str.split('.') and str.lower().count() give on the full text.
+    """
+    
+    def __init__(self):
+        self.num_words = 0
+        self.num_sentences = 0
+        self.greg_mentions = 0
+        self.alex_mentions = 0
+        self.laughter_count = 0
+        self.applause_count = 0
+        # Whether the sentence currently being read has any non-space text
+        self._open_sentence = False
+    
+    def update(self, line: str):
+        """
+        Add one line of text (including its newline, if any) to the counts.
+        
+        Args:
+            line: Next chunk of the script
+        """
+        self.num_words += len(line.split())
+        
+        lowered = line.lower()
+        self.greg_mentions += lowered.count("greg")
+        self.alex_mentions += lowered.count("alex")
+        self.laughter_count += lowered.count("[laughter]")
+        self.applause_count += lowered.count("[applause]")
+        
+        # Sentences are the non-blank pieces between full stops
+        pieces = line.split(".")
+        for piece in pieces[:-1]:
+            if self._open_sentence or piece.strip():
+                self.num_sentences += 1
+            self._open_sentence = False
+        self._open_sentence = self._open_sentence or bool(pieces[-1].strip())
     
-    blocks = []
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Return the statistics in the basic_stats format of the analysis JSON.
+        
+        Returns:
+            Dictionary of text statistics
+        """
+        num_sentences = self.num_sentences + (1 if self._open_sentence else 0)
+        return {
+            "num_sentences": num_sentences,
+            "num_words": self.num_words,
+            "mean_sentence_length": self.num_words / num_sentences if num_sentences else 0,
+            "greg_mentions": self.greg_mentions,
+            "alex_mentions": self.alex_mentions,
+            "laughter_count": self.laughter_count,
+            "applause_count": self.applause_count
+        }
+
+def iter_text_blocks(lines: Iterable[str], block_size: int = 500) -> Iterator[str]:
+    """
+    Group lines into blocks of roughly block_size characters, lazily.
+    
+    Args:
+        lines: Lines of text without their trailing newlines
+        block_size: Approximate target size for each block (in characters)
+        
+    Yields:
+        Text blocks, with lines joined by newlines
+    """
     current_block = []
     current_size = 0
     
     for line in lines:
         line_size = len(line)
         
-        # If adding this line would exceed block size, save current block
+        # If adding this line would exceed block size, emit current block
         if current_size + line_size > block_size and current_block:
-            blocks.append('\n'.join(current_block))
+            yield '\n'.join(current_block)
             current_block = []
             current_size = 0
         
@@ -110,46 +355,63 @@ def split_text_into_blocks(full_text: str, block_size: int = 500) -> List[str]:
         current_block.append(line)
         current_size += line_size
     
-    # Add last block if not empty
+    # Emit last block if not empty
     if current_block:
-        blocks.append('\n'.join(current_block))
-    
-    return blocks
+        yield '\n'.join(current_block)
 
-async def analyze_script(script_path: str, api_key: str, max_concurrency: int = 5) -> Dict[str, Any]:
+def split_text_into_blocks(full_text: str, block_size: int = 500) -> List[str]:
     """
-    Analyze a full Taskmaster script with sentiment analysis.
+    Split a large text into smaller blocks for analysis.
     
     Args:
-        script_path: Path to the script file
-        api_key: OpenAI API key for authentication
-        max_concurrency: Maximum number of parallel API calls
+        full_text: Complete text to analyze
+        block_size: Approximate target size for each block (in characters)
         
     Returns:
-        Dictionary with sentiment analysis results
+        List of text blocks
     """
-    # Create LLM API instance
-    llm_api = AsyncLLMAPI(api_key=api_key)
-    
-    # Load script text
-    with open(script_path, 'r', encoding='utf-8') as f:
-        script_text = f.read()
+    return list(iter_text_blocks(full_text.split('\n'), block_size))
+
+def stream_script(script_path: str, stats: TextStats, block_size: int = 500) -> Iterator[str]:
+    """
+    Read a script file once, yielding its blocks and filling in its statistics.
     
-    # Split into blocks
-    text_blocks = split_text_into_blocks(script_text)
-    print(f"Split script into {len(text_blocks)} blocks for analysis")
+    Only the current block is held in memory, so this works for transcript
+    dumps of any size. The statistics are complete once the generator is
+    exhausted. Blocks are identical to split_text_into_blocks on the file text.
     
-    # Define analysis function for parallel processing
-    async def analyze_block(block: str) -> Dict[str, float]:
-        return await analyze_text_block(block, llm_api)
+    Args:
+        script_path: Path to the script file
+        stats: Statistics accumulator to update while reading
+        block_size: Approximate target size for each block (in characters)
+        
+    Yields:
+        Text blocks
+    """
+    def lines():
+        ends_with_newline = True
+        with open(script_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                stats.update(line)
+                ends_with_newline = line.endswith('\n')
+                yield line[:-1] if ends_with_newline else line
+        # str.split('\n') yields a trailing empty line after a final newline
+        if ends_with_newline:
+            yield ''
     
-    # Process all blocks in parallel
-    block_results = await process_in_parallel(
-        items=text_blocks,
-        process_func=analyze_block,
-        max_concurrency=max_concurrency
-    )
+    yield from iter_text_blocks(lines(), block_size)
+
+def summarize_script(block_results: List[Dict[str, float]], stats: TextStats) -> Dict[str, Any]:
+    """
+    Combine per-block sentiment scores and basic text statistics for a script.
     
+    Args:
+        block_results: Sentiment scores for each block, in block order
+        stats: Text statistics gathered while reading the script
+        
+    Returns:
+        Dictionary with sentiment analysis results
+    """
     # Calculate average scores across all blocks
     sentiment_totals = {category: 0.0 for category in SENTIMENT_CATEGORIES}
     sentiment_counts = {category: 0 for category in SENTIMENT_CATEGORIES}
@@ -167,16 +429,6 @@ async def analyze_script(script_path: str, api_key: str, max_concurrency: int =
         for category in SENTIMENT_CATEGORIES
     }
     
-    # Also count mentions of hosts and laughter/applause
-    greg_mentions = script_text.lower().count("greg")
-    alex_mentions = script_text.lower().count("alex")
-    laughter_count = script_text.lower().count("[laughter]")
-    applause_count = script_text.lower().count("[applause]")
-    
-    # Count basic text statistics
-    sentences = [s.strip() for s in script_text.split(".") if s.strip()]
-    words = script_text.split()
-    
     # Compile final results
     analysis_results = {
         "sentiment_analysis": {
@@ -184,27 +436,147 @@ async def analyze_script(script_path: str, api_key: str, max_concurrency: int =
             "sentiment_totals": sentiment_totals,
             "block_scores": block_results
         },
-        "basic_stats": {
-            "num_sentences": len(sentences),
-            "num_words": len(words),
-            "mean_sentence_length": len(words) / len(sentences) if sentences else 0,
-            "greg_mentions": greg_mentions,
-            "alex_mentions": alex_mentions,
-            "laughter_count": laughter_count,
-            "applause_count": applause_count
-        }
+        "basic_stats": stats.as_dict()
     }
     
     return analysis_results
 
-async def process_all_scripts(scripts_dir: str, output_dir: str, api_key: str):
+async def gather_in_parallel(items: List[str], process_func: Callable[[str], Awaitable[Dict[str, float]]],
+                             max_concurrency: int) -> List[Dict[str, float]]:
+    """
+    Apply process_func to every item with bounded concurrency, keeping order.
+    
+    Uses utils.api.parallel_llm.process_in_parallel when the project's API
+    utilities are installed; it is imported here rather than at module level
+    so that callers passing their own client also run without them.
+    
+    Args:
+        items: Inputs to process
+        process_func: Coroutine function applied to each item
+        max_concurrency: Maximum number of calls in flight
+        
+    Returns:
+        Results in the order of items
+    """
+    try:
+        from utils.api.parallel_llm import process_in_parallel
+    except ImportError:
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def bounded(item: str) -> Dict[str, float]:
+            async with semaphore:
+                return await process_func(item)
+        
+        return list(await asyncio.gather(*(bounded(item) for item in items)))
+    
+    return await process_in_parallel(items=items, process_func=process_func, max_concurrency=max_concurrency)
+
+_llm_clients: Dict[str, "AsyncLLMAPI"] = {}
+
+def shared_llm_api(api_key: str) -> "AsyncLLMAPI":
+    """
+    Return the process-wide AsyncLLMAPI for an API key, creating it once.
+    
+    Every script scored in the process goes through the same client, so its
+    HTTP connections stay open and are reused instead of being set up again
+    for each script.
+    
+    Args:
+        api_key: OpenAI API key for authentication
+        
+    Returns:
+        The shared AsyncLLMAPI instance
+    """
+    if api_key not in _llm_clients:
+        from utils.api.llm_api import AsyncLLMAPI
+        _llm_clients[api_key] = AsyncLLMAPI(api_key=api_key)
+    return _llm_clients[api_key]
+
+async def analyze_script(script_path: str, api_key: str, max_concurrency: int = 5,
+                         cache: Optional[BlockScoreCache] = None,
+                         llm_api: Optional["AsyncLLMAPI"] = None) -> Dict[str, Any]:
+    """
+    Analyze a full Taskmaster script with sentiment analysis.
+    
+    Args:
+        script_path: Path to the script file
+        api_key: OpenAI API key for authentication
+        max_concurrency: Maximum number of parallel API calls
+        cache: Optional block score cache; only uncached blocks are sent
+        llm_api: Client to send the requests through (default: the
+            process-wide client from shared_llm_api)
+        
+    Returns:
+        Dictionary with sentiment analysis results
+    """
+    if llm_api is None:
+        llm_api = shared_llm_api(api_key)
+    
+    # Read the script once, splitting into blocks and counting text statistics
+    stats = TextStats()
+    text_blocks = list(stream_script(script_path, stats))
+    print(f"Split script into {len(text_blocks)} blocks for analysis")
+    
+    # Define analysis function for parallel processing
+    async def score_block(block: str) -> Dict[str, float]:
+        return await analyze_text_block(block, llm_api, raise_errors=True)
+    
+    cached_score_block = with_cache(score_block, cache)
+    
+    async def analyze_block(block: str) -> Dict[str, float]:
+        try:
+            return await cached_score_block(block)
+        except Exception as e:
+            print(f"Error analyzing text block: {e}")
+            return {key: 0.0 for key in SENTIMENT_CATEGORIES}
+    
+    # Process all blocks in parallel
+    with instrumentation.stage("sentiment.script", script=Path(script_path).name, blocks=len(text_blocks)):
+        block_results = await gather_in_parallel(text_blocks, analyze_block, max_concurrency)
+    
+    return summarize_script(block_results, stats)
+
+async def process_all_scripts(scripts_dir: str, output_dir: str, api_key: str,
+                              max_concurrency: int = 20,
+                              requests_per_minute: Optional[float] = 500,
+                              tokens_per_minute: Optional[float] = 200000,
+                              score_block: Optional[Callable[[str], Awaitable[Dict[str, float]]]] = None,
+                              cache_path: Optional[str] = None,
+                              cache_size: int = 200000,
+                              batch_tokens: Optional[int] = None,
+                              max_batch_size: int = 16,
+                              score_batch: Optional[Callable[[List[str]], Awaitable[List[Optional[Dict[str, float]]]]]] = None,
+                              llm_api: Optional["AsyncLLMAPI"] = None):
     """
     Process all script files in a directory.
     
+    Blocks from every script go through one shared work queue, so the run is
+    limited by the API rate limits rather than by the slowest script. Each
+    scored block is journaled, so an interrupted run resumes where it stopped.
+    
     Args:
         scripts_dir: Directory containing script files
         output_dir: Directory to save analysis results
         api_key: OpenAI API key
+        max_concurrency: Maximum number of API calls in flight across all scripts
+        requests_per_minute: Request rate limit (None for no limit)
+        tokens_per_minute: Token rate limit (None for no limit)
+        score_block: Optional coroutine function scoring one block, used
+            instead of the OpenAI API (e.g. a local fake endpoint)
+        cache_path: SQLite file for the block score cache (defaults to
+            block_cache.sqlite in output_dir when scoring through the API);
+            pass "" to disable caching. With score_block or score_batch
+            injected there is no default cache, since the cache keys name
+            the real model and would mix its scores with the stand-in's
+        cache_size: Maximum number of cached blocks
+        batch_tokens: Token budget per request for batched scoring; None sends
+            one block per request
+        max_batch_size: Maximum number of blocks per batched request
+        score_batch: Optional coroutine function scoring a list of blocks, used
+            instead of the OpenAI API in batched mode
+        llm_api: Client for the API requests (default: the process-wide
+            client from shared_llm_api); one client serves every script of
+            the run
     """
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
@@ -213,27 +585,154 @@ async def process_all_scripts(scripts_dir: str, output_dir: str, api_key: str):
     script_files = list(Path(scripts_dir).glob("*.txt"))
     print(f"Found {len(script_files)} script files to analyze")
     
-    # Process each script
-    for script_path in script_files:
-        output_path = Path(output_dir) / f"{script_path.stem}_analysis.json"
-        
-        # Skip if already analyzed
-        if output_path.exists():
-            print(f"Skipping {script_path.name} - already analyzed")
-            continue
-        
-        print(f"Analyzing {script_path.name}...")
-        try:
-            results = await analyze_script(script_path, api_key)
+    # Scores from injected scorers must not land in the cache of the real model
+    injected_scorer = score_block is not None or score_batch is not None
+    
+    if llm_api is None and (score_block is None or (batch_tokens and score_batch is None)):
+        # One client for the whole run, so connections are reused across scripts
+        llm_api = shared_llm_api(api_key)
+    
+    if score_block is None:
+        async def score_block(block: str) -> Dict[str, float]:
+            return await analyze_text_block(block, llm_api, raise_errors=True)
+    
+    if not batch_tokens:
+        score_batch = None
+    elif score_batch is None:
+        async def score_batch(blocks: List[str]) -> List[Optional[Dict[str, float]]]:
+            return await analyze_text_batch(blocks, llm_api)
+    
+    if cache_path is None:
+        cache_path = "" if injected_scorer else Path(output_dir) / "block_cache.sqlite"
+    cache = BlockScoreCache(cache_path, max_entries=cache_size) if cache_path else None
+    
+    journals = []
+    
+    def pending_scripts():
+        for script_path in script_files:
+            output_path = Path(output_dir) / f"{script_path.stem}_analysis.json"
             
-            # Save results to JSON
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=2)
+            # Skip if already analyzed
+            if output_path.exists():
+                print(f"Skipping {script_path.name} - already analyzed")
+                continue
             
-            print(f"Analysis complete for {script_path.name}")
+            # Pick up blocks scored by an interrupted earlier run
+            journal = BlockJournal(Path(output_dir) / f"{script_path.stem}_analysis.journal.jsonl")
+            journals.append(journal)
+            recovered = journal.replay()
+            if recovered:
+                print(f"Resuming {script_path.name} - {recovered} blocks in journal")
             
-        except Exception as e:
-            print(f"Error processing {script_path.name}: {e}")
+            # Blocks are read lazily as the scheduler has room for them
+            print(f"Queued {script_path.name}")
+            stats = TextStats()
+            yield script_path.name, (stats, output_path, journal), stream_script(script_path, stats)
+    
+    def resume_block(script_name: str, context, block_index: int, block: str) -> Optional[Dict[str, float]]:
+        journal = context[2]
+        return journal.lookup(block_index, sentiment_cache_key(block))
+    
+    def record_block(script_name: str, context, block_index: int, block: str, scores: Dict[str, float]):
+        journal = context[2]
+        journal.append(block_index, sentiment_cache_key(block), scores)
+    
+    def save_results(script_name: str, context, block_results: List[Dict[str, float]]):
+        stats, output_path, journal = context
+        results = summarize_script(block_results, stats)
+        
+        # Save results to JSON and drop the journal
+        journal.compact(output_path, results)
+        
+        print(f"Analysis complete for {script_name}")
+    
+    scheduler = BlockScheduler(
+        score_block=score_block,
+        on_script_done=save_results,
+        max_concurrency=max_concurrency,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        fallback=lambda: {key: 0.0 for key in SENTIMENT_CATEGORIES},
+        cache=cache,
+        cache_key=sentiment_cache_key,
+        score_batch=score_batch,
+        max_batch_tokens=batch_tokens or 0,
+        max_batch_size=max_batch_size,
+        resume=resume_block,
+        on_block_done=record_block
+    )
+    try:
+        with instrumentation.stage("sentiment.run", scripts=len(script_files)):
+            stats = await scheduler.run(pending_scripts())
+    finally:
+        for journal in journals:
+            journal.close()
+
+    print(f"Scored {stats.scripts_completed} scripts with {stats.requests} requests "
+          f"({stats.retries} retries, {stats.failures} failed blocks, "
+          f"{stats.resumed_blocks} blocks resumed from journals)")
+    if score_batch is not None:
+        print(f"Batched requests: {stats.batches} ({stats.batch_splits} split after incomplete replies)")
+    
+    if cache is not None:
+        print(f"Block cache: {cache.stats.hits} hits, {cache.stats.misses} misses "
+              f"({cache.stats.hit_rate:.1%} hit rate), {len(cache)} entries")
+        cache.close()
+
+# Script files are named by episode_id, e.g. 3_5.txt for series 3 episode 5
+EPISODE_SCRIPT_PATTERN = re.compile(r"^(\d+)_(\d+)")
+
+def update_sentiment_table(analysis_dir: str, table_path: str = "data/raw/sentiment.csv") -> int:
+    """
+    Write the per-script analyses into the episode-level sentiment table.
+    
+    Episodes with an analysis JSON get fresh text statistics and avg_/total_
+    sentiment columns; the other rows of the table are kept as they are.
+    New episodes take their title from data/raw/imdb_ratings.csv.
+    
+    Args:
+        analysis_dir: Directory with the *_analysis.json files
+        table_path: Episode-level table read by the analyses
+        
+    Returns:
+        Number of episodes updated
+    """
+    import pandas as pd
+    from data_loader import load_raw
+    
+    rows = []
+    for path in sorted(Path(analysis_dir).glob("*_analysis.json")):
+        match = EPISODE_SCRIPT_PATTERN.match(path.name[:-len("_analysis.json")])
+        if not match:
+            print(f"Skipping {path.name} - not named <series>_<episode>")
+            continue
+        with open(path, "r") as f:
+            results = json.load(f)
+        series, episode = int(match.group(1)), int(match.group(2))
+        row = {"series": series, "episode": episode, **results["basic_stats"]}
+        for prefix, key in (("avg", "sentiment_averages"), ("total", "sentiment_totals")):
+            for category in SENTIMENT_CATEGORIES:
+                column = category.replace("-", "_").replace(" ", "_")
+                row[f"{prefix}_{column}"] = results["sentiment_analysis"][key][category]
+        row["episode_id"] = f"{series}_{episode}"
+        rows.append(row)
+    if not rows:
+        return 0
+    
+    table = pd.read_csv(table_path)
+    updates = pd.DataFrame(rows)
+    titles = dict(zip(table["episode_id"], table["title"]))
+    ratings = load_raw("imdb_ratings.csv", columns=["episode_id", "episode_title"])
+    for episode_id, title in zip(ratings["episode_id"].astype(str), ratings["episode_title"].astype(str)):
+        titles.setdefault(episode_id, title)
+    updates["title"] = updates["episode_id"].map(titles)
+    
+    table = pd.concat([table[~table["episode_id"].isin(updates["episode_id"])], updates[table.columns]])
+    table = table.sort_values(["series", "episode"])
+    tmp_path = f"{table_path}.tmp"
+    table.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, table_path)
+    return len(updates)
 
 # Example usage (when run directly)
 if __name__ == "__main__":
@@ -248,10 +747,31 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Analyze Taskmaster scripts for sentiment")
     parser.add_argument("--scripts", default="data/scripts", help="Directory containing script files")
     parser.add_argument("--output", default="data/analysis", help="Directory to save analysis results")
+    parser.add_argument("--concurrency", type=int, default=20, help="Maximum API calls in flight")
+    parser.add_argument("--rpm", type=float, default=500, help="Requests per minute limit")
+    parser.add_argument("--tpm", type=float, default=200000, help="Tokens per minute limit")
+    parser.add_argument("--cache", default=None, help="Block score cache file (default: <output>/block_cache.sqlite)")
+    parser.add_argument("--no-cache", action="store_true", help="Query every block even if it was scored before")
+    parser.add_argument("--batch-tokens", type=int, default=None,
+                        help="Pack several blocks into one request up to this many tokens")
+    parser.add_argument("--max-batch-size", type=int, default=16, help="Maximum blocks per batched request")
+    parser.add_argument("--cache-size", type=int, default=200000, help="Maximum number of cached blocks")
+    parser.add_argument("--update-table", default=None, metavar="CSV",
+                        help="Only write the existing analyses into this episode table (e.g. data/raw/sentiment.csv)")
     args = parser.parse_args()
     
     # Run script processing
-    if api_key:
-        asyncio.run(process_all_scripts(args.scripts, args.output, api_key))
+    if args.update_table:
+        count = update_sentiment_table(args.output, args.update_table)
+        print(f"Updated {count} episodes in {args.update_table}")
+    elif api_key:
+        asyncio.run(process_all_scripts(args.scripts, args.output, api_key,
+                                        max_concurrency=args.concurrency,
+                                        requests_per_minute=args.rpm,
+                                        tokens_per_minute=args.tpm,
+                                        cache_path="" if args.no_cache else args.cache,
+                                        cache_size=args.cache_size,
+                                        batch_tokens=args.batch_tokens,
+                                        max_batch_size=args.max_batch_size))
     else:
         print("Error: No OpenAI API key found. Set the OPENAI_API_KEY environment variable.") 
\ No newline at end of file
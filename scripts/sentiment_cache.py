@@ -0,0 +1,212 @@
+"""
+On-disk Cache for Sentiment Block Scores
+
+Stores the parsed LLM response for each text block in a SQLite file, keyed by
+a content hash of everything that determines the answer (prompt, model,
+temperature, categories). Re-running the corpus only queries blocks whose
+prompt actually changed.
+
+The cache is bounded to a maximum number of entries and evicts the least
+recently used ones. Recency updates from cache hits are held in memory and
+written in batches, so a hit costs one SELECT rather than a commit.
+Concurrent requests for the same key from many coroutines share a single
+computation.
+"""
+
+import json
+import sqlite3
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence
+
+import instrumentation
+
+# Cache hits whose recency update is written in one commit
+TOUCH_FLUSH_EVERY = 256
+
+def make_cache_key(prompt: str, model: str, temperature: float,
+                   categories: Sequence[str], system_message: str = "") -> str:
+    """
+    Build a content-addressed key for one scoring request.
+
+    Args:
+        prompt: Full user prompt sent to the model
+        model: Model name
+        temperature: Sampling temperature
+        categories: Sentiment categories requested
+        system_message: System message sent with the prompt
+
+    Returns:
+        SHA-256 hex digest identifying the request
+    """
+    payload = json.dumps({
+        "prompt": prompt,
+        "model": model,
+        "temperature": temperature,
+        "categories": list(categories),
+        "system_message": system_message
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters for one cache instance."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+class BlockScoreCache:
+    """
+    Size-bounded LRU cache of block scores backed by SQLite.
+
+    Args:
+        path: SQLite file to store the cache in
+        max_entries: Maximum number of cached blocks before LRU eviction
+    """
+
+    def __init__(self, path: str, max_entries: int = 200000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._touched: Dict[str, int] = {}
+
+        self._db = sqlite3.connect(str(self.path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS block_scores (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                last_used INTEGER NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON block_scores (last_used)")
+        self._db.commit()
+
+        row = self._db.execute("SELECT COALESCE(MAX(last_used), 0), COUNT(*) FROM block_scores").fetchone()
+        self._clock, self._size = row
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached value and mark it as recently used.
+
+        Args:
+            key: Cache key from make_cache_key
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        row = self._db.execute("SELECT value FROM block_scores WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            instrumentation.count("llm.cache_misses")
+            return None
+
+        self.stats.hits += 1
+        instrumentation.count("llm.cache_hits")
+        self._touched[key] = self._tick()
+        if len(self._touched) >= TOUCH_FLUSH_EVERY:
+            self.flush()
+        return json.loads(row[0])
+
+    def flush(self):
+        """Write the pending recency updates of cache hits in one commit."""
+        if not self._touched:
+            return
+        self._db.executemany("UPDATE block_scores SET last_used = ? WHERE key = ?",
+                             [(tick, key) for key, tick in self._touched.items()])
+        self._touched.clear()
+        self._db.commit()
+
+    def put(self, key: str, value: Any):
+        """
+        Store a value, evicting the least recently used entries if needed.
+
+        Args:
+            key: Cache key from make_cache_key
+            value: JSON-serializable value to store
+        """
+        exists = self._db.execute("SELECT 1 FROM block_scores WHERE key = ?", (key,)).fetchone()
+        self._db.execute(
+            "INSERT OR REPLACE INTO block_scores (key, value, last_used) VALUES (?, ?, ?)",
+            (key, json.dumps(value), self._tick())
+        )
+        if exists is None:
+            self._size += 1
+
+        self._touched.pop(key, None)
+        excess = self._size - self.max_entries
+        if excess > 0:
+            # Evict by up-to-date recency
+            self.flush()
+            self._db.execute("""
+                DELETE FROM block_scores WHERE key IN (
+                    SELECT key FROM block_scores ORDER BY last_used ASC LIMIT ?
+                )
+            """, (excess,))
+            self.stats.evictions += excess
+            self._size -= excess
+        self._db.commit()
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for a key, computing and storing it on a miss.
+
+        Coroutines asking for a key that is already being computed wait for
+        that computation instead of starting another one. Failed computations
+        are not cached.
+
+        Args:
+            key: Cache key from make_cache_key
+            compute: Coroutine function producing the value
+
+        Returns:
+            The cached or freshly computed value
+        """
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats.hits += 1
+            instrumentation.count("llm.cache_hits")
+            return await asyncio.shield(pending)
+
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters get the exception; mark it retrieved if nobody was waiting
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def close(self):
+        """Write pending recency updates and close the underlying database."""
+        self.flush()
+        self._db.close()
@@ -0,0 +1,140 @@
+"""
+Block-level Checkpoint Journal for Sentiment Runs
+
+Each script being scored gets an append-only JSONL journal next to its output
+file. Every line records one completed block:
+
+    {"block": 12, "hash": "<cache key of the block>", "scores": {...}}
+
+If a run is interrupted, the next run replays the journal and only scores the
+blocks that are missing or whose hash no longer matches (e.g. because the
+script or the prompt changed). Once the script finishes, its final analysis
+JSON is written and the journal is removed.
+"""
+
+import os
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+class BlockJournal:
+    """
+    Append-only journal of block results for one script.
+
+    Args:
+        path: JSONL file to replay from and append to
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        self._file = None
+
+    def replay(self) -> int:
+        """
+        Load the results recorded by earlier runs.
+
+        Lines that don't parse (e.g. a write cut short by a crash) are ignored;
+        later lines for the same block override earlier ones.
+
+        Returns:
+            Number of blocks recovered
+        """
+        self.entries = {}
+        if not self.path.exists():
+            return 0
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    self.entries[int(entry["block"])] = entry
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return len(self.entries)
+
+    def lookup(self, block_index: int, block_hash: str) -> Optional[Any]:
+        """
+        Return the recorded scores for a block if its hash still matches.
+
+        Args:
+            block_index: Position of the block in the script
+            block_hash: Hash of the block as it would be scored now
+
+        Returns:
+            The recorded scores, or None if the block must be scored again
+        """
+        entry = self.entries.get(block_index)
+        if entry is None or entry.get("hash") != block_hash:
+            return None
+        return entry.get("scores")
+
+    def append(self, block_index: int, block_hash: str, scores: Any):
+        """
+        Record a completed block and flush it to disk.
+
+        Args:
+            block_index: Position of the block in the script
+            block_hash: Hash of the block
+            scores: Result for the block
+        """
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._drop_partial_line()
+            self._file = open(self.path, 'a', encoding='utf-8')
+        entry = {"block": block_index, "hash": block_hash, "scores": scores}
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        self.entries[block_index] = entry
+
+    def _drop_partial_line(self, chunk_size: int = 4096):
+        """
+        Cut off a last line left unterminated by a crash.
+
+        Otherwise the next append would be glued onto it and both records
+        would be lost on replay.
+        """
+        if not self.path.exists():
+            return
+        with open(self.path, 'r+b') as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - chunk_size)
+                f.seek(start)
+                newline = f.read(position - start).rfind(b"\n")
+                if newline >= 0:
+                    keep = start + newline + 1
+                    break
+                position = start
+            else:
+                keep = 0
+            if keep < end:
+                f.truncate(keep)
+
+    def close(self):
+        """Close the journal file if it is open."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def compact(self, output_path: str, results: Dict[str, Any]):
+        """
+        Write the final results for the script and drop the journal.
+
+        The output is written to a temporary file and renamed into place, so
+        the journal is only removed once the final JSON is safely on disk.
+
+        Args:
+            output_path: Final analysis JSON path
+            results: Complete analysis results for the script
+        """
+        output_path = Path(output_path)
+        tmp_path = output_path.with_name(output_path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        os.replace(tmp_path, output_path)
+
+        self.close()
+        self.path.unlink(missing_ok=True)
+        self.entries = {}
@@ -0,0 +1,460 @@
+"""
+Corpus-wide Work Queue for Sentiment Scoring
+
+This module schedules text blocks from many scripts through a single bounded
+worker pool, so throughput is limited by the API rate limits rather than by
+per-script barriers. Blocks from every script share one queue; results are
+reassembled per script and handed to a callback as soon as a script's last
+block completes. Blocks found in the optional score cache bypass the rate
+limiter entirely.
+
+In batched mode each worker packs several queued blocks into one request,
+sized to a token budget, and splits the batch when the reply is unusable.
+
+The scoring function is injected, which keeps the scheduler independent of
+the LLM client and lets it run against a local fake endpoint.
+"""
+
+import time
+import random
+import asyncio
+import inspect
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import instrumentation
+
+# Rough characters-per-token ratio for English prose
+CHARS_PER_TOKEN = 4
+
+# Tokens added to every request for the system message, prompt preamble and reply
+REQUEST_TOKEN_OVERHEAD = 200
+
+# Reply tokens per block in a batched request (one JSON score dict)
+BLOCK_REPLY_TOKENS = 60
+
+# Marks a block that failed with no fallback configured
+_FAILED = object()
+
+@dataclass
+class _Fallback:
+    """Fallback result for a failed block; never reported to on_block_done."""
+    value: Any
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens a request for this text will consume.
+
+    Args:
+        text: Text block that will be embedded in the prompt
+
+    Returns:
+        Approximate token count including fixed prompt overhead
+    """
+    return len(text) // CHARS_PER_TOKEN + REQUEST_TOKEN_OVERHEAD
+
+def estimate_batch_tokens(texts: List[str]) -> int:
+    """
+    Estimate the tokens consumed by one batched request for several blocks.
+
+    Args:
+        texts: Text blocks packed into the request
+
+    Returns:
+        Approximate token count; the prompt overhead is paid once per batch
+    """
+    return REQUEST_TOKEN_OVERHEAD + sum(len(t) // CHARS_PER_TOKEN + BLOCK_REPLY_TOKENS for t in texts)
+
+class RateLimiter:
+    """
+    Token-bucket limiter for requests per minute and tokens per minute.
+
+    Each bucket holds up to one minute's budget and refills continuously.
+    A limit of None disables that bucket.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._request_budget = float(requests_per_minute or 0)
+        self._token_budget = float(tokens_per_minute or 0)
+        self._last_refill = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_budget = min(float(self.requests_per_minute),
+                                       self._request_budget + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._token_budget = min(float(self.tokens_per_minute),
+                                     self._token_budget + elapsed * self.tokens_per_minute / 60)
+
+    def _wait_time(self, tokens: int) -> float:
+        """Seconds until both buckets can cover one request of this size."""
+        wait = 0.0
+        if self.requests_per_minute and self._request_budget < 1:
+            wait = max(wait, (1 - self._request_budget) * 60 / self.requests_per_minute)
+        if self.tokens_per_minute:
+            # A request larger than the whole bucket only waits for a full bucket
+            needed = min(tokens, self.tokens_per_minute)
+            if self._token_budget < needed:
+                wait = max(wait, (needed - self._token_budget) * 60 / self.tokens_per_minute)
+        return wait
+
+    async def acquire(self, tokens: int = 0):
+        """
+        Wait until a request of the given token size fits in both budgets.
+
+        Args:
+            tokens: Estimated tokens the request will consume
+        """
+        # The lock keeps callers in FIFO order so large requests aren't starved
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            if self.requests_per_minute:
+                self._request_budget -= 1
+            if self.tokens_per_minute:
+                self._token_budget -= min(tokens, self.tokens_per_minute)
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 30.0) -> float:
+    """
+    Full-jitter exponential backoff delay.
+
+    Args:
+        attempt: Zero-based retry attempt number
+        base_delay: Delay scale for the first retry (seconds)
+        max_delay: Upper bound on the delay (seconds)
+
+    Returns:
+        Random delay in [0, min(max_delay, base_delay * 2**attempt)]
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+@dataclass
+class _ScriptState:
+    """Bookkeeping for one script while its blocks are in flight."""
+    script_id: str
+    context: Any = None
+    results: Dict[int, Any] = field(default_factory=dict)
+    submitted: int = 0
+    closed: bool = False
+    done: bool = False
+
+@dataclass
+class SchedulerStats:
+    """Counters collected over one scheduler run."""
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    scripts_completed: int = 0
+    batches: int = 0
+    batch_splits: int = 0
+    resumed_blocks: int = 0
+
+class BlockScheduler:
+    """
+    Feed blocks from many scripts into one bounded pool of workers.
+
+    Args:
+        score_block: Coroutine function scoring one text block. It should raise
+            on failure so the block can be retried
+        on_script_done: Callback (sync or async) called with
+            (script_id, context, block_results) once every block of a script is
+            scored; block_results is ordered by block index
+        max_concurrency: Maximum number of requests in flight
+        requests_per_minute: Request rate limit (None for no limit)
+        tokens_per_minute: Token rate limit (None for no limit)
+        max_retries: Retries per block before falling back
+        fallback: Function returning the result for a block that kept failing
+        base_delay: Backoff scale for retries (seconds)
+        max_delay: Backoff cap for retries (seconds)
+        token_estimator: Function mapping a block to its estimated token cost
+        cache: Optional cache with an async get_or_compute(key, compute) method
+            (see sentiment_cache.BlockScoreCache). Failed blocks are not cached
+        cache_key: Function mapping a block to its cache key (required with cache)
+        score_batch: Optional coroutine function scoring a list of blocks in one
+            request. It returns one result per block, with None for blocks
+            missing from the reply. Enables batched mode
+        max_batch_tokens: Estimated token budget for one batched request
+        max_batch_size: Maximum number of blocks in one batched request
+        resume: Optional function (script_id, context, block_index, block)
+            returning a previously computed result for the block, or None.
+            Blocks with a result are not scored again
+        on_block_done: Optional callback (sync or async) called with
+            (script_id, context, block_index, block, result) for every block
+            scored successfully during this run (not for fallbacks)
+    """
+
+    def __init__(self,
+                 score_block: Callable[[str], Awaitable[Any]],
+                 on_script_done: Callable[[str, Any, List[Any]], Any],
+                 max_concurrency: int = 20,
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 max_retries: int = 5,
+                 fallback: Optional[Callable[[], Any]] = None,
+                 base_delay: float = 1.0,
+                 max_delay: float = 30.0,
+                 token_estimator: Callable[[str], int] = estimate_tokens,
+                 cache: Optional[Any] = None,
+                 cache_key: Optional[Callable[[str], str]] = None,
+                 score_batch: Optional[Callable[[List[str]], Awaitable[List[Optional[Any]]]]] = None,
+                 max_batch_tokens: int = 4000,
+                 max_batch_size: int = 16,
+                 resume: Optional[Callable[[str, Any, int, str], Optional[Any]]] = None,
+                 on_block_done: Optional[Callable[[str, Any, int, str, Any], Any]] = None):
+        self.score_block = score_block
+        self.on_script_done = on_script_done
+        self.max_concurrency = max_concurrency
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.fallback = fallback
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.token_estimator = token_estimator
+        self.cache = cache
+        self.cache_key = cache_key
+        self.score_batch = score_batch
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size if score_batch is not None else 1
+        self.resume = resume
+        self.on_block_done = on_block_done
+        self.stats = SchedulerStats()
+        self._states: Dict[str, _ScriptState] = {}
+
+    async def _request_with_retry(self, request: Callable[[Any], Awaitable[Any]], payload: Any,
+                                  tokens: int) -> Any:
+        """Send one request through the rate limiter, retrying failures with backoff."""
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(tokens)
+            self.stats.requests += 1
+            try:
+                return await request(payload)
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                self.stats.retries += 1
+                instrumentation.count("llm.retries")
+                await asyncio.sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+
+    def _give_up(self, error: Exception) -> Any:
+        """Result for a block that kept failing: the fallback, or the failure marker."""
+        self.stats.failures += 1
+        print(f"Giving up on text block after {self.max_retries + 1} attempts: {error}")
+        return _FAILED if self.fallback is None else _Fallback(self.fallback())
+
+    async def _score_single(self, block: str) -> Any:
+        request = lambda b: self._request_with_retry(self.score_block, b, self.token_estimator(b))
+        try:
+            if self.cache is None:
+                return await request(block)
+            # Cache hits never touch the rate limiter
+            return await self.cache.get_or_compute(self.cache_key(block), lambda: request(block))
+        except Exception as e:
+            return self._give_up(e)
+
+    async def _fill_batch(self, blocks: List[str], results: List[Any], todo: List[int]):
+        """
+        Score the blocks at positions todo, splitting the batch on bad replies.
+
+        Blocks missing from a batched reply (or all of them, if the reply could
+        not be parsed) are split into two halves and retried; a single
+        remaining block goes through the one-block prompt. If the request
+        itself still fails after its retries, splitting would only multiply
+        failing requests, so every block of the batch is given up on.
+        """
+        if not todo:
+            return
+
+        if len(todo) == 1:
+            i = todo[0]
+            try:
+                results[i] = await self._request_with_retry(self.score_block, blocks[i],
+                                                            self.token_estimator(blocks[i]))
+                if self.cache is not None:
+                    self.cache.put(self.cache_key(blocks[i]), results[i])
+            except Exception as e:
+                results[i] = self._give_up(e)
+            return
+
+        batch = [blocks[i] for i in todo]
+        self.stats.batches += 1
+        try:
+            batch_results = list(await self._request_with_retry(self.score_batch, batch,
+                                                                 estimate_batch_tokens(batch)))
+        except Exception as e:
+            for i in todo:
+                results[i] = self._give_up(e)
+            return
+        batch_results = batch_results[:len(todo)] + [None] * (len(todo) - len(batch_results))
+
+        missing = []
+        for i, result in zip(todo, batch_results):
+            if result is None:
+                missing.append(i)
+                continue
+            results[i] = result
+            if self.cache is not None:
+                self.cache.put(self.cache_key(blocks[i]), result)
+
+        if missing:
+            self.stats.batch_splits += 1
+            half = len(missing) // 2
+            await asyncio.gather(self._fill_batch(blocks, results, missing[:half]),
+                                 self._fill_batch(blocks, results, missing[half:]))
+
+    async def _score_blocks(self, blocks: List[str]) -> List[Any]:
+        """Score a group of blocks, in one request per batch where possible."""
+        if self.score_batch is None:
+            return [await self._score_single(blocks[0])]
+
+        results: List[Any] = [None] * len(blocks)
+        todo = []
+        for i, block in enumerate(blocks):
+            cached = self.cache.get(self.cache_key(block)) if self.cache is not None else None
+            if cached is None:
+                todo.append(i)
+            else:
+                results[i] = cached
+        await self._fill_batch(blocks, results, todo)
+        return results
+
+    async def _maybe_finish(self, state: _ScriptState):
+        """Hand a script's results to the callback once all its blocks are in."""
+        if state.done or not state.closed or len(state.results) < state.submitted:
+            return
+        state.done = True
+        del self._states[state.script_id]
+        block_results = [state.results[i] for i in range(state.submitted)]
+        try:
+            outcome = self.on_script_done(state.script_id, state.context, block_results)
+            if inspect.isawaitable(outcome):
+                await outcome
+            self.stats.scripts_completed += 1
+        except Exception as e:
+            print(f"Error finishing {state.script_id}: {e}")
+
+    async def _notify_block_done(self, state: _ScriptState, block_index: int, block: str, result: Any):
+        try:
+            outcome = self.on_block_done(state.script_id, state.context, block_index, block, result)
+            if inspect.isawaitable(outcome):
+                await outcome
+        except Exception as e:
+            print(f"Error recording block {block_index} of {state.script_id}: {e}")
+
+    def _take_batch(self, queue: asyncio.Queue, first: Tuple) -> Tuple[List[Tuple], Optional[Tuple]]:
+        """
+        Pull queued jobs to go with the first one while they fit the batch budget.
+
+        Returns the batch and, if a job was taken that didn't fit, that job
+        (to start the worker's next batch).
+        """
+        jobs = [first]
+        texts = [first[2]]
+        while len(jobs) < self.max_batch_size and not queue.empty():
+            job = queue.get_nowait()
+            if job is None:
+                # Leave the shutdown marker for whoever reaches it next
+                queue.task_done()
+                queue.put_nowait(None)
+                break
+            if estimate_batch_tokens(texts + [job[2]]) > self.max_batch_tokens:
+                return jobs, job
+            jobs.append(job)
+            texts.append(job[2])
+        return jobs, None
+
+    async def _worker(self, queue: asyncio.Queue):
+        carry = None
+        while True:
+            job = carry if carry is not None else await queue.get()
+            carry = None
+            if job is None:
+                queue.task_done()
+                return
+
+            jobs = [job]
+            if self.max_batch_size > 1:
+                jobs, carry = self._take_batch(queue, job)
+
+            try:
+                results = await self._score_blocks([block for _, _, block in jobs])
+                for (state, block_index, block), result in zip(jobs, results):
+                    if state.done:
+                        continue
+                    if result is _FAILED:
+                        # No fallback configured: drop the script rather than write partial results
+                        state.done = True
+                        self._states.pop(state.script_id, None)
+                        continue
+                    if isinstance(result, _Fallback):
+                        result = result.value
+                    elif self.on_block_done is not None:
+                        await self._notify_block_done(state, block_index, block, result)
+                    state.results[block_index] = result
+                    await self._maybe_finish(state)
+            finally:
+                for _ in jobs:
+                    queue.task_done()
+
+    async def run(self, scripts: Iterable[Tuple[str, Any, Iterable[str]]]) -> SchedulerStats:
+        """
+        Score every block of every script.
+
+        Args:
+            scripts: Iterable of (script_id, context, blocks). Blocks are consumed
+                lazily, so both the script list and each block sequence may be
+                generators. The context object is passed back to on_script_done
+
+        Returns:
+            Counters for the run
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=2 * self.max_concurrency * self.max_batch_size)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.max_concurrency)]
+
+        try:
+            for script_id, context, blocks in scripts:
+                state = _ScriptState(script_id=script_id, context=context)
+                self._states[script_id] = state
+                try:
+                    for block in blocks:
+                        if state.done:
+                            break
+                        block_index = state.submitted
+                        state.submitted += 1
+                        previous = self.resume(script_id, context, block_index, block) if self.resume else None
+                        if previous is not None:
+                            state.results[block_index] = previous
+                            self.stats.resumed_blocks += 1
+                        else:
+                            await queue.put((state, block_index, block))
+                except Exception as e:
+                    # A script that can't be read is dropped; the rest of the corpus carries on
+                    print(f"Error processing {script_id}: {e}")
+                    state.done = True
+                    self._states.pop(script_id, None)
+                    continue
+                state.closed = True
+                # Covers scripts with no blocks and scripts whose blocks all finished already
+                await self._maybe_finish(state)
+
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+        return self.stats
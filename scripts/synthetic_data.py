@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Synthetic Taskmaster seasons in the raw data schemas.
+
+Generates any number of series and writes them in the layout of the files
+in data/raw, so every pipeline stage can be load-tested by pointing
+load_raw(..., raw_dir=...) at the output directory:
+
+    scores.csv                           five score rows per task
+    long_task_scores.csv                 the same scores in the long layout
+    taskmaster_UK_tasks.csv              task metadata and is_* flags
+    imdb_ratings.csv                     episode ratings, relative within series
+    taskmaster_histograms_corrected.csv  vote histograms
+    sentiment.csv                        transcript statistics and sentiment
+
+The generator follows the real data:
+
+- episodes per series and tasks per episode are drawn from their empirical
+  distributions
+- every task's score vector is a five-player scoring pattern drawn with its
+  empirical frequency (scripts/scoring_patterns.py), dealt to the
+  contestants in random order
+- task flags are whole flag rows of real tasks, which keeps the flags
+  consistent with each other (is_single/is_multiple, ...)
+- vote histograms follow the tri-peak model (scripts/rating_mixture.py) with
+  the parameters of a random real episode, slightly perturbed, and
+  multinomial votes
+- sentiment rows are real episode rows
+
+Series are generated one at a time and written in chunks, so memory doesn't
+grow with the number of series. Each series has its own random generator
+seeded from (seed, series), so the output only depends on the seed and the
+number of series, not on the chunk size.
+
+Usage:
+    python scripts/synthetic_data.py --series 18000 --output data/synthetic
+"""
+
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from pathlib import Path
+
+from data_loader import REPO_ROOT, list_columns, load_raw
+from rating_mixture import GAUSS_RATINGS, PCT_COLUMNS, RATINGS, fit_tri_peak, gaussian_profile
+from scoring_patterns import STANDARD_PLAYERS, load_task_scores, map_task_patterns, pattern_usage
+
+OUTPUT_DIR = REPO_ROOT / "data" / "synthetic"
+
+FILES = ["scores.csv", "long_task_scores.csv", "taskmaster_UK_tasks.csv", "imdb_ratings.csv",
+         "taskmaster_histograms_corrected.csv", "sentiment.csv"]
+
+FIRST_NAMES = ["Alice", "Barbara", "Callum", "Dev", "Ellie", "Farah", "George", "Hannah", "Idris", "Jess",
+               "Kieran", "Lou", "Mae", "Nish", "Olga", "Priya", "Quentin", "Rosa", "Sam", "Tom", "Una", "Vic"]
+LAST_NAMES = ["Reed", "Walsh", "Okafor", "Patel", "Hughes", "Lambert", "Moss", "Nolan", "Price", "Quinn",
+              "Rhodes", "Shah", "Turner", "Vance", "Webb", "Young"]
+TITLE_WORDS = ["melon", "buffet", "whisperer", "hippopotamus", "spoon", "moustache", "lasagne", "trampoline",
+               "tuba", "gravy", "badger", "lighthouse", "wobbly", "velvet", "secret", "catapult"]
+TASK_VERBS = ["Make", "Throw", "Paint", "Hide", "Build", "Eat", "Find", "Balance", "Smuggle", "Photograph"]
+
+# Tri-peak parameters of real episodes are perturbed by shifting mu by
+# N(0, MU_JITTER) rating points and scaling sigma by exp(N(0, SIGMA_JITTER))
+MU_JITTER = 0.1
+SIGMA_JITTER = 0.1
+
+@dataclass
+class SeasonModel:
+    """Empirical distributions the generator samples from."""
+    patterns: np.ndarray          # (patterns, 5) score vectors
+    pattern_probs: np.ndarray     # frequency of each pattern
+    episodes_per_series: np.ndarray
+    tasks_per_episode: np.ndarray
+    flag_columns: list
+    flags: np.ndarray             # (real tasks, flags) bool
+    tri_peak: np.ndarray          # (real episodes, 5): a1, a10, a_gauss, mu, sigma
+    total_votes: np.ndarray
+    rating_offset: np.ndarray     # unweighted mean minus IMDb rating of real episodes
+    sentiment: dict               # numeric sentiment column -> values of real episodes
+
+def fit_season_model():
+    """
+    Estimate the generator's distributions from the files in data/raw.
+
+    Returns:
+    --------
+    SeasonModel
+    """
+    keys, points = load_task_scores("scores.csv")
+    mapping = map_task_patterns(keys, points)[STANDARD_PLAYERS]
+    usage = pattern_usage(mapping["space"], mapping["pattern_id"])
+    used = np.flatnonzero(usage)
+
+    ratings = load_raw("imdb_ratings.csv", columns=["series", "episode", "imdb_rating"])
+
+    task_columns = list_columns("taskmaster_UK_tasks.csv")
+    flag_columns = [c for c in task_columns if c.startswith("is_")]
+    tasks = load_raw("taskmaster_UK_tasks.csv", columns=["series_name", "episode_num"] + flag_columns)
+    regular = tasks[tasks["series_name"].astype(str).str.match(r"^Series \d+$")]
+
+    hist = load_raw("taskmaster_histograms_corrected.csv",
+                    columns=["season", "episode", "total_votes", "unweighted_mean"] + PCT_COLUMNS)
+    fit = fit_tri_peak(hist[PCT_COLUMNS].to_numpy(dtype=float))
+    offsets = hist.merge(ratings, left_on=["season", "episode"], right_on=["series", "episode"])
+
+    sentiment_columns = [c for c in list_columns("sentiment.csv")
+                         if c not in ("series", "episode", "title", "episode_id")]
+    sentiment = load_raw("sentiment.csv", columns=sentiment_columns)
+
+    return SeasonModel(
+        patterns=mapping["space"].patterns[used],
+        pattern_probs=usage[used] / usage[used].sum(),
+        episodes_per_series=ratings.groupby("series").size().to_numpy(),
+        tasks_per_episode=regular.groupby(["series_name", "episode_num"], observed=True).size().to_numpy(),
+        flag_columns=flag_columns,
+        flags=regular[flag_columns].to_numpy(dtype=bool),
+        tri_peak=np.column_stack([fit[name] for name in ["a1", "a10", "a_gauss", "mu", "sigma"]]),
+        total_votes=hist["total_votes"].to_numpy(dtype=np.int64),
+        rating_offset=(offsets["unweighted_mean"] - offsets["imdb_rating"]).to_numpy(dtype=float),
+        sentiment={column: sentiment[column].to_numpy() for column in sentiment_columns}
+    )
+
+def _titles(rng, n):
+    """Random two-word titles in sentence case."""
+    return [f"{a.capitalize()} {b}" for a, b in rng.choice(TITLE_WORDS, size=(n, 2))]
+
+def vote_histograms(model, rng, n_episodes):
+    """
+    Tri-peak vote histograms of n_episodes episodes.
+
+    Returns:
+    --------
+    numpy.ndarray
+        int64 votes at ratings 1-10, shape (n_episodes, 10)
+    """
+    params = model.tri_peak[rng.integers(0, len(model.tri_peak), n_episodes)]
+    mu = params[:, 3] + MU_JITTER * rng.standard_normal(n_episodes)
+    sigma = params[:, 4] * np.exp(SIGMA_JITTER * rng.standard_normal(n_episodes))
+
+    probs = np.empty((n_episodes, len(RATINGS)))
+    probs[:, 0] = params[:, 0]
+    probs[:, -1] = params[:, 1]
+    probs[:, 1:-1] = params[:, 2:3] * gaussian_profile(GAUSS_RATINGS[None, :], mu[:, None], sigma[:, None])
+    probs = np.clip(probs, 0, None)
+    probs /= probs.sum(axis=1, keepdims=True)
+
+    totals = model.total_votes[rng.integers(0, len(model.total_votes), n_episodes)]
+    return rng.multinomial(totals, probs)
+
+def generate_series(model, series, seed, ids):
+    """
+    Generate the rows of one series for every output file.
+
+    Parameters:
+    -----------
+    model : SeasonModel
+        Fitted distributions
+    series : int
+        Series number
+    seed : int
+        Base seed; the series is generated from seed and series alone
+    ids : dict
+        Running "task", "episode" and "contestant" counters, advanced in place
+
+    Returns:
+    --------
+    dict
+        Maps each file name to a dict of column arrays
+    """
+    rng = np.random.default_rng([seed, series])
+    n_episodes = int(rng.choice(model.episodes_per_series))
+    tasks_per_episode = rng.choice(model.tasks_per_episode, n_episodes)
+    n_tasks = int(tasks_per_episode.sum())
+    players = STANDARD_PLAYERS
+
+    names = np.array([f"{first} {last}" for first, last in
+                      zip(rng.choice(FIRST_NAMES, players, replace=False), rng.choice(LAST_NAMES, players))])
+    contestant_ids = np.array([f"Contestant{ids['contestant'] + i}" for i in range(players)])
+    episode_titles = np.array(_titles(rng, n_episodes))
+
+    episode = np.repeat(np.arange(1, n_episodes + 1), tasks_per_episode)
+    task_in_episode = np.arange(n_tasks) - np.repeat(np.cumsum(tasks_per_episode) - tasks_per_episode,
+                                                     tasks_per_episode) + 1
+    task_id = ids["task"] + np.arange(n_tasks)
+    episode_id = ids["episode"] + episode - 1
+    task_titles = np.array([f"{verb} the most {word}" for verb, word in
+                            zip(rng.choice(TASK_VERBS, n_tasks), rng.choice(TITLE_WORDS, n_tasks))])
+
+    vectors = model.patterns[rng.choice(len(model.patterns), n_tasks, p=model.pattern_probs)]
+    scores = rng.permuted(vectors, axis=1)
+    winner = scores == scores.max(axis=1, keepdims=True)
+    flags = model.flags[rng.integers(0, len(model.flags), n_tasks)]
+
+    # Score rows: task-major, contestants in line-up order
+    flat_scores = scores.ravel()
+    flat_winner = winner.ravel()
+    details = np.where(flat_winner, np.char.add(np.char.add(" = ", flat_scores.astype(str)), " (Winner)"),
+                       np.where(flat_scores == 0, "0", np.char.add(flat_scores.astype(str), " points")))
+    row_episode = np.repeat(episode, players)
+    row_task_in_episode = np.repeat(task_in_episode, players)
+
+    votes = vote_histograms(model, rng, n_episodes)
+    total_votes = votes.sum(axis=1)
+    pct = np.round(100 * votes / total_votes[:, None], 1)
+    unweighted_mean = np.round((votes * RATINGS).sum(axis=1) / total_votes, 1)
+    imdb_rating = np.round(unweighted_mean - rng.choice(model.rating_offset, n_episodes), 1)
+    spread = imdb_rating.std(ddof=1) if n_episodes > 1 else 0.0
+    relative = (imdb_rating - imdb_rating.mean()) / spread if spread > 0 else np.zeros(n_episodes)
+
+    episodes = np.arange(1, n_episodes + 1)
+    episode_keys = np.array([f"{series}_{e}" for e in episodes])
+    histogram_columns = {}
+    for i in range(len(RATINGS) - 1, -1, -1):
+        histogram_columns[f"hist{RATINGS[i]}_pct"] = pct[:, i]
+        histogram_columns[f"hist{RATINGS[i]}_votes"] = votes[:, i]
+    sentiment_rows = rng.integers(0, len(next(iter(model.sentiment.values()))), n_episodes)
+
+    rows = {
+        "scores.csv": {
+            "task_id": np.repeat(task_id, players), "show_title": np.full(n_tasks * players, "Taskmaster UK"),
+            "series": np.full(n_tasks * players, series), "episode": row_episode,
+            "episode_title": episode_titles[row_episode - 1], "task_title": np.repeat(task_titles, players),
+            "contestant_name": np.tile(names, n_tasks), "score_details": details, "total_score": flat_scores,
+            "is_winner": flat_winner,
+            "task_episode_id": np.array([f"{series}_{e}_{t}" for e, t in zip(row_episode, row_task_in_episode)])
+        },
+        "long_task_scores.csv": {
+            "SeriesID": np.full(n_tasks * players, series), "EpisodeID": row_episode,
+            "TaskID": row_task_in_episode, "ContestantID": np.tile(contestant_ids, n_tasks),
+            "ContestantName": np.tile(names, n_tasks), "Score": flat_scores
+        },
+        "taskmaster_UK_tasks.csv": {
+            "task_id": task_id, "task_title": task_titles,
+            "task_url": np.array([f"https://taskmaster.info/task.php?id={t}" for t in task_id]),
+            "episode_id": episode_id, "episode_num": np.array([f"Episode {e}" for e in episode]),
+            "episode_title": episode_titles[episode - 1], "series_name": np.full(n_tasks, f"Series {series}"),
+            "episode_url": np.array([f"https://taskmaster.info/episode.php?id={e}" for e in episode_id]),
+            **{column: flags[:, j] for j, column in enumerate(model.flag_columns)}
+        },
+        "imdb_ratings.csv": {
+            "series": np.full(n_episodes, series), "episode": episodes, "series_code": np.full(n_episodes, f"S{series}"),
+            "episode_code": np.array([f"E{e}" for e in episodes]),
+            "episode_title": np.array([title.title() for title in episode_titles]), "imdb_rating": imdb_rating,
+            "episode_id": episode_keys, "imdb_rating_relative": relative
+        },
+        "taskmaster_histograms_corrected.csv": {
+            "season": np.full(n_episodes, series), "episode": episodes, "title": episode_titles,
+            "imdb_id": np.array([f"tt{90000000 + ids['episode'] + e - 1}" for e in episodes]),
+            "total_votes": total_votes, "unweighted_mean": unweighted_mean, **histogram_columns
+        },
+        "sentiment.csv": {
+            "series": np.full(n_episodes, series), "episode": episodes,
+            "title": np.array([title.title() for title in episode_titles]),
+            **{column: values[sentiment_rows] for column, values in model.sentiment.items()},
+            "episode_id": episode_keys
+        }
+    }
+
+    ids["task"] += n_tasks
+    ids["episode"] += n_episodes
+    ids["contestant"] += players
+    return rows
+
+def write_synthetic(n_series, output_dir=OUTPUT_DIR, seed=0, chunk_series=100, model=None):
+    """
+    Generate n_series series and write them to output_dir in chunks.
+
+    Parameters:
+    -----------
+    n_series : int
+        Number of series to generate
+    output_dir : Path, optional
+        Directory receiving one file per raw dataset (existing files are
+        replaced)
+    seed : int, optional
+        Random seed
+    chunk_series : int, optional
+        Series held in memory before they are appended to the files
+    model : SeasonModel, optional
+        Distributions to sample from, fitted from data/raw by default
+
+    Returns:
+    --------
+    dict
+        Number of rows written to each file
+    """
+    model = fit_season_model() if model is None else model
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # Column order of the real files
+    schemas = {name: list_columns(name) for name in FILES}
+
+    ids = {"task": 1, "episode": 1, "contestant": 1}
+    counts = dict.fromkeys(FILES, 0)
+    for name in FILES:
+        (output_dir / name).unlink(missing_ok=True)
+
+    for start in range(1, n_series + 1, chunk_series):
+        chunk = [generate_series(model, series, seed, ids)
+                 for series in range(start, min(start + chunk_series, n_series + 1))]
+        for name in FILES:
+            # One frame per file and chunk; per-series frames cost more than the rows
+            frame = pd.DataFrame({column: np.concatenate([rows[name][column] for rows in chunk])
+                                  for column in schemas[name]})
+            path = output_dir / name
+            frame.to_csv(path, mode="a", header=not counts[name], index=False)
+            counts[name] += len(frame)
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic Taskmaster seasons in the raw data schemas")
+    parser.add_argument("--series", type=int, default=18, help="Number of series to generate")
+    parser.add_argument("--output", default=str(OUTPUT_DIR), help="Output directory")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--chunk-series", type=int, default=100, help="Series generated per write")
+    args = parser.parse_args()
+
+    start = time.time()
+    counts = write_synthetic(args.series, args.output, seed=args.seed, chunk_series=args.chunk_series)
+    print(f"🧪 {args.series} synthetic series in {time.time() - start:.1f}s -> {args.output}")
+    for name, count in counts.items():
+        print(f"   {name}: {count} rows")
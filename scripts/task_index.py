@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Persisted sparse TF-IDF index of the task texts and nearest-neighbour search.
+
+Every task's task_title, task_description, materials, constraints and
+skills_required are tokenized once into word unigram and bigram counts. The
+counts, the vocabulary (term -> column) and the document frequencies are
+stored in data/cache/task_index.npz, so similarity analyses never
+re-tokenize the texts:
+
+    index = load_task_index()
+    index.most_similar(123, k=10)        # tasks most like task_id 123
+    index.query("eat a watermelon", k=5)
+    neighbours, scores = index.all_pairs_top_k(k=10)
+
+Weights are sublinear TF times smoothed IDF, with L2-normalized rows, so
+the cosine similarity of two tasks is the dot product of their rows. The
+weights are derived from the stored counts on load, which is a pass over
+the non-zeros only.
+
+Adding tasks tokenizes just the new texts: unseen terms are appended to the
+vocabulary and the document frequencies are updated, so the IDF of every
+task reflects the grown corpus without a rebuild. load_task_index does this
+automatically when the sources gained tasks; a change to an existing task's
+text rebuilds the index.
+
+Task texts come from data/raw/_OL_tasks.csv and
+data/processed/scores_by_series/tasks_standardized_final.csv, whose text
+replaces that of the same task_id.
+
+Usage:
+    python scripts/task_index.py --task 123 -k 10
+    python scripts/task_index.py --query "eat as much watermelon as possible"
+    python scripts/task_index.py --all-pairs 10 --output data/processed/task_neighbours.csv
+"""
+
+import re
+import time
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from collections import Counter
+from pathlib import Path
+
+from data_loader import CACHE_DIR, RAW_DIR, REPO_ROOT, get_meta, list_columns, load_raw
+
+INDEX_NAME = "task_index.npz"
+
+# Bump when the tokenizer or the stored arrays change so old indexes are rebuilt
+INDEX_VERSION = 1
+
+# (file, directory) pairs; later sources override the text of earlier ones
+SOURCES = [
+    ("_OL_tasks.csv", RAW_DIR),
+    ("tasks_standardized_final.csv", REPO_ROOT / "data" / "processed" / "scores_by_series")
+]
+
+TEXT_COLUMNS = ["task_title", "task_description", "materials", "constraints", "skills_required"]
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Dropped before n-grams are formed, so bigrams span the content words
+STOP_WORDS = frozenset("""
+a an and are as at be been but by can could did do does for from had has have he her his how i if in into is
+it its of on or she so than that the their them then there they this to was were what when where which who
+will with would you your
+""".split())
+
+NGRAMS = (1, 2)
+
+def tokenize(text):
+    """Word unigrams and bigrams of a text, lowercased and without stop words."""
+    words = [w for w in TOKEN_RE.findall(str(text).lower()) if w not in STOP_WORDS]
+    terms = []
+    for n in NGRAMS:
+        terms.extend(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+    return terms
+
+def _text_hash(texts):
+    """SHA-256 of every text, as fixed-width bytes."""
+    return np.array([hashlib.sha256(str(t).encode()).digest() for t in texts], dtype="S32")
+
+def load_task_texts(sources=SOURCES, cache_dir=CACHE_DIR):
+    """
+    Combined text of every task, keyed by task_id.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        task_id, title and text columns, one row per task in task_id order
+    """
+    frames = []
+    for name, source_dir in sources:
+        if not (Path(source_dir) / name).exists():
+            continue
+        available = list_columns(name, source_dir, cache_dir)
+        columns = ["task_id"] + [c for c in TEXT_COLUMNS if c in available]
+        tasks = load_raw(name, columns=columns, raw_dir=source_dir, cache_dir=cache_dir)
+        text = tasks[columns[1:]].astype(str).replace("nan", "").agg(" ".join, axis=1)
+        title = tasks["task_title"].astype(str) if "task_title" in tasks else text.str[:60]
+        frames.append(pd.DataFrame({"task_id": tasks["task_id"].astype(np.int64), "title": title, "text": text}))
+    if not frames:
+        raise FileNotFoundError("No task text source found")
+    combined = pd.concat(frames, ignore_index=True).drop_duplicates("task_id", keep="last")
+    return combined.sort_values("task_id", kind="mergesort").reset_index(drop=True)
+
+def _source_hashes(sources=SOURCES, cache_dir=CACHE_DIR):
+    """SHA-256 of every present source file, from the columnar cache metadata."""
+    return np.array([f"{name}:{get_meta(name, source_dir, cache_dir)['sha256']}" for name, source_dir in sources
+                     if (Path(source_dir) / name).exists()])
+
+class TaskTextIndex:
+    """
+    Term counts of a set of tasks with TF-IDF cosine similarity queries.
+
+    Parameters:
+    -----------
+    task_ids : array-like of int
+        One ID per row of counts
+    titles : array-like of str
+        Task titles, for display
+    counts : scipy.sparse matrix
+        Raw term counts, tasks x vocabulary
+    vocabulary : list of str
+        Term of every column of counts
+    text_hash : numpy.ndarray, optional
+        SHA-256 of every task's text, used to detect edited tasks
+    """
+
+    def __init__(self, task_ids, titles, counts, vocabulary, text_hash=None):
+        self.task_ids = np.asarray(task_ids, dtype=np.int64)
+        self.titles = np.asarray(titles, dtype=str)
+        self.counts = sp.csr_matrix(counts, dtype=np.float32)
+        self.vocabulary = list(vocabulary)
+        self.columns = {term: column for column, term in enumerate(self.vocabulary)}
+        self.text_hash = text_hash if text_hash is not None else np.zeros(len(self.task_ids), dtype="S32")
+        self._weights = None
+        self._rows = None
+
+    @classmethod
+    def from_texts(cls, task_ids, titles, texts):
+        """Tokenize and index a set of tasks."""
+        index = cls(np.zeros(0, dtype=np.int64), [], sp.csr_matrix((0, 0)), [])
+        index.add(task_ids, titles, texts)
+        return index
+
+    def __len__(self):
+        return len(self.task_ids)
+
+    def add(self, task_ids, titles, texts):
+        """
+        Add tasks without touching the counts of the indexed ones.
+
+        Raises ValueError if a task_id is already indexed.
+        """
+        task_ids = np.asarray(task_ids, dtype=np.int64)
+        duplicates = np.intersect1d(task_ids, self.task_ids)
+        if len(duplicates) or len(np.unique(task_ids)) < len(task_ids):
+            raise ValueError(f"Tasks already indexed: {duplicates.tolist() or 'duplicate IDs in batch'}")
+
+        rows, columns, values = [], [], []
+        for row, text in enumerate(texts):
+            for term, count in Counter(tokenize(text)).items():
+                column = self.columns.get(term)
+                if column is None:
+                    column = self.columns[term] = len(self.vocabulary)
+                    self.vocabulary.append(term)
+                rows.append(row)
+                columns.append(column)
+                values.append(count)
+        new_counts = sp.csr_matrix((np.asarray(values, dtype=np.float32), (rows, columns)),
+                                   shape=(len(task_ids), len(self.vocabulary)))
+
+        # Existing rows just gain empty columns for the new terms
+        old_counts = self.counts
+        old_counts.resize((old_counts.shape[0], len(self.vocabulary)))
+        self.counts = sp.vstack([old_counts, new_counts], format="csr")
+        self.task_ids = np.concatenate([self.task_ids, task_ids])
+        self.titles = np.concatenate([self.titles, np.asarray(titles, dtype=str)])
+        self.text_hash = np.concatenate([self.text_hash, _text_hash(texts)])
+        self._weights = None
+        self._rows = None
+
+    @property
+    def document_frequency(self):
+        """Number of tasks containing each term."""
+        return np.bincount(self.counts.indices, minlength=len(self.vocabulary))
+
+    def idf(self):
+        """Smoothed inverse document frequency of every term."""
+        return np.log((1 + len(self)) / (1 + self.document_frequency)).astype(np.float32) + 1
+
+    def _weigh(self, counts):
+        """Sublinear TF-IDF rows of a count matrix, L2-normalized."""
+        weights = counts.copy()
+        weights.data = 1 + np.log(weights.data)
+        weights = weights.multiply(self.idf()[:weights.shape[1]]).tocsr()
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1))).ravel()
+        return sp.diags(1 / np.where(norms > 0, norms, 1)).dot(weights).tocsr().astype(np.float32)
+
+    @property
+    def weights(self):
+        """TF-IDF matrix of the indexed tasks (computed on first use)."""
+        if self._weights is None:
+            self._weights = self._weigh(self.counts)
+        return self._weights
+
+    def row_of(self, task_id):
+        """Row of a task_id; raises KeyError if it isn't indexed."""
+        if self._rows is None:
+            self._rows = {task_id: row for row, task_id in enumerate(self.task_ids.tolist())}
+        return self._rows[int(task_id)]
+
+    def _top_k(self, scores, k, exclude=None):
+        """Rows and scores of the k largest scores, best first."""
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        k = min(k, len(scores) - (exclude is not None))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return top, scores[top]
+
+    def _results(self, rows, scores):
+        return pd.DataFrame({"task_id": self.task_ids[rows], "title": self.titles[rows], "similarity": scores})
+
+    def most_similar(self, task_id, k=10):
+        """
+        The k tasks most similar to an indexed task.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            task_id, title and cosine similarity, most similar first
+        """
+        row = self.row_of(task_id)
+        scores = (self.weights @ self.weights[row].T).toarray().ravel()
+        return self._results(*self._top_k(scores, k, exclude=row))
+
+    def query(self, text, k=10):
+        """The k tasks most similar to a free text, as in most_similar."""
+        counts = Counter(term for term in tokenize(text) if term in self.columns)
+        vector = sp.csr_matrix((np.fromiter(counts.values(), dtype=np.float32, count=len(counts)),
+                                ([0] * len(counts), [self.columns[term] for term in counts])),
+                               shape=(1, len(self.vocabulary)))
+        scores = (self.weights @ self._weigh(vector).T).toarray().ravel()
+        return self._results(*self._top_k(scores, k))
+
+    def iter_similarity_blocks(self, block_size=1024):
+        """
+        Yield (start, block) with the dense cosine similarities of rows
+        start..start + block_size against every task.
+
+        Memory is bounded by block_size x number of tasks.
+        """
+        weights_t = self.weights.T.tocsc()
+        for start in range(0, len(self), block_size):
+            yield start, (self.weights[start:start + block_size] @ weights_t).toarray()
+
+    def all_pairs_top_k(self, k=10, block_size=1024):
+        """
+        The k nearest neighbours of every task, computed block by block.
+
+        Returns:
+        --------
+        tuple
+            (neighbours, scores): int task_ids and float32 similarities of
+            shape (tasks, k), most similar first
+        """
+        k = min(k, len(self) - 1)
+        neighbours = np.empty((len(self), k), dtype=np.int64)
+        scores = np.empty((len(self), k), dtype=np.float32)
+        for start, block in self.iter_similarity_blocks(block_size):
+            rows = np.arange(len(block))
+            block[rows, start + rows] = -np.inf
+            top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(block, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            neighbours[start:start + len(block)] = self.task_ids[np.take_along_axis(top, order, axis=1)]
+            scores[start:start + len(block)] = np.take_along_axis(top_scores, order, axis=1)
+        return neighbours, scores
+
+    def save(self, path, source_sha256=()):
+        """Write the index atomically to an .npz file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, version=np.array(INDEX_VERSION), source_sha256=np.asarray(source_sha256, dtype=str),
+                 task_id=self.task_ids, title=self.titles, text_hash=self.text_hash,
+                 vocabulary=np.asarray(self.vocabulary, dtype=str), data=self.counts.data,
+                 indices=self.counts.indices, indptr=self.counts.indptr, shape=np.array(self.counts.shape))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by save; returns (index, stored arrays)."""
+        with np.load(path) as stored:
+            stored = {name: stored[name] for name in stored.files}
+        counts = sp.csr_matrix((stored["data"], stored["indices"], stored["indptr"]), shape=tuple(stored["shape"]))
+        index = cls(stored["task_id"], stored["title"], counts, stored["vocabulary"].tolist(), stored["text_hash"])
+        return index, stored
+
+def load_task_index(sources=SOURCES, cache_dir=CACHE_DIR, rebuild=False):
+    """
+    Load the persisted task index, updating it if the sources changed.
+
+    Tasks that are new in the sources are added incrementally; if an indexed
+    task's text changed or it disappeared, the index is rebuilt.
+
+    Parameters:
+    -----------
+    sources : list of (str, Path), optional
+        Task tables to index, later ones overriding earlier ones
+    cache_dir : Path, optional
+        Directory where the index is stored
+    rebuild : bool, optional
+        Force a rebuild even if the stored index is fresh
+
+    Returns:
+    --------
+    TaskTextIndex
+    """
+    index_path = Path(cache_dir) / INDEX_NAME
+    source_sha256 = _source_hashes(sources, cache_dir)
+
+    index = None
+    if index_path.exists() and not rebuild:
+        index, stored = TaskTextIndex.load(index_path)
+        if int(stored["version"]) != INDEX_VERSION:
+            index = None
+        elif np.array_equal(stored["source_sha256"], source_sha256):
+            return index
+
+    tasks = load_task_texts(sources, cache_dir)
+    if index is not None:
+        current = dict(zip(tasks["task_id"].tolist(), _text_hash(tasks["text"])))
+        unchanged = all(current.get(task_id) == digest
+                        for task_id, digest in zip(index.task_ids.tolist(), index.text_hash))
+        if unchanged:
+            new = tasks[~tasks["task_id"].isin(index.task_ids)]
+            index.add(new["task_id"], new["title"], new["text"])
+        else:
+            index = None
+    if index is None:
+        index = TaskTextIndex.from_texts(tasks["task_id"], tasks["title"], tasks["text"])
+
+    index.save(index_path, source_sha256)
+    return index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TF-IDF nearest-neighbour search over task texts")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--task", type=int, help="Show the tasks most similar to this task_id")
+    target.add_argument("--query", help="Show the tasks most similar to this text")
+    target.add_argument("--all-pairs", type=int, metavar="K", help="Find the K nearest neighbours of every task")
+    parser.add_argument("-k", type=int, default=10, help="Number of neighbours to show")
+    parser.add_argument("--block-size", type=int, default=1024, help="Rows per block of the all-pairs search")
+    parser.add_argument("--output", help="CSV receiving the all-pairs neighbours")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild even if the index is fresh")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_task_index(rebuild=args.rebuild)
+    weights = index.weights
+    print(f"📚 {len(index)} tasks, {len(index.vocabulary)} terms, {weights.nnz} non-zeros "
+          f"({1000 * (time.perf_counter() - start):.0f} ms)")
+
+    if args.task is not None or args.query:
+        start = time.perf_counter()
+        if args.task is not None:
+            print(f"\nMost like {args.task}: {index.titles[index.row_of(args.task)]}")
+            results = index.most_similar(args.task, args.k)
+        else:
+            results = index.query(args.query, args.k)
+        elapsed = 1000 * (time.perf_counter() - start)
+        print(results.round(3).to_string(index=False))
+        print(f"⏱️  {elapsed:.2f} ms")
+
+    if args.all_pairs:
+        start = time.perf_counter()
+        neighbours, scores = index.all_pairs_top_k(args.all_pairs, args.block_size)
+        print(f"⏱️  {args.all_pairs} neighbours of {len(index)} tasks in {time.perf_counter() - start:.2f}s, "
+              f"mean top-1 similarity {scores[:, 0].mean():.3f}")
+        if args.output:
+            table = pd.DataFrame({"task_id": np.repeat(index.task_ids, neighbours.shape[1]),
+                                  "rank": np.tile(np.arange(1, neighbours.shape[1] + 1), len(index)),
+                                  "neighbour_id": neighbours.ravel(), "similarity": scores.ravel()})
+            table.to_csv(args.output, index=False)
+            print(f"Saved {args.output}")
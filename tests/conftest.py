@@ -0,0 +1,11 @@
+"""Make the scripts/ and config/ modules importable as they are when run as scripts."""
+
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+for directory in ("scripts", "config"):
+    path = str(REPO_ROOT / directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
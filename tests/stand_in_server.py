@@ -0,0 +1,121 @@
+"""
+Local OpenAI-compatible chat-completions endpoint for tests.
+
+Answers over HTTP/1.1 keep-alive connections and counts the connections and
+requests it served, so tests can check that a client reuses connections.
+"""
+
+import json
+import asyncio
+from typing import Any, Callable, Dict, Optional
+
+class StandInServer:
+    """
+    Local OpenAI-compatible chat-completions endpoint for offline runs.
+
+    Answers POST .../chat/completions with a completion whose content comes
+    from the reply function, over HTTP/1.1 keep-alive connections.
+    setup_delay is slept before the first response on every new connection,
+    to stand in for the TCP and TLS setup of a remote API; latency is slept
+    before every response.
+    """
+
+    def __init__(self, reply: Optional[Callable[[Dict[str, Any]], str]] = None, latency: float = 0.0,
+                 setup_delay: float = 0.0, max_requests_per_connection: Optional[int] = None):
+        """
+        Args:
+            reply: Function of the request payload returning the reply text
+                (default: an empty JSON object)
+            latency: Seconds slept before every response
+            setup_delay: Extra seconds slept before the first response on a
+                connection
+            max_requests_per_connection: Serve at most this many responses
+                per connection. The connection stays open, but the next
+                request on it is dropped by closing the connection without
+                a response, as when a server closes an idle keep-alive
+                connection just as the client reuses it
+        """
+        self.reply = reply or (lambda payload: "{}")
+        self.latency = latency
+        self.setup_delay = setup_delay
+        self.max_requests_per_connection = max_requests_per_connection
+        self.connections = 0
+        self.requests = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.base_url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start listening and return the base URL."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        self.base_url = f"http://{host}:{port}/v1"
+        return self.base_url
+
+    async def close(self):
+        """Stop listening."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self) -> "StandInServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        served = 0
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                if self.max_requests_per_connection is not None and served >= self.max_requests_per_connection:
+                    break
+
+                delay = self.latency + (self.setup_delay if served == 0 else 0.0)
+                if delay:
+                    await asyncio.sleep(delay)
+                served += 1
+                self.requests += 1
+
+                method, path = request_line.decode("latin-1").split(" ", 2)[:2]
+                if method == "POST" and path.endswith("/chat/completions"):
+                    payload = json.loads(body or b"{}")
+                    status = "200 OK"
+                    content = self.reply(payload)
+                    prompt_tokens = sum(len(m.get("content", "")) for m in payload.get("messages", [])) // 4
+                    completion_tokens = len(content) // 4
+                    response = json.dumps({
+                        "object": "chat.completion",
+                        "model": payload.get("model"),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": content}}],
+                        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                                  "total_tokens": prompt_tokens + completion_tokens}
+                    }).encode("utf-8")
+                else:
+                    status, response = "404 Not Found", b'{"error": "not found"}'
+
+                close = headers.get("connection", "").lower() == "close"
+                writer.write((f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                              f"Content-Length: {len(response)}\r\n"
+                              f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n").encode("latin-1")
+                             + response)
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,28 @@
+"""Tests for the instrumentation recorder: bounded RSS track and exit handler."""
+
+import time
+
+import instrumentation
+
+def test_rss_track_is_thinned_to_a_bounded_size(monkeypatch):
+    monkeypatch.setattr(instrumentation, "MAX_RSS_SAMPLES", 8)
+    recorder = instrumentation.Recorder(sample_interval=0.001)
+    time.sleep(0.2)
+    recorder.stop()
+
+    assert recorder._rss_stride > 1
+    assert 0 < len(recorder.rss_events) < 8
+    timestamps = [event["ts"] for event in recorder.rss_events]
+    assert timestamps == sorted(timestamps)
+
+def test_enable_registers_one_exit_handler_per_process(tmp_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(instrumentation.atexit, "register", lambda *args: registered.append(args))
+    monkeypatch.setattr(instrumentation, "_atexit_pid", None)
+    try:
+        for _ in range(3):
+            instrumentation.enable(tmp_path, sample_interval=0)
+    finally:
+        instrumentation.disable()
+
+    assert len(registered) == 1
@@ -0,0 +1,105 @@
+"""Tests that a sentiment run sends every request through one long-lived client."""
+
+import asyncio
+import json
+
+import pytest
+
+import instrumentation
+import sentiment_analysis
+from sentiment_analysis import SENTIMENT_CATEGORIES, analyze_script, process_all_scripts, request_scores
+from stand_in_server import StandInServer
+
+SCORES = {category: 1.0 for category in SENTIMENT_CATEGORIES}
+
+class StubLLM:
+    """Stands in for AsyncLLMAPI and counts the requests it answers."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, **kwargs):
+        self.calls += 1
+        return json.dumps(SCORES)
+
+def write_scripts(directory, count):
+    directory.mkdir()
+    for i in range(count):
+        (directory / f"episode_{i}.txt").write_text("Greg: Hello.\nAlex: Your task begins now.\n" * 60,
+                                                    encoding="utf-8")
+
+@pytest.fixture
+def shared_stub(monkeypatch):
+    """Register a stub as the process-wide client for the key "test"."""
+    stub = StubLLM()
+    monkeypatch.setattr(sentiment_analysis, "_llm_clients", {"test": stub})
+    return stub
+
+def test_process_all_scripts_uses_one_client_for_every_script(tmp_path):
+    write_scripts(tmp_path / "scripts", 3)
+    stub = StubLLM()
+
+    asyncio.run(process_all_scripts(str(tmp_path / "scripts"), str(tmp_path / "analysis"), "test",
+                                    requests_per_minute=None, tokens_per_minute=None, cache_path="",
+                                    llm_api=stub))
+
+    outputs = sorted((tmp_path / "analysis").glob("*_analysis.json"))
+    assert len(outputs) == 3
+    blocks = sum(len(list(sentiment_analysis.stream_script(str(path), sentiment_analysis.TextStats())))
+                 for path in (tmp_path / "scripts").glob("*.txt"))
+    assert stub.calls == blocks
+
+def test_runs_without_a_client_reuse_the_process_wide_one(tmp_path, shared_stub):
+    write_scripts(tmp_path / "scripts", 2)
+
+    for run in range(2):
+        asyncio.run(process_all_scripts(str(tmp_path / "scripts"), str(tmp_path / f"analysis_{run}"), "test",
+                                        requests_per_minute=None, tokens_per_minute=None, cache_path=""))
+    results = asyncio.run(analyze_script(str(tmp_path / "scripts" / "episode_0.txt"), api_key="test"))
+
+    assert shared_stub.calls > 0
+    assert sentiment_analysis.shared_llm_api("test") is shared_stub
+    assert results["sentiment_analysis"]["sentiment_averages"] == SCORES
+
+def test_one_openai_client_keeps_its_connection_alive():
+    openai = pytest.importorskip("openai")
+
+    async def scenario():
+        async with StandInServer(reply=lambda payload: "ok") as server:
+            client = openai.AsyncOpenAI(api_key="test", base_url=server.base_url)
+            for _ in range(10):
+                await client.chat.completions.create(model="model", messages=[{"role": "user", "content": "hi"}])
+            await client.close()
+            return server.connections, server.requests
+
+    connections, requests = asyncio.run(scenario())
+    assert requests == 10
+    assert connections == 1
+
+class CompletionLLM:
+    """Stands in for a client whose generate() returns the whole chat completion."""
+
+    async def generate(self, **kwargs):
+        return {"choices": [{"message": {"content": json.dumps(SCORES)}}],
+                "usage": {"prompt_tokens": 321, "completion_tokens": 17, "total_tokens": 338}}
+
+@pytest.fixture
+def recording():
+    instrumentation.enable(sample_interval=0)
+    yield
+    instrumentation.disable()
+
+def test_reported_token_usage_is_recorded(recording):
+    reply = asyncio.run(request_scores(CompletionLLM(), "prompt"))
+
+    counters = instrumentation.summary()["counters"]
+    assert json.loads(reply) == SCORES
+    assert counters["llm.prompt_tokens"] == 321
+    assert counters["llm.completion_tokens"] == 17
+
+def test_token_counts_are_estimated_when_usage_is_missing(recording):
+    reply = asyncio.run(request_scores(StubLLM(), "x" * 400))
+
+    counters = instrumentation.summary()["counters"]
+    assert counters["llm.prompt_tokens"] >= 100
+    assert counters["llm.completion_tokens"] == len(reply) // sentiment_analysis.CHARS_PER_TOKEN
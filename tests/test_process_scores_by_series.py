@@ -0,0 +1,28 @@
+"""Regression tests: the score matrices match the committed files byte for byte."""
+
+import filecmp
+
+import pandas as pd
+
+import process_scores_by_series
+
+def test_score_matrices_are_byte_identical_to_the_committed_files(tmp_path):
+    process_scores_by_series.main(output_dir=tmp_path)
+
+    for series in range(1, 19):
+        name = f"series_{series}_scores.csv"
+        assert filecmp.cmp(tmp_path / name, process_scores_by_series.OUTPUT_DIR / name, shallow=False), name
+
+def test_every_series_in_the_data_gets_a_matrix(tmp_path, monkeypatch):
+    rows = [(series, series * 10 + task, f"Contestant {series}{player}", task + player)
+            for series in (1, 19, 20) for task in range(2) for player in range(5)]
+    scores = pd.DataFrame(rows, columns=["series", "task_id", "contestant_name", "total_score"])
+    monkeypatch.setattr(process_scores_by_series, "load_raw", lambda name, columns: scores[columns])
+
+    process_scores_by_series.main(output_dir=tmp_path)
+
+    assert sorted(path.name for path in tmp_path.glob("series_*_scores.csv")) == [
+        "series_19_scores.csv", "series_1_scores.csv", "series_20_scores.csv"]
+    last = pd.read_csv(tmp_path / "series_20_scores.csv")
+    assert last["ContestantID"].tolist() == list(range(11, 16))
+    assert "from 1 to 15" in (tmp_path / "README.md").read_text()
@@ -0,0 +1,82 @@
+"""Tests for the block checkpoint journal: replay, crash recovery and compaction."""
+
+import json
+
+import pytest
+
+import sentiment_journal
+from sentiment_journal import BlockJournal
+
+def _write_journal(path, blocks):
+    journal = BlockJournal(path)
+    for block_index, block_hash, scores in blocks:
+        journal.append(block_index, block_hash, scores)
+    journal.close()
+
+def test_replay_only_reuses_blocks_whose_hash_still_matches(tmp_path):
+    path = tmp_path / "script_analysis.journal.jsonl"
+    _write_journal(path, [(0, "h0", {"humor": 1}), (1, "h1", {"humor": 2}), (1, "h1b", {"humor": 3})])
+
+    journal = BlockJournal(path)
+    assert journal.replay() == 2
+    assert journal.lookup(0, "h0") == {"humor": 1}
+    # The script changed under block 0, and block 1 was rescored later
+    assert journal.lookup(0, "changed") is None
+    assert journal.lookup(1, "h1") is None
+    assert journal.lookup(1, "h1b") == {"humor": 3}
+    assert journal.lookup(2, "h2") is None
+
+def test_append_after_a_crash_drops_the_truncated_last_line(tmp_path):
+    path = tmp_path / "script_analysis.journal.jsonl"
+    _write_journal(path, [(0, "h0", {"humor": 1}), (1, "h1", {"humor": 2})])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"block": 2, "hash": "h2", "sco')
+
+    journal = BlockJournal(path)
+    assert journal.replay() == 2
+    journal.append(2, "h2", {"humor": 5})
+    journal.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["block"] for line in lines] == [0, 1, 2]
+    assert BlockJournal(path).replay() == 3
+
+@pytest.mark.parametrize("content, kept", [
+    (b'{"block": 0}\n' + b"x" * 50, b'{"block": 0}\n'),
+    (b"x" * 50, b""),
+    (b'{"block": 0}\n{"block": 1}\n', b'{"block": 0}\n{"block": 1}\n'),
+])
+def test_drop_partial_line_scans_back_across_chunks(tmp_path, content, kept):
+    path = tmp_path / "journal.jsonl"
+    path.write_bytes(content)
+    BlockJournal(path)._drop_partial_line(chunk_size=8)
+    assert path.read_bytes() == kept
+
+def test_compact_writes_the_output_then_removes_the_journal(tmp_path):
+    path = tmp_path / "script_analysis.journal.jsonl"
+    output = tmp_path / "script_analysis.json"
+    journal = BlockJournal(path)
+    journal.append(0, "h0", {"humor": 1})
+
+    journal.compact(output, {"basic_stats": {"num_words": 3}})
+
+    assert json.loads(output.read_text(encoding="utf-8")) == {"basic_stats": {"num_words": 3}}
+    assert not path.exists()
+    assert list(tmp_path.iterdir()) == [output]
+
+def test_compact_keeps_the_journal_if_the_output_is_not_replaced(tmp_path, monkeypatch):
+    path = tmp_path / "script_analysis.journal.jsonl"
+    output = tmp_path / "script_analysis.json"
+    journal = BlockJournal(path)
+    journal.append(0, "h0", {"humor": 1})
+
+    def failing_replace(source, destination):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(sentiment_journal.os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        journal.compact(output, {"basic_stats": {}})
+    journal.close()
+
+    assert not output.exists()
+    assert BlockJournal(path).replay() == 1
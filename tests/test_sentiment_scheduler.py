@@ -0,0 +1,202 @@
+"""Tests for the shared block scheduler: rate limiting, retries, ordering and batching."""
+
+import asyncio
+import json
+import random
+import time
+
+from sentiment_analysis import (SENTIMENT_CATEGORIES, analyze_text_batch, build_batch_sentiment_prompt,
+                                parse_batch_response)
+from sentiment_scheduler import BlockScheduler, RateLimiter, backoff_delay
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_token_budget_delays_requests_until_refilled():
+    async def scenario():
+        limiter = RateLimiter(tokens_per_minute=6000)  # 100 tokens per second
+        start = time.monotonic()
+        await limiter.acquire(6000)  # the bucket starts full
+        first = time.monotonic() - start
+        await limiter.acquire(20)  # needs 0.2 s of refill
+        return first, time.monotonic() - start
+
+    first, total = run(scenario())
+    assert first < 0.05
+    assert 0.15 <= total < 1.0
+
+def test_request_larger_than_the_bucket_waits_for_a_full_bucket_only():
+    async def scenario():
+        limiter = RateLimiter(tokens_per_minute=6000)
+        start = time.monotonic()
+        await limiter.acquire(20000)
+        return time.monotonic() - start
+
+    assert run(scenario()) < 0.05
+
+def test_backoff_delay_is_bounded_by_the_capped_exponential():
+    random.seed(0)
+    for attempt in range(10):
+        for _ in range(50):
+            delay = backoff_delay(attempt, base_delay=0.5, max_delay=4.0)
+            assert 0 <= delay <= min(4.0, 0.5 * 2 ** attempt)
+
+def _run_scheduler(scripts, score_block, **kwargs):
+    finished = {}
+
+    def on_script_done(script_id, context, block_results):
+        finished[script_id] = block_results
+
+    scheduler = BlockScheduler(score_block=score_block, on_script_done=on_script_done, **kwargs)
+    stats = run(scheduler.run(scripts))
+    return finished, stats
+
+def test_failed_requests_are_retried_with_backoff():
+    attempts = {}
+
+    async def flaky(block):
+        attempts[block] = attempts.get(block, 0) + 1
+        if attempts[block] <= 2:
+            raise RuntimeError("temporary failure")
+        return block.upper()
+
+    finished, stats = _run_scheduler([("script", None, ["a", "b"])], flaky, max_retries=3, base_delay=0.001)
+    assert finished["script"] == ["A", "B"]
+    assert stats.retries == 4
+    assert stats.failures == 0
+
+def test_blocks_that_keep_failing_get_the_fallback():
+    async def broken(block):
+        raise RuntimeError("down")
+
+    finished, stats = _run_scheduler([("script", None, ["a", "b", "c"])], broken,
+                                     max_retries=1, base_delay=0.001, fallback=lambda: "fallback")
+    assert finished["script"] == ["fallback"] * 3
+    assert stats.failures == 3
+    assert stats.requests == 6
+
+def test_results_are_returned_in_block_order():
+    rng = random.Random(1)
+    delays = {}
+
+    async def slow(block):
+        await asyncio.sleep(delays.setdefault(block, rng.uniform(0, 0.01)))
+        return f"scored {block}"
+
+    scripts = [(f"script{s}", None, [f"s{s}b{b}" for b in range(15)]) for s in range(3)]
+    finished, stats = _run_scheduler(scripts, slow, max_concurrency=8)
+    for script_id, _, blocks in scripts:
+        assert finished[script_id] == [f"scored {block}" for block in blocks]
+    assert stats.scripts_completed == 3
+
+# ---------------------------------------------------------------------------
+# Batched scoring
+# ---------------------------------------------------------------------------
+
+def _batch_reply(indices, scores=None):
+    scores = scores or {category: 1 for category in SENTIMENT_CATEGORIES}
+    return json.dumps({"results": [{"excerpt": i, "scores": scores} for i in indices]})
+
+class ReplyLLM:
+    """Stands in for AsyncLLMAPI and answers every request with a fixed reply."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+
+    async def generate(self, **kwargs):
+        self.prompts.append(kwargs["user_message"])
+        return self.reply
+
+def test_batch_prompt_numbers_the_excerpts_from_zero():
+    prompt = build_batch_sentiment_prompt(["first block", "second block"])
+    assert "[Excerpt 0]\nfirst block" in prompt
+    assert "[Excerpt 1]\nsecond block" in prompt
+    assert all(f"- {category}" in prompt for category in SENTIMENT_CATEGORIES)
+
+def test_batch_reply_is_matched_to_blocks_by_excerpt_number():
+    reply = json.dumps({"results": [{"excerpt": 1, "scores": {"humor": 4}},
+                                    {"excerpt": 0, "scores": {"humor": 2}}]})
+    assert parse_batch_response(reply, 2) == [{"humor": 2}, {"humor": 4}]
+    # A bare list is accepted as well
+    assert parse_batch_response(json.dumps([{"excerpt": 0, "scores": {"humor": 1}}]), 1) == [{"humor": 1}]
+
+def test_partial_batch_reply_leaves_missing_and_malformed_blocks_empty():
+    reply = json.dumps({"results": [{"excerpt": 0, "scores": {"humor": 3}},
+                                    {"excerpt": 2, "scores": {"humor": "very"}},
+                                    {"excerpt": True, "scores": {"humor": 5}},
+                                    "not an entry"]})
+    assert parse_batch_response(reply, 4) == [{"humor": 3}, None, None, None]
+
+def test_unusable_batch_replies_leave_every_block_empty():
+    shifted = json.dumps({"results": [{"excerpt": i, "scores": {"humor": 1}} for i in (1, 2)]})
+    duplicated = json.dumps({"results": [{"excerpt": 0, "scores": {"humor": 1}}] * 2})
+    for reply in ("not json", json.dumps({"results": "none"}), shifted, duplicated):
+        assert parse_batch_response(reply, 2) == [None, None]
+
+def test_analyze_text_batch_sends_one_request_for_all_blocks():
+    llm = ReplyLLM(_batch_reply([0, 2]))
+    results = run(analyze_text_batch(["a", "b", "c"], llm))
+    assert len(llm.prompts) == 1
+    assert [result is not None for result in results] == [True, False, True]
+
+def _upper_batch(calls):
+    async def score_batch(blocks):
+        calls.append(list(blocks))
+        return [block.upper() for block in blocks]
+    return score_batch
+
+async def _upper(block):
+    return block.upper()
+
+def test_batched_blocks_share_requests():
+    calls = []
+    blocks = [f"block{i}" for i in range(8)]
+    finished, stats = _run_scheduler([("script", None, blocks)], _upper, score_batch=_upper_batch(calls),
+                                     max_concurrency=1, max_batch_size=4, max_batch_tokens=10000)
+    assert finished["script"] == [block.upper() for block in blocks]
+    assert calls == [blocks[:4], blocks[4:]]
+    assert stats.batches == 2
+    assert stats.requests == 2
+
+def test_blocks_missing_from_a_batch_reply_are_split_off_and_rescored():
+    singles = []
+
+    async def score_block(block):
+        singles.append(block)
+        return block.upper()
+
+    async def score_batch(blocks):
+        # Drops "b" and answers with one result too few
+        return [None if block == "b" else block.upper() for block in blocks][:-1]
+
+    finished, stats = _run_scheduler([("script", None, ["a", "b", "c", "d"])], score_block,
+                                     score_batch=score_batch, max_concurrency=1, max_batch_size=4,
+                                     max_batch_tokens=10000)
+    assert finished["script"] == ["A", "B", "C", "D"]
+    assert sorted(singles) == ["b", "d"]
+    assert stats.batch_splits == 1
+    assert stats.failures == 0
+
+def test_failing_batch_request_gives_up_on_every_block_without_splitting():
+    async def broken(blocks):
+        raise RuntimeError("down")
+
+    finished, stats = _run_scheduler([("script", None, ["a", "b", "c", "d"])], _upper, score_batch=broken,
+                                     max_concurrency=1, max_batch_size=4, max_batch_tokens=10000,
+                                     max_retries=1, base_delay=0.001, fallback=lambda: "fallback")
+    assert finished["script"] == ["fallback"] * 4
+    assert stats.requests == 2
+    assert stats.batch_splits == 0
+    assert stats.failures == 4
+
+def test_failing_batch_without_fallback_drops_the_script():
+    async def broken(blocks):
+        raise RuntimeError("down")
+
+    finished, stats = _run_scheduler([("script", None, ["a", "b"])], _upper, score_batch=broken,
+                                     max_concurrency=1, max_batch_size=2, max_batch_tokens=10000,
+                                     max_retries=0)
+    assert finished == {}
+    assert stats.failures == 2
+    assert stats.scripts_completed == 0
@@ -0,0 +1,25 @@
+"""Tests that the streaming block splitter matches the in-memory one."""
+
+import pytest
+
+from sentiment_analysis import TextStats, iter_text_blocks, split_text_into_blocks, stream_script
+
+TEXTS = [
+    "",
+    "\n",
+    "one line without a newline",
+    "Greg: Hello.\nAlex: Your task begins now.\n" * 100,
+    "x" * 1200 + "\n" + "short\n\n\n" + "y" * 499 + "\n" + "z" * 501,
+    "ends without newline\n" * 60 + "last line",
+]
+
+@pytest.mark.parametrize("text", TEXTS)
+@pytest.mark.parametrize("block_size", [1, 50, 500])
+def test_iter_text_blocks_matches_split_text_into_blocks(text, block_size):
+    assert list(iter_text_blocks(text.split("\n"), block_size)) == split_text_into_blocks(text, block_size)
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_stream_script_matches_splitting_the_file_text(tmp_path, text):
+    path = tmp_path / "script.txt"
+    path.write_text(text, encoding="utf-8")
+    assert list(stream_script(str(path), TextStats())) == split_text_into_blocks(text)